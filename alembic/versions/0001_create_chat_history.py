@@ -0,0 +1,40 @@
+"""create chat_history
+
+Baseline for databases created before migrations were versioned: the table is only created if missing.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19 07:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if sa.inspect(op.get_bind()).has_table("chat_history"):
+        return
+    op.create_table(
+        "chat_history",
+        sa.Column("id", sa.UUID(as_uuid=True), primary_key=True),
+        sa.Column("session_id", sa.String(), nullable=False),
+        sa.Column("sender_type", sa.Text(), nullable=False),
+        sa.Column("message", sa.Text(), nullable=False),
+        sa.Column("tool_name", sa.String(), nullable=True),
+        sa.Column("timestamp", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index("ix_chat_history_session_id", "chat_history", ["session_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_chat_history_session_id", table_name="chat_history")
+    op.drop_table("chat_history")
@@ -0,0 +1,53 @@
+"""chat_history payload: lossless LangChain messages
+
+Adds the compact message payload (see app/services/message_store.py), normalizes sender_type to the
+MessageSender values and backfills payloads of existing rows. Legacy tool results get the
+stable tool_call_id "legacy-<row id>"; their missing tool calls are re-attached when history is decoded.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19 07:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+def upgrade() -> None:
+    op.add_column("chat_history", sa.Column("payload", postgresql.JSONB(), nullable=True))
+
+    # TOOL rows were written with the enum itself instead of its value
+    for value in ("user", "ai", "tool"):
+        op.execute(
+            f"UPDATE chat_history SET sender_type = '{value}' "
+            f"WHERE sender_type IN ('MessageSender.{value.upper()}', '{value.upper()}')"
+        )
+
+    # One statement: the migration runs in a single transaction, so batching would not release any locks early
+    op.execute(
+        """
+        UPDATE chat_history SET payload = CASE sender_type
+            WHEN 'user' THEN jsonb_build_object('type', 'human', 'data', jsonb_build_object('content', message))
+            WHEN 'tool' THEN jsonb_build_object('type', 'tool', 'data', jsonb_build_object(
+                'content', message,
+                'tool_call_id', 'legacy-' || id::text,
+                'name', coalesce(tool_name, 'unknown_sub_agent_tool')
+            ))
+            ELSE jsonb_build_object('type', 'ai', 'data', jsonb_build_object('content', message))
+        END
+        WHERE payload IS NULL
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("chat_history", "payload")
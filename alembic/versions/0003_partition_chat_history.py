@@ -0,0 +1,127 @@
+"""chat_history: monthly range partitions on timestamp, session summaries
+
+Rebuilds chat_history as a table partitioned by month on `timestamp` (primary key (id, timestamp), as
+partition keys must be part of it) and copies the existing rows over. The single session_id index is
+replaced by a (session_id, timestamp) index on every partition. Partitions from the oldest row to
+PARTITIONS_AHEAD months ahead are created here; later ones by app/services/partition_service.py.
+A default partition catches rows outside every monthly range.
+
+Also creates chat_session_summaries, filled by the compaction job before old partitions are retired.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19 09:30:00.000000
+
+"""
+from datetime import datetime, timezone
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+PARTITIONS_AHEAD = 3
+
+
+def _month_start(value: datetime) -> datetime:
+    return value.astimezone(timezone.utc).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _add_months(month: datetime, months: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + months
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+
+    op.execute("ALTER TABLE chat_history RENAME TO chat_history_unpartitioned")
+    op.execute("ALTER TABLE chat_history_unpartitioned RENAME CONSTRAINT chat_history_pkey TO chat_history_unpartitioned_pkey")
+    op.execute("DROP INDEX IF EXISTS ix_chat_history_session_id")
+
+    op.execute(
+        """
+        CREATE TABLE chat_history (
+            id UUID NOT NULL,
+            session_id VARCHAR NOT NULL,
+            sender_type TEXT NOT NULL,
+            message TEXT NOT NULL,
+            tool_name VARCHAR,
+            timestamp TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+            payload JSONB,
+            CONSTRAINT chat_history_pkey PRIMARY KEY (id, timestamp)
+        ) PARTITION BY RANGE (timestamp)
+        """
+    )
+    op.execute("CREATE INDEX ix_chat_history_session_id_timestamp ON chat_history (session_id, timestamp)")
+
+    oldest = connection.execute(sa.text("SELECT min(timestamp) FROM chat_history_unpartitioned")).scalar()
+    now = datetime.now(timezone.utc)
+    month = _month_start(oldest or now)
+    last_month = _add_months(_month_start(now), PARTITIONS_AHEAD)
+    while month <= last_month:
+        next_month = _add_months(month, 1)
+        op.execute(
+            f"CREATE TABLE chat_history_p{month:%Y%m} PARTITION OF chat_history "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{next_month.isoformat()}')"
+        )
+        month = next_month
+    op.execute("CREATE TABLE chat_history_default PARTITION OF chat_history DEFAULT")
+
+    # Rows are routed to their partitions by Postgres; timestamps were nullable before
+    op.execute(
+        """
+        INSERT INTO chat_history (id, session_id, sender_type, message, tool_name, timestamp, payload)
+        SELECT id, session_id, sender_type, message, tool_name, COALESCE(timestamp, now()), payload
+        FROM chat_history_unpartitioned
+        """
+    )
+    op.drop_table("chat_history_unpartitioned")
+
+    op.create_table(
+        "chat_session_summaries",
+        sa.Column("session_id", sa.String(), primary_key=True),
+        sa.Column("first_message_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("last_message_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("message_count", sa.Integer(), nullable=False),
+        sa.Column("tools_used", postgresql.ARRAY(sa.String()), nullable=False, server_default="{}"),
+        sa.Column("first_user_message", sa.Text(), nullable=True),
+        sa.Column("last_ai_message", sa.Text(), nullable=True),
+        sa.Column("summarized_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    )
+    op.create_index("ix_chat_session_summaries_last_message_at", "chat_session_summaries", ["last_message_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_chat_session_summaries_last_message_at", table_name="chat_session_summaries")
+    op.drop_table("chat_session_summaries")
+
+    op.execute("ALTER TABLE chat_history RENAME TO chat_history_partitioned")
+    op.execute("ALTER TABLE chat_history_partitioned RENAME CONSTRAINT chat_history_pkey TO chat_history_partitioned_pkey")
+    op.create_table(
+        "chat_history",
+        sa.Column("id", sa.UUID(as_uuid=True), primary_key=True),
+        sa.Column("session_id", sa.String(), nullable=False),
+        sa.Column("sender_type", sa.Text(), nullable=False),
+        sa.Column("message", sa.Text(), nullable=False),
+        sa.Column("tool_name", sa.String(), nullable=True),
+        sa.Column("timestamp", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("payload", postgresql.JSONB(), nullable=True),
+    )
+    op.execute(
+        """
+        INSERT INTO chat_history (id, session_id, sender_type, message, tool_name, timestamp, payload)
+        SELECT id, session_id, sender_type, message, tool_name, timestamp, payload
+        FROM chat_history_partitioned
+        """
+    )
+    # Dropping the parent drops every partition still attached (archived ones are kept)
+    op.execute("DROP TABLE chat_history_partitioned")
+    op.create_index("ix_chat_history_session_id", "chat_history", ["session_id"])
@@ -0,0 +1,197 @@
+import asyncio
+import contextlib
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, List, Optional, Sequence, Tuple
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+from langgraph.errors import GraphRecursionError
+
+from app.agents.memo import IncompleteResult
+from app.config import settings
+from app.services.scheduler import checkpoint
+
+
+class BudgetExceededError(Exception):
+    """Raised when a turn runs out of time, steps or tokens, or is cancelled by the client."""
+
+
+class LlmCallTimeoutError(BudgetExceededError):
+    """Raised when a single LLM call exceeds LLM_TIMEOUT_SECONDS; the turn ends with its best answer so far."""
+
+
+@dataclass
+class TurnBudget:
+    """Deadline, step and token budget shared by the supervisor and every sub-agent of one turn.
+
+    A step is one LLM call, wherever it happens in the graph hierarchy.
+    """
+    deadline: float
+    max_steps: int
+    max_tokens: int
+    steps: int = 0
+    tokens: int = 0
+    exhausted_reason: Optional[str] = None
+    _cancelled: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+
+    @classmethod
+    def from_settings(cls) -> "TurnBudget":
+        return cls(
+            deadline=time.monotonic() + settings.TURN_DEADLINE_SECONDS,
+            max_steps=settings.TURN_MAX_STEPS,
+            max_tokens=settings.TURN_MAX_TOKENS,
+        )
+
+    @property
+    def recursion_limit(self) -> int:
+        """LangGraph recursion limit matching the step budget (two supersteps per LLM/tool round)."""
+        return 2 * self.max_steps + 1
+
+    def remaining_seconds(self) -> float:
+        return max(0.0, self.deadline - time.monotonic())
+
+    def cancel(self) -> None:
+        """Cooperatively cancels the turn; in-flight LLM calls are abandoned and no new ones start."""
+        self._cancelled.set()
+
+    def _exhaust(self, reason: str) -> BudgetExceededError:
+        self.exhausted_reason = self.exhausted_reason or reason
+        return BudgetExceededError(reason)
+
+    def check(self) -> None:
+        """Raises BudgetExceededError if the turn can not start another step."""
+        if self._cancelled.is_set():
+            raise self._exhaust("the request was cancelled")
+        if self.remaining_seconds() <= 0:
+            raise self._exhaust("the time limit for this turn was reached")
+        if self.steps >= self.max_steps:
+            raise self._exhaust("the step limit for this turn was reached")
+        if self.tokens >= self.max_tokens:
+            raise self._exhaust("the token limit for this turn was reached")
+
+    def charge(self, message: BaseMessage) -> None:
+        usage = getattr(message, "usage_metadata", None) or {}
+        self.tokens += usage.get("total_tokens", 0)
+
+    async def _race(self, awaitable: Awaitable[Any], timeout: float) -> Tuple[bool, Any]:
+        """Awaits `awaitable` for at most `timeout` seconds, abandoning it if the turn is cancelled.
+
+        Returns (True, result) if it finished, (False, None) otherwise.
+        """
+        call = asyncio.ensure_future(awaitable)
+        cancelled = asyncio.ensure_future(self._cancelled.wait())
+        try:
+            done, _ = await asyncio.wait(
+                {call, cancelled},
+                timeout=min(timeout, self.remaining_seconds()),
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if call in done:
+                return True, call.result()
+        finally:
+            cancelled.cancel()
+            if not call.done():
+                call.cancel()
+                with contextlib.suppress(asyncio.CancelledError):
+                    await call
+        return False, None
+
+    async def wait(self, make_wait: Callable[[], Awaitable[Any]]) -> Any:
+        """Awaits something that is not a step (e.g. queueing for an LLM slot) within the turn deadline."""
+        self.check()
+        finished, result = await self._race(make_wait(), self.remaining_seconds())
+        if finished:
+            return result
+        self.check()  # raises for cancellation or an expired deadline
+        raise self._exhaust("the time limit for this turn was reached")
+
+    async def run_step(self, make_call: Callable[[], Awaitable[Any]], timeout: float) -> Any:
+        """Runs one LLM call within the remaining deadline, abandoning it if the turn is cancelled."""
+        self.check()
+        self.steps += 1
+        finished, result = await self._race(make_call(), timeout)
+        if finished:
+            return result
+        self.check()  # raises for cancellation or an expired deadline
+        raise LlmCallTimeoutError(f"a model call did not respond within {timeout:g}s")
+
+
+_current_budget: ContextVar[Optional[TurnBudget]] = ContextVar("current_budget", default=None)
+
+
+def get_current_budget() -> Optional[TurnBudget]:
+    return _current_budget.get()
+
+
+@contextlib.contextmanager
+def use_budget(budget: TurnBudget):
+    """Makes `budget` the budget of the current turn (visible to nested sub-agent runs)."""
+    token = _current_budget.set(budget)
+    try:
+        yield budget
+    finally:
+        _current_budget.reset(token)
+
+
+_STOPPED_EARLY = "I had to stop early because"
+
+
+def best_answer_so_far(messages: Sequence[BaseMessage], reason: str) -> str:
+    """Builds a graceful final answer from what a graph produced before its budget ran out."""
+    # Only consider what was produced after the latest user/task message
+    for start in range(len(messages) - 1, -1, -1):
+        if isinstance(messages[start], HumanMessage):
+            messages = messages[start + 1:]
+            break
+    # Sub-agents that were cut short report a stop notice of their own; it is not a result
+    results = [m for m in messages if m.content and not str(m.content).startswith(_STOPPED_EARLY)]
+    for message in reversed(results):
+        if isinstance(message, AIMessage) and not message.tool_calls:
+            return f"{_STOPPED_EARLY} {reason}. Best answer so far: {message.content}"
+    for message in reversed(results):
+        if isinstance(message, ToolMessage):
+            return f"{_STOPPED_EARLY} {reason}. Latest result: {message.content}"
+    return f"{_STOPPED_EARLY} {reason} before reaching an answer."
+
+
+def final_sub_agent_answer(messages: Sequence[BaseMessage], exhausted_reason: Optional[str], fallback: str) -> str:
+    """Result of a sub-agent run from run_graph_within_budget: its last message, or `fallback` if it has none.
+
+    A run cut short by the turn budget (deadline, steps, tokens or cancellation) returns what it has,
+    as an IncompleteResult so the turn memo does not reuse it.
+    """
+    if exhausted_reason:
+        return IncompleteResult(best_answer_so_far(messages, exhausted_reason))
+    return messages[-1].content if messages else fallback
+
+
+async def run_graph_within_budget(
+    graph,
+    graph_input: dict,
+    config: Optional[dict] = None,
+    on_state: Optional[Callable[[List[BaseMessage]], Awaitable[None]]] = None,
+) -> Tuple[List[BaseMessage], Optional[str]]:
+    """Streams a graph under the current turn budget.
+
+    Returns the last messages state and, if the run was cut short, the reason.
+    `on_state` is awaited with the messages after every step (used to stream progress to clients).
+    Every step boundary is also a scheduler checkpoint where long-running turns yield to interactive ones.
+    """
+    budget = get_current_budget()
+    config = dict(config or {})
+    if budget is not None:
+        config.setdefault("recursion_limit", budget.recursion_limit)
+
+    messages: List[BaseMessage] = []
+    try:
+        async for state in graph.astream(graph_input, config=config, stream_mode="values"):
+            messages = state["messages"]
+            if on_state is not None:
+                await on_state(messages)
+            await checkpoint()
+    except BudgetExceededError as e:
+        return messages, str(e)
+    except GraphRecursionError:
+        return messages, "the step limit for this turn was reached"
+    return messages, None
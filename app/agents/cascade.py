@@ -0,0 +1,94 @@
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Optional, Sequence
+
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration
+
+# Phrases that signal the cheap model is unsure and the stronger model should take over
+_LOW_CONFIDENCE_MARKERS = (
+    "i'm not sure",
+    "i am not sure",
+    "i'm unable to",
+    "i am unable to",
+    "i cannot determine",
+    "i can't determine",
+    "not enough information",
+)
+# Finish reasons meaning the answer is complete (Gemini reports "STOP", OpenAI-style models "stop"/"tool_calls")
+_COMPLETE_FINISH_REASONS = {None, "STOP", "stop", "tool_calls", "FINISH_REASON_UNSPECIFIED"}
+
+
+def _required_args(tools: Optional[Sequence[Dict[str, Any]]]) -> Dict[str, List[str]]:
+    """Maps bound tool names to their required arguments (tools are in OpenAI function format)."""
+    required: Dict[str, List[str]] = {}
+    for bound_tool in tools or []:
+        function = bound_tool.get("function", bound_tool) if isinstance(bound_tool, dict) else {}
+        if "name" in function:
+            required[function["name"]] = function.get("parameters", {}).get("required", [])
+    return required
+
+
+def escalation_reason(generation: ChatGeneration, tools: Optional[Sequence[Dict[str, Any]]] = None) -> Optional[str]:
+    """Returns why a cheap-tier response should be escalated, or None if it is acceptable."""
+    message = generation.message
+    if not isinstance(message, AIMessage):
+        return "unexpected_message"
+    if message.invalid_tool_calls:
+        return "malformed_tool_call"
+    finish_reason = (generation.generation_info or {}).get("finish_reason", message.response_metadata.get("finish_reason"))
+    if finish_reason not in _COMPLETE_FINISH_REASONS:
+        return "incomplete"
+
+    required = _required_args(tools)
+    for tool_call in message.tool_calls:
+        if required and tool_call["name"] not in required:
+            return "unknown_tool"
+        missing = [arg for arg in required.get(tool_call["name"], []) if tool_call["args"].get(arg) in (None, "")]
+        if missing:
+            return "missing_args"
+
+    if not message.tool_calls:
+        content = message.content if isinstance(message.content, str) else str(message.content)
+        if not content.strip():
+            return "empty_answer"
+        if any(marker in content.lower() for marker in _LOW_CONFIDENCE_MARKERS):
+            return "low_confidence"
+    return None
+
+
+class CascadeStats:
+    """Per-role counters of which tier served a call and why calls escalated."""
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.served_by_tier: Counter = Counter()
+        self.escalations = 0
+        self.escalation_reasons: Counter = Counter()
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "served_by_tier": dict(self.served_by_tier),
+            "escalations": self.escalations,
+            "escalation_rate": self.escalations / self.calls if self.calls else 0.0,
+            "escalation_reasons": dict(self.escalation_reasons),
+        }
+
+
+_cascade_stats: Dict[str, CascadeStats] = defaultdict(CascadeStats)
+
+
+def record_served(role: str, tier_name: str) -> None:
+    stats = _cascade_stats[role]
+    stats.calls += 1
+    stats.served_by_tier[tier_name] += 1
+
+
+def record_escalation(role: str, reason: str) -> None:
+    stats = _cascade_stats[role]
+    stats.escalations += 1
+    stats.escalation_reasons[reason] += 1
+
+
+def get_cascade_metrics() -> Dict[str, Dict[str, Any]]:
+    return {role: stats.as_dict() for role, stats in _cascade_stats.items()}
@@ -0,0 +1,88 @@
+import asyncio
+import contextlib
+import math
+import time
+from collections import defaultdict, deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+from app.config import settings
+
+
+class HedgeStats:
+    """Recent latencies and hedge counters of one LLM role."""
+
+    def __init__(self) -> None:
+        self.latencies: Deque[float] = deque(maxlen=settings.LLM_HEDGE_WINDOW)
+        self.calls = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def hedge_delay(self) -> Optional[float]:
+        """Latency percentile after which a duplicate request is sent, or None until enough samples exist."""
+        if len(self.latencies) < settings.LLM_HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self.latencies)
+        index = max(0, math.ceil(settings.LLM_HEDGE_PERCENTILE / 100 * len(ordered)) - 1)
+        return ordered[index]
+
+    def can_hedge(self) -> bool:
+        # Cap the extra load: hedges may not exceed LLM_HEDGE_MAX_RATE of all calls
+        return self.hedges + 1 <= settings.LLM_HEDGE_MAX_RATE * self.calls
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "hedge_rate": self.hedges / self.calls if self.calls else 0.0,
+            "hedge_delay_seconds": self.hedge_delay(),
+        }
+
+
+_hedge_stats: Dict[str, HedgeStats] = defaultdict(HedgeStats)
+
+
+def get_hedge_metrics() -> Dict[str, Dict[str, Any]]:
+    return {role: stats.as_dict() for role, stats in _hedge_stats.items()}
+
+
+async def hedged_call(role: str, make_call: Callable[[bool], Awaitable[Any]]) -> Any:
+    """Runs an LLM call, issuing one duplicate if it is slower than the role's recent latency percentile.
+
+    `make_call(is_hedge)` starts a request; whichever request succeeds first wins and the other is cancelled.
+    """
+    stats = _hedge_stats[role]
+    stats.calls += 1
+    delay = stats.hedge_delay()
+    started = time.monotonic()
+    primary = asyncio.ensure_future(make_call(False))
+    tasks = {primary}
+    try:
+        if delay is not None:
+            await asyncio.wait(tasks, timeout=delay)
+        if primary.done() or delay is None or not stats.can_hedge():
+            result = await primary
+            stats.latencies.append(time.monotonic() - started)
+            return result
+
+        stats.hedges += 1
+        hedge = asyncio.ensure_future(make_call(True))
+        tasks.add(hedge)
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is hedge:
+                        stats.hedge_wins += 1
+                    # Measured from the original request whoever wins, so the percentile stays unbiased
+                    stats.latencies.append(time.monotonic() - started)
+                    return task.result()
+        # Both requests failed: surface the primary's error
+        raise primary.exception()
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+                with contextlib.suppress(asyncio.CancelledError):
+                    await task
@@ -0,0 +1,175 @@
+import contextlib
+import time
+from typing import Any, List, Optional, Sequence
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatResult
+from langchain_google_genai import ChatGoogleGenerativeAI
+
+from app.agents.budget import TurnBudget, get_current_budget
+from app.agents.cascade import escalation_reason, record_escalation, record_served
+from app.agents.hedging import hedged_call
+from app.agents.recording import get_active_recorder, get_active_replay
+from app.config import settings
+from app.services.scheduler import current_turn_class, llm_slots
+
+
+class RoleChatModel(BaseChatModel):
+    """Chat model wrapper used by every LLM role (supervisor and sub-agents).
+
+    Delegates to the wrapped provider model and gives us a single place to hook
+    cross-cutting behaviour around each LLM call (recording/replay, turn budget, hedging, model cascade).
+    """
+    role: str
+    # Models to try in order, cheapest first; the last tier's answer is always accepted
+    tiers: List[BaseChatModel]
+
+    @property
+    def _llm_type(self) -> str:
+        return f"role-{self.role}"
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any):
+        # Let the provider model format the tools, then bind the formatted kwargs to the wrapper.
+        # All tiers use the same provider, so the format is shared.
+        return self.bind(**self.tiers[-1].bind_tools(tools, **kwargs).kwargs)
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        return self.tiers[-1]._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        budget = get_current_budget()
+        async with _llm_slot(budget):
+            if budget is None:
+                return await self._call_model(messages, stop, run_manager, **kwargs)
+
+            # Each LLM call is one step of the turn budget and may not outlive the turn deadline
+            result = await budget.run_step(
+                lambda: self._call_model(messages, stop, run_manager, **kwargs),
+                timeout=settings.LLM_TIMEOUT_SECONDS,
+            )
+        budget.charge(result.generations[0].message)
+        return result
+
+    async def _call_model(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]],
+        run_manager: Optional[AsyncCallbackManagerForLLMRun],
+        **kwargs: Any,
+    ) -> ChatResult:
+        replay = get_active_replay()
+        if replay is not None:
+            return await replay.next_llm_result(self.role, messages)
+
+        started = time.monotonic()
+        result = await self._call_cascade(messages, stop, run_manager, **kwargs)
+        recorder = get_active_recorder()
+        if recorder is not None:
+            recorder.record_llm(self.role, messages, result, time.monotonic() - started)
+        return result
+
+
+    async def _call_cascade(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]],
+        run_manager: Optional[AsyncCallbackManagerForLLMRun],
+        **kwargs: Any,
+    ) -> ChatResult:
+        """Tries the tiers cheapest first, escalating on errors or responses that fail validation."""
+        for tier_index, tier in enumerate(self.tiers):
+            tier_name = _tier_name(tier)
+            is_last_tier = tier_index == len(self.tiers) - 1
+            try:
+                result = await self._call_tier(tier, tier_name, messages, stop, run_manager, **kwargs)
+            except Exception as e:
+                if is_last_tier:
+                    raise
+                print(f"--- LLM [{self.role}]: {tier_name} failed ({e}), escalating ---")
+                record_escalation(self.role, "error")
+                continue
+
+            reason = None if is_last_tier else escalation_reason(result.generations[0], kwargs.get("tools"))
+            if reason is None:
+                record_served(self.role, tier_name)
+                return result
+            print(f"--- LLM [{self.role}]: {tier_name} response rejected ({reason}), escalating ---")
+            record_escalation(self.role, reason)
+
+    async def _call_tier(
+        self,
+        tier: BaseChatModel,
+        tier_name: str,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]],
+        run_manager: Optional[AsyncCallbackManagerForLLMRun],
+        **kwargs: Any,
+    ) -> ChatResult:
+        if not settings.LLM_HEDGE_ENABLED:
+            return await tier._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        # The duplicate request gets no run manager so callbacks only see the primary call
+        return await hedged_call(
+            f"{self.role}:{tier_name}",
+            lambda is_hedge: tier._agenerate(
+                messages, stop=stop, run_manager=None if is_hedge else run_manager, **kwargs
+            ),
+        )
+
+
+@contextlib.asynccontextmanager
+async def _llm_slot(budget: Optional[TurnBudget]):
+    """Holds an LLM slot around a call; interactive turns have slots reserved and are served first.
+
+    Queueing for the slot is bounded by the turn deadline only, not by LLM_TIMEOUT_SECONDS, so a long-running
+    turn waiting behind interactive ones is delayed rather than failed. Replays make no model calls and skip it.
+    """
+    if get_active_replay() is not None:
+        yield
+        return
+    turn_class = current_turn_class()
+    if budget is None:
+        await llm_slots.acquire(turn_class)
+    else:
+        await budget.wait(lambda: llm_slots.acquire(turn_class))
+    try:
+        yield
+    finally:
+        llm_slots.release(turn_class)
+
+
+def _tier_name(tier: BaseChatModel) -> str:
+    return str(getattr(tier, "model", None) or tier._llm_type).removeprefix("models/")
+
+
+def build_llm(role: str) -> RoleChatModel:
+    """Builds the chat model for an LLM role ("supervisor", "analysis", "docker", "k8s", "terraform").
+
+    Roles listed in LLM_CASCADE get a cheap-first cascade of models; the others use LLM_MODEL only.
+    """
+    return RoleChatModel(
+        role=role,
+        tiers=[
+            ChatGoogleGenerativeAI(
+                model=model_name,
+                temperature=settings.LLM_TEMPERATURE,
+                max_tokens=None,
+                timeout=settings.LLM_TIMEOUT_SECONDS,
+                max_retries=2
+            )
+            for model_name in settings.LLM_CASCADE.get(role, [settings.LLM_MODEL])
+        ],
+    )
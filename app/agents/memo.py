@@ -0,0 +1,118 @@
+import asyncio
+import contextlib
+import functools
+import re
+import unicodedata
+from collections import Counter, defaultdict
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+# Prepended to a reused result so the supervisor knows the sub-agent was not run again
+_REUSED_NOTE = "(Result of an identical sub-agent task already completed in this turn.)"
+_TRAILING_PUNCTUATION = ".,;:!? \t\n"
+
+
+def normalize_task(task_description: str) -> str:
+    """Normalizes a sub-agent task text so trivially different phrasings share one memo entry.
+
+    Only case, Unicode form, whitespace and trailing punctuation are ignored; wording changes are a new task.
+    """
+    text = unicodedata.normalize("NFKC", task_description).casefold()
+    return re.sub(r"\s+", " ", text).strip(_TRAILING_PUNCTUATION)
+
+
+class IncompleteResult(str):
+    """A sub-agent result that must not be reused within the turn: an error, or a run cut short by the budget.
+
+    Sub-agent helpers return one instead of raising, so the supervisor still sees the message and can retry the task.
+    """
+
+
+class MemoStats:
+    """Per-tool counters of sub-agent runs saved by the turn memo."""
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.coalesced = 0
+        self.reused = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        saved = self.coalesced + self.reused
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "reused": self.reused,
+            "saved_rate": saved / self.calls if self.calls else 0.0,
+        }
+
+
+_memo_stats: Dict[str, MemoStats] = defaultdict(MemoStats)
+
+
+def get_memo_metrics() -> Dict[str, Dict[str, Any]]:
+    return {tool_name: stats.as_dict() for tool_name, stats in _memo_stats.items()}
+
+
+class TurnMemo:
+    """Single-flight memo of sub-agent calls for one supervisor turn.
+
+    Identical calls that are in flight share one run; identical calls after it completed reuse its result.
+    Failed, cancelled or incomplete runs (IncompleteResult) are not memoized, so the supervisor can retry them.
+    """
+
+    def __init__(self) -> None:
+        self._runs: Dict[Tuple[str, str], asyncio.Task] = {}
+        self._waiters: Counter = Counter()
+
+    async def run(self, tool_name: str, task_description: str, invoke: Callable[[], Awaitable[str]]) -> str:
+        key = (tool_name, normalize_task(task_description))
+        stats = _memo_stats[tool_name]
+        stats.calls += 1
+
+        run = self._runs.get(key)
+        if run is not None and run.done():
+            if not run.cancelled() and run.exception() is None and not isinstance(run.result(), IncompleteResult):
+                stats.reused += 1
+                print(f"--- TURN MEMO: Reusing completed {tool_name} result ---")
+                return f"{_REUSED_NOTE}\n{run.result()}"
+            run = None
+        if run is None:
+            # The run is a task of its own so one waiter being cancelled does not cancel it for the others
+            run = asyncio.create_task(invoke())
+            self._runs[key] = run
+        else:
+            stats.coalesced += 1
+            print(f"--- TURN MEMO: Joining in-flight {tool_name} call ---")
+
+        self._waiters[key] += 1
+        try:
+            return await asyncio.shield(run)
+        finally:
+            self._waiters[key] -= 1
+            if not self._waiters[key] and not run.done():
+                # Every caller went away (e.g. the turn was cancelled): stop the orphaned sub-agent run
+                run.cancel()
+
+
+_current_memo: ContextVar[Optional[TurnMemo]] = ContextVar("current_memo", default=None)
+
+
+@contextlib.contextmanager
+def use_turn_memo():
+    """Gives the current turn a fresh sub-agent memo (visible to the supervisor's wrapper tools)."""
+    token = _current_memo.set(TurnMemo())
+    try:
+        yield
+    finally:
+        _current_memo.reset(token)
+
+
+def memoized_per_turn(func: Callable[[str], Awaitable[str]]):
+    """Deduplicates calls of a sub-agent wrapper tool within the current turn. Apply below @tool."""
+    @functools.wraps(func)
+    async def wrapper(task_description: str) -> str:
+        memo = _current_memo.get()
+        if memo is None:
+            return await func(task_description)
+        return await memo.run(func.__name__, task_description, lambda: func(task_description))
+    return wrapper
@@ -13,6 +13,7 @@ from app.agents.tools.kubernetes_tool import deploy_to_kubernetes
 from app.services.history_service import add_message_to_history, get_history_by_session_id
 from app.database.database import AsyncSessionLocal
 from app.database.models import MessageSender
+from app.services.message_store import decode_history
 import uuid # For generating unique tool call IDs
 
 # 1. Define Agent State
@@ -117,21 +118,6 @@ workflow.add_edge("action", "agent") # Loop back to agent after action
 # Compile the graph
 agent_graph = workflow.compile()
 
-# Helper to format history for the agent
-def _format_db_history_to_langchain_messages(db_history: List[Any]) -> List[BaseMessage]:
-    lc_messages = []
-    for msg in db_history:
-        if msg.sender_type == MessageSender.USER.value:
-            lc_messages.append(HumanMessage(content=msg.message))
-        elif msg.sender_type == MessageSender.AI.value:
-            lc_messages.append(AIMessage(content=msg.message)) # Tool calls are not stored directly here yet for AIMessage
-        elif msg.sender_type == MessageSender.TOOL:
-            # This part needs careful handling if we want to re-inject tool calls and results
-            # For now, we'll represent tool results simply.
-            # A more robust solution might store tool_call_id and reconstruct ToolMessage with it.
-            lc_messages.append(ToolMessage(content=msg.message, tool_call_id=str(uuid.uuid4()), name=msg.tool_name or "unknown_tool"))
-    return lc_messages
-
 async def run_agent_interaction(session_id: str, user_message: str, repo_url: str | None) -> str:
     """Runs the agent with the given user message and session history."""
     async with AsyncSessionLocal() as db:
@@ -149,7 +135,7 @@ async def run_agent_interaction(session_id: str, user_message: str, repo_url: st
         # Format history for LangGraph
         # The initial message is the current user input
         # The history should be older messages
-        formatted_history = _format_db_history_to_langchain_messages(db_history[:-1]) # Exclude current user message
+        formatted_history = decode_history(db_history[:-1]) # Exclude current user message
         
         initial_messages = formatted_history + [HumanMessage(content=user_message)]
 
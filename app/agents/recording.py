@@ -0,0 +1,299 @@
+import argparse
+import asyncio
+import functools
+import hashlib
+import inspect
+import json
+import os
+import time
+import uuid
+from collections import defaultdict, deque
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, List, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import AsyncCallbackHandler
+from langchain_core.messages import BaseMessage, messages_from_dict, messages_to_dict
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+# Recorder/replay of the current turn; contextvars propagate into ToolNode tasks and nested sub-agent runs
+_active_recorder: ContextVar[Optional["TurnRecorder"]] = ContextVar("active_recorder", default=None)
+_active_replay: ContextVar[Optional["TurnReplay"]] = ContextVar("active_replay", default=None)
+
+
+class ReplayMismatchError(RuntimeError):
+    """Raised when a replayed turn makes an LLM or tool call that has no recorded counterpart."""
+
+
+def get_active_recorder() -> Optional["TurnRecorder"]:
+    return _active_recorder.get()
+
+
+def get_active_replay() -> Optional["TurnReplay"]:
+    return _active_replay.get()
+
+
+def is_replaying() -> bool:
+    return _active_replay.get() is not None
+
+
+def _digest(payload: Any) -> str:
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+
+
+class NodeTimingHandler(AsyncCallbackHandler):
+    """Collects wall-clock durations of LangGraph nodes and tool runs.
+
+    Runs are labelled with the path of enclosing nodes/tools, e.g.
+    "sub_agent_action/docker_sub_agent_tool/agent", so the same node name in different sub-agents stays distinct.
+    """
+
+    def __init__(self) -> None:
+        self.timings: List[Dict[str, Any]] = []
+        self._runs: Dict[UUID, Dict[str, Any]] = {}
+
+    def _start(self, run_id: UUID, parent_run_id: Optional[UUID], name: Optional[str], labelled: bool) -> None:
+        self._runs[run_id] = {"name": name, "parent": parent_run_id, "labelled": labelled, "started": time.monotonic()}
+
+    def _label(self, run_id: UUID) -> str:
+        parts = []
+        current = self._runs.get(run_id)
+        while current is not None:
+            if current["labelled"]:
+                parts.append(current["name"])
+            current = self._runs.get(current["parent"])
+        return "/".join(reversed(parts))
+
+    def _end(self, run_id: UUID, kind: str) -> None:
+        run = self._runs.get(run_id)
+        if run is None:
+            return
+        if run["labelled"]:
+            self.timings.append({
+                "kind": kind,
+                "label": self._label(run_id),
+                "duration": time.monotonic() - run["started"],
+            })
+        del self._runs[run_id]
+
+    async def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, tags=None, metadata=None, **kwargs) -> None:
+        name = kwargs.get("name")
+        is_node = bool(metadata) and name is not None and metadata.get("langgraph_node") == name
+        self._start(run_id, parent_run_id, name, is_node)
+
+    async def on_chain_end(self, outputs, *, run_id, **kwargs) -> None:
+        self._end(run_id, "node")
+
+    async def on_chain_error(self, error, *, run_id, **kwargs) -> None:
+        self._end(run_id, "node")
+
+    async def on_tool_start(self, serialized, input_str, *, run_id, parent_run_id=None, **kwargs) -> None:
+        self._start(run_id, parent_run_id, kwargs.get("name") or (serialized or {}).get("name"), True)
+
+    async def on_tool_end(self, output, *, run_id, **kwargs) -> None:
+        self._end(run_id, "tool")
+
+    async def on_tool_error(self, error, *, run_id, **kwargs) -> None:
+        self._end(run_id, "tool")
+
+
+class TurnRecorder(NodeTimingHandler):
+    """Captures every LLM response, leaf tool call and node timing of one supervisor turn."""
+
+    def __init__(self, session_id: str, directory: str) -> None:
+        super().__init__()
+        self.session_id = session_id
+        self.turn_id = uuid.uuid4().hex
+        self.directory = directory
+        self.started_at = datetime.now(timezone.utc)
+        self.initial_state: Dict[str, Any] = {}
+        self.events: List[Dict[str, Any]] = []
+
+    def record_initial_state(self, messages: List[BaseMessage], user_request: Dict[str, Any]) -> None:
+        self.initial_state = {"messages": messages_to_dict(messages), "user_request": user_request}
+
+    def record_llm(self, role: str, messages: List[BaseMessage], result: ChatResult, duration: float) -> None:
+        self.events.append({
+            "kind": "llm",
+            "step": len(self.events),
+            "role": role,
+            "input_digest": _digest(messages_to_dict(messages)),
+            "response": messages_to_dict([result.generations[0].message])[0],
+            "duration": duration,
+        })
+
+    def record_tool(self, name: str, arguments: Dict[str, Any], output: Any, duration: float) -> None:
+        self.events.append({
+            "kind": "tool",
+            "step": len(self.events),
+            "name": name,
+            "input_digest": _digest(arguments),
+            "arguments": arguments,
+            "output": output,
+            "duration": duration,
+        })
+
+    def save(self) -> str:
+        """Writes the recording to <directory>/<session_id>/<timestamp>-<turn_id>.json and returns the path."""
+        session_directory = os.path.join(self.directory, self.session_id)
+        os.makedirs(session_directory, exist_ok=True)
+        path = os.path.join(session_directory, f"{self.started_at.strftime('%Y%m%dT%H%M%S')}-{self.turn_id}.json")
+        with open(path, "w", encoding="utf-8") as recording_file:
+            json.dump({
+                "session_id": self.session_id,
+                "turn_id": self.turn_id,
+                "started_at": self.started_at.isoformat(),
+                "initial_state": self.initial_state,
+                "events": self.events,
+                "timings": self.timings,
+            }, recording_file, ensure_ascii=False, default=str)
+        return path
+
+
+class TurnReplay:
+    """Serves recorded LLM responses and tool outputs back to a re-run of the turn.
+
+    Calls are matched by role/tool name and input digest first, falling back to recording order
+    per role/tool, so concurrent sub-agent calls do not need to interleave exactly as recorded.
+    """
+
+    def __init__(self, recording: Dict[str, Any], speed: float = 0.0) -> None:
+        self.speed = speed
+        self._by_digest: Dict[tuple, Deque[Dict[str, Any]]] = defaultdict(deque)
+        self._by_name: Dict[tuple, Deque[Dict[str, Any]]] = defaultdict(deque)
+        for event in recording["events"]:
+            name = event["role"] if event["kind"] == "llm" else event["name"]
+            self._by_digest[(event["kind"], name, event["input_digest"])].append(event)
+            self._by_name[(event["kind"], name)].append(event)
+        self._consumed: set = set()
+
+    def _take(self, kind: str, name: str, input_digest: str) -> Dict[str, Any]:
+        for queue in (self._by_digest[(kind, name, input_digest)], self._by_name[(kind, name)]):
+            while queue:
+                event = queue.popleft()
+                if event["step"] not in self._consumed:
+                    self._consumed.add(event["step"])
+                    return event
+        raise ReplayMismatchError(f"No recorded {kind} call left for '{name}'")
+
+    async def _wait(self, event: Dict[str, Any]) -> None:
+        # speed=1.0 reproduces recorded latency, >1 accelerates, 0 returns immediately
+        if self.speed > 0:
+            await asyncio.sleep(event["duration"] / self.speed)
+
+    async def next_llm_result(self, role: str, messages: List[BaseMessage]) -> ChatResult:
+        event = self._take("llm", role, _digest(messages_to_dict(messages)))
+        await self._wait(event)
+        message = messages_from_dict([event["response"]])[0]
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def next_tool_output(self, name: str, arguments: Dict[str, Any]) -> Any:
+        event = self._take("tool", name, _digest(arguments))
+        await self._wait(event)
+        return event["output"]
+
+
+def replayable(name: str):
+    """Makes a leaf tool coroutine recordable and replayable. Apply below @tool."""
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            arguments = dict(bound.arguments)
+
+            replay = get_active_replay()
+            if replay is not None:
+                return await replay.next_tool_output(name, arguments)
+
+            started = time.monotonic()
+            output = await func(*args, **kwargs)
+            recorder = get_active_recorder()
+            if recorder is not None:
+                recorder.record_tool(name, arguments, output, time.monotonic() - started)
+            return output
+        return wrapper
+    return decorator
+
+
+def start_recording(session_id: str, directory: str) -> tuple:
+    """Activates a recorder for the current turn; returns (recorder, token) for stop_recording."""
+    recorder = TurnRecorder(session_id, directory)
+    return recorder, _active_recorder.set(recorder)
+
+
+def stop_recording(token) -> None:
+    _active_recorder.reset(token)
+
+
+def _summarize_timings(timings: List[Dict[str, Any]]) -> Dict[str, Dict[str, float]]:
+    summary: Dict[str, Dict[str, float]] = defaultdict(lambda: {"count": 0, "total": 0.0})
+    for timing in timings:
+        entry = summary[timing["label"]]
+        entry["count"] += 1
+        entry["total"] += timing["duration"]
+    return summary
+
+
+async def replay_recording(path: str, speed: float = 0.0) -> Dict[str, Dict[str, float]]:
+    """Re-runs a recorded turn through multi_agent_graph with no network access.
+
+    Returns per node/tool timing totals (seconds) for the recording and the replay, plus their difference.
+    """
+    # Imported here: the supervisor module imports this one
+    from app.agents.budget import TurnBudget, use_budget
+    from app.agents.memo import use_turn_memo
+    from app.agents.supervisor_agent import SupervisorState, multi_agent_graph
+    from app.services.scheduler import classify_turn, use_turn_class
+
+    with open(path, encoding="utf-8") as recording_file:
+        recording = json.load(recording_file)
+
+    user_request = recording["initial_state"]["user_request"]
+    timing_handler = NodeTimingHandler()
+    budget = TurnBudget.from_settings()
+    token = _active_replay.set(TurnReplay(recording, speed=speed))
+    try:
+        # Same per-turn context as run_supervisor_turn: without the memo, coalesced or reused
+        # sub-agent calls would run again and no longer match the recording
+        with use_budget(budget), use_turn_memo(), use_turn_class(classify_turn(user_request.get("message") or "")):
+            await multi_agent_graph.ainvoke(
+                SupervisorState(
+                    messages=messages_from_dict(recording["initial_state"]["messages"]),
+                    user_request=user_request,
+                    session_id=recording["session_id"],
+                ),
+                config={"callbacks": [timing_handler], "recursion_limit": budget.recursion_limit},
+            )
+    finally:
+        _active_replay.reset(token)
+
+    recorded = _summarize_timings(recording["timings"])
+    replayed = _summarize_timings(timing_handler.timings)
+    report: Dict[str, Dict[str, float]] = {}
+    for label in sorted(set(recorded) | set(replayed)):
+        report[label] = {
+            "count": max(recorded[label]["count"], replayed[label]["count"]),
+            "recorded": recorded[label]["total"],
+            "replayed": replayed[label]["total"],
+            "diff": replayed[label]["total"] - recorded[label]["total"],
+        }
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay a recorded supervisor turn offline and diff node timings.")
+    parser.add_argument("recording", help="Path to a recording written when RECORDINGS_DIR is set.")
+    parser.add_argument("--speed", type=float, default=0.0, help="1 = recorded timing, >1 accelerated, 0 = no delays.")
+    args = parser.parse_args()
+
+    timing_report = asyncio.run(replay_recording(args.recording, speed=args.speed))
+    print(f"{'node/tool':<70} {'count':>5} {'recorded ms':>12} {'replayed ms':>12} {'diff ms':>10}")
+    for label, entry in timing_report.items():
+        print(
+            f"{label:<70} {entry['count']:>5} {entry['recorded'] * 1000:>12.1f} "
+            f"{entry['replayed'] * 1000:>12.1f} {entry['diff'] * 1000:>+10.1f}"
+        )
@@ -4,6 +4,9 @@ from langchain_core.messages import BaseMessage, AnyMessage
 from langgraph.prebuilt import create_react_agent
 from langchain_openai import ChatOpenAI
 from app.config import settings
+from app.agents.llm import build_llm
+from app.agents.budget import final_sub_agent_answer, run_graph_within_budget
+from app.agents.memo import IncompleteResult
 # Add other necessary imports for a ReAct agent later (LLM, Graph, ToolNode, etc.)
 from langchain_google_genai import ChatGoogleGenerativeAI
 
@@ -11,13 +14,7 @@ from langchain_google_genai import ChatGoogleGenerativeAI
 # Define the LLM for this sub-agent
 # Could use a smaller/cheaper model if the task is simple enough
 #analysis_llm = ChatOpenAI(temperature=0, streaming=True, api_key=settings.OPENAI_API_KEY)
-analysis_llm = ChatGoogleGenerativeAI(
-    model="gemini-2.5-flash-preview-04-17",
-    temperature=0.8,
-    max_tokens=None,
-    timeout=None,
-    max_retries=2
-)
+analysis_llm = build_llm("analysis")
 # Create the ReAct Agent for Analysis
 # Note: create_react_agent uses a predefined AgentState internally
 analysis_agent_graph = create_react_agent(
@@ -35,15 +32,11 @@ async def invoke_analysis_agent(query: str) -> str:
     # or a list of BaseMessages
     input_messages: List[AnyMessage] = [("user", query)] 
     try:
-        # create_react_agent doesn't directly support async invocation easily without channels
-        # For simplicity here, we run sync in async context, replace with proper async if needed
-        # Or reconstruct the graph manually for full async control.
-        # Using .ainvoke directly might work depending on LangGraph version and setup.
-        response = await analysis_agent_graph.ainvoke({"messages": input_messages})
-        # Extract the final response message
-        final_message = response["messages"][-1].content if response["messages"] else "Analysis agent finished without explicit response."
+        # Streamed so the last state is kept if the turn budget runs out mid-run
+        messages, exhausted_reason = await run_graph_within_budget(analysis_agent_graph, {"messages": input_messages})
+        final_message = final_sub_agent_answer(messages, exhausted_reason, "Analysis agent finished without explicit response.")
         print(f"--- Analysis Sub-Agent Result: {final_message} ---")
         return final_message
     except Exception as e:
         print(f"Error invoking analysis sub-agent: {e}")
-        return f"Error during analysis: {str(e)}"
+        return IncompleteResult(f"Error during analysis: {str(e)}")
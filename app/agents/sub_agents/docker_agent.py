@@ -5,9 +5,15 @@ from langchain_google_genai import ChatGoogleGenerativeAI
 from langgraph.prebuilt import create_react_agent
 from langchain_openai import ChatOpenAI
 from app.config import settings
+from app.agents.llm import build_llm
+from app.agents.budget import final_sub_agent_answer, run_graph_within_budget
+from app.agents.memo import IncompleteResult
+from app.agents.recording import replayable
+from app.services.mcp_pool import get_agent_graph
 
 # Tool Definition (MCP Placeholder)
 @tool
+@replayable("build_docker_image")
 async def build_docker_image(repo_url: str, project_path: str, image_name: str) -> str:
     """Builds a Docker image for a project located at a given path (potentially cloned from repo_url).
     Use this tool after analyzing a repository and determining a Dockerfile exists or can be generated.
@@ -26,13 +32,7 @@ async def build_docker_image(repo_url: str, project_path: str, image_name: str)
 
 # Define the LLM for this sub-agent
 #docker_llm = ChatOpenAI(temperature=0, streaming=True, api_key=settings.OPENAI_API_KEY)
-docker_llm = ChatGoogleGenerativeAI(
-    model="gemini-2.5-flash-preview-04-17",
-    temperature=0.8,
-    max_tokens=None,
-    timeout=None,
-    max_retries=2
-)
+docker_llm = build_llm("docker")
 # Create the ReAct Agent for Docker operations
 docker_agent_graph = create_react_agent(
     model=docker_llm,
@@ -40,16 +40,22 @@ docker_agent_graph = create_react_agent(
     # prompt="You are a specialized agent for building Docker images..."
 )
 
+# With a connected docker MCP server, its tools replace the placeholder build tool
+def _get_docker_agent_graph():
+    return get_agent_graph(
+        "docker", docker_agent_graph, lambda mcp_tools: create_react_agent(model=docker_llm, tools=mcp_tools)
+    )
+
 # Helper function to invoke this agent
 async def invoke_docker_agent(query: str) -> str:
     """Invokes the docker sub-agent to build an image."""
     print(f"--- Invoking Docker Sub-Agent with query: {query} ---")
     input_messages: List[AnyMessage] = [("user", query)] 
     try:
-        response = await docker_agent_graph.ainvoke({"messages": input_messages})
-        final_message = response["messages"][-1].content if response["messages"] else "Docker agent finished without explicit response."
+        messages, exhausted_reason = await run_graph_within_budget(_get_docker_agent_graph(), {"messages": input_messages})
+        final_message = final_sub_agent_answer(messages, exhausted_reason, "Docker agent finished without explicit response.")
         print(f"--- Docker Sub-Agent Result: {final_message} ---")
         return final_message
     except Exception as e:
         print(f"Error invoking docker sub-agent: {e}")
-        return f"Error during docker build: {str(e)}"
\ No newline at end of file
+        return IncompleteResult(f"Error during docker build: {str(e)}")
\ No newline at end of file
@@ -1,39 +1,66 @@
 from langchain_core.tools import tool
-from typing import TypedDict, Annotated, Sequence, List
+from typing import TypedDict, Annotated, Sequence, List, Optional
+import httpx
 from langchain_core.messages import BaseMessage, AnyMessage
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langgraph.prebuilt import create_react_agent
 from langchain_openai import ChatOpenAI
 from app.config import settings
+from app.agents.llm import build_llm
+from app.agents.budget import final_sub_agent_answer, run_graph_within_budget
+from app.agents.memo import IncompleteResult
+from app.agents.recording import replayable
+from app.services.mcp_pool import get_agent_graph
+from app.services.k8s_service import KubernetesError, deploy
 # Add other necessary imports for a ReAct agent later (LLM, Graph, ToolNode, etc.)
 
-# Tool Definition (MCP Placeholder)
+# Tool Definition (backed by the diff-based apply engine in app/services/k8s_service.py)
 @tool
-async def deploy_to_kubernetes(image_name: str, deployment_name: str, namespace: str = "default") -> str:
+@replayable("deploy_to_kubernetes")
+async def deploy_to_kubernetes(
+    image_name: str,
+    deployment_name: str,
+    namespace: str = "default",
+    replicas: int = 1,
+    container_port: Optional[int] = None
+) -> str:
     """Deploys a previously built Docker image to a Kubernetes cluster.
     Use this tool after a Docker image has been successfully built.
+    Resources that are unchanged since the last deploy are skipped.
     Input:
         image_name: The name and tag of the Docker image to deploy (e.g., myapp:latest).
         deployment_name: The desired name for the Kubernetes deployment resource.
         namespace: The Kubernetes namespace to deploy into (defaults to 'default').
+        replicas: Number of pod replicas (defaults to 1).
+        container_port: Port the container listens on; if given, a Service exposing it is also created.
     Output: A message indicating the success or failure of the Kubernetes deployment.
     This represents calling the Kubernetes MCP (mcp-server-kubernetes).
     """
     print(f"--- [K8s Sub-Agent Tool] Deploying {image_name} as {deployment_name} to ns {namespace} ---")
-    # TODO: Implement actual mcp-server-kubernetes client call
-    deploy_result = f"Deployment {deployment_name} created successfully in namespace {namespace} using image {image_name}."
+    try:
+        result = await deploy(image_name, deployment_name, namespace, replicas, container_port)
+        if not result.applied:
+            deploy_result = f"Deployment {deployment_name} in namespace {namespace} is already up to date with image {image_name}; nothing to apply."
+            if result.rollout_status:
+                # Nothing changed, but the previous rollout had not completed and was checked again
+                deploy_result += f" Status: {result.rollout_status}."
+        else:
+            deploy_result = (
+                f"Deployment {deployment_name} applied in namespace {namespace} using image {image_name}. "
+                f"Applied: {', '.join(result.applied)}."
+            )
+            if result.unchanged:
+                deploy_result += f" Unchanged: {', '.join(result.unchanged)}."
+            if result.rollout_status:
+                deploy_result += f" Status: {result.rollout_status}."
+    except (KubernetesError, httpx.HTTPError) as e:
+        deploy_result = f"Deployment {deployment_name} failed in namespace {namespace}: {e}"
     print(f"--- [K8s Sub-Agent Tool] Result: {deploy_result} ---")
     return deploy_result
 
 # Define the LLM for this sub-agent
 #k8s_llm = ChatOpenAI(temperature=0, streaming=True, api_key=settings.OPENAI_API_KEY)
-k8s_llm = ChatGoogleGenerativeAI(
-    model="gemini-2.5-flash-preview-04-17",
-    temperature=0.8,
-    max_tokens=None,
-    timeout=None,
-    max_retries=2
-)
+k8s_llm = build_llm("k8s")
 # Create the ReAct Agent for Kubernetes operations
 k8s_agent_graph = create_react_agent(
     model=k8s_llm,
@@ -41,18 +68,24 @@ k8s_agent_graph = create_react_agent(
     # prompt="You are a specialized agent for deploying applications to Kubernetes..."
 )
 
+# With a connected k8s MCP server, its tools are offered next to the diff-based deploy tool
+def _get_k8s_agent_graph():
+    return get_agent_graph(
+        "k8s", k8s_agent_graph, lambda mcp_tools: create_react_agent(model=k8s_llm, tools=[deploy_to_kubernetes, *mcp_tools])
+    )
+
 # Helper function to invoke this agent
 async def invoke_k8s_agent(query: str) -> str:
     """Invokes the kubernetes sub-agent to deploy an application."""
     print(f"--- Invoking K8s Sub-Agent with query: {query} ---")
     input_messages: List[AnyMessage] = [("user", query)] 
     try:
-        response = await k8s_agent_graph.ainvoke({"messages": input_messages})
-        final_message = response["messages"][-1].content if response["messages"] else "K8s agent finished without explicit response."
+        messages, exhausted_reason = await run_graph_within_budget(_get_k8s_agent_graph(), {"messages": input_messages})
+        final_message = final_sub_agent_answer(messages, exhausted_reason, "K8s agent finished without explicit response.")
         print(f"--- K8s Sub-Agent Result: {final_message} ---")
         return final_message
     except Exception as e:
         print(f"Error invoking k8s sub-agent: {e}")
-        return f"Error during k8s deployment: {str(e)}"
+        return IncompleteResult(f"Error during k8s deployment: {str(e)}")
 
 # TODO: Implement the ReAct graph logic for this sub-agent below 
\ No newline at end of file
@@ -1,75 +1,127 @@
 from langchain_core.tools import tool
-from typing import TypedDict, Annotated, Sequence, List
+from typing import TypedDict, Annotated, Sequence, List, Optional
 from langchain_core.messages import BaseMessage, AnyMessage
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langgraph.prebuilt import create_react_agent
 from langchain_openai import ChatOpenAI
 from app.config import settings
+from app.agents.llm import build_llm
+from app.agents.budget import final_sub_agent_answer, run_graph_within_budget
+from app.agents.memo import IncompleteResult
+from app.agents.recording import replayable
+from app.services.mcp_pool import get_agent_graph
+from app.services.terraform_service import PlanRecord, TerraformError, apply_plan, generate_plan, generate_plans
 # Add other necessary imports for a ReAct agent later (LLM, Graph, ToolNode, etc.)
 
-# Tool Definitions (MCP Placeholders)
+# Tool Definitions (backed by the local terraform engine in app/services/terraform_service.py)
 @tool
-async def apply_terraform_plan(plan_details: str, working_directory: str) -> str:
+@replayable("apply_terraform_plan")
+async def apply_terraform_plan(plan_details: str, working_directory: str, plan_digest: str, workspace: str = "default") -> str:
     """Applies a Terraform plan to provision or modify infrastructure.
     Use this tool after a Terraform plan has been generated and approved.
     It represents calling the Terraform MCP (tfmcp) to execute the plan.
     Input:
-        plan_details: A description or identifier of the Terraform plan to apply.
+        plan_details: A description of the Terraform plan to apply.
         working_directory: The directory containing the Terraform configuration files.
+        plan_digest: The plan digest reported by generate_terraform_plan. Stale plans are refused.
+        workspace: The Terraform workspace the plan was generated for (defaults to 'default').
     Output: A message indicating the success or failure of the Terraform apply operation.
     """
-    print(f"--- [Terraform Sub-Agent Tool] Applying plan in {working_directory} ---")
+    print(f"--- [Terraform Sub-Agent Tool] Applying plan {plan_digest} in {working_directory} ({workspace}) ---")
     print(f"--- [Terraform Sub-Agent Tool] Plan details: {plan_details} ---")
-    # TODO: Implement actual tfmcp client call or terraform CLI logic
-    apply_result = f"Terraform apply successful in {working_directory}. Resources created/updated."
+    try:
+        apply_summary = await apply_plan(working_directory, plan_digest, workspace)
+        apply_result = f"Terraform apply successful in {working_directory} ({workspace}): {apply_summary}"
+    except TerraformError as e:
+        apply_result = f"Terraform apply refused or failed: {e}"
     print(f"--- [Terraform Sub-Agent Tool] Result: {apply_result} ---")
     return apply_result
 
+def _format_plan(record: PlanRecord) -> str:
+    cache_note = " (cached, configuration unchanged)" if record.from_cache else ""
+    return (
+        f"Terraform plan for {record.working_directory} ({record.workspace}){cache_note}: "
+        f"{record.summary} Plan digest: {record.digest}"
+    )
+
 @tool
-async def generate_terraform_plan(config_details: str, working_directory: str) -> str:
+@replayable("generate_terraform_plan")
+async def generate_terraform_plan(config_details: str, working_directory: str, workspace: str = "default") -> str:
     """Generates a Terraform plan based on configuration files.
     Use this tool before applying changes to preview infrastructure modifications.
     It represents calling the Terraform MCP (tfmcp) to generate the plan.
+    If the configuration has not changed since the last plan, the cached plan is returned.
     Input:
         config_details: Description of the desired infrastructure state or configuration files.
         working_directory: The directory containing the Terraform configuration files.
-    Output: A summary of the Terraform plan, outlining proposed changes.
+        workspace: The Terraform workspace to plan (defaults to 'default').
+    Output: A summary of the Terraform plan, outlining proposed changes, and the plan digest needed to apply it.
     """
-    print(f"--- [Terraform Sub-Agent Tool] Generating plan in {working_directory} ---")
+    print(f"--- [Terraform Sub-Agent Tool] Generating plan in {working_directory} ({workspace}) ---")
     print(f"--- [Terraform Sub-Agent Tool] Config details: {config_details} ---")
-    # TODO: Implement actual tfmcp client call or terraform CLI logic
-    plan_result = f"Terraform plan generated for {working_directory}: Plan shows 2 to add, 0 to change, 0 to destroy."
+    try:
+        plan_result = _format_plan(await generate_plan(working_directory, workspace))
+    except TerraformError as e:
+        plan_result = f"Terraform plan failed: {e}"
+    print(f"--- [Terraform Sub-Agent Tool] Result: {plan_result} ---")
+    return plan_result
+
+@tool
+@replayable("generate_terraform_plans")
+async def generate_terraform_plans(config_details: str, working_directories: List[str], workspaces: Optional[List[str]] = None) -> str:
+    """Generates Terraform plans for several working directories and/or workspaces concurrently.
+    Prefer this over repeated generate_terraform_plan calls when more than one directory or workspace is involved.
+    Input:
+        config_details: Description of the desired infrastructure state or configuration files.
+        working_directories: The directories containing the Terraform configuration files.
+        workspaces: The Terraform workspaces to plan in every directory (defaults to ['default']).
+    Output: One plan summary and plan digest per directory/workspace pair.
+    """
+    workspaces = workspaces or ["default"]
+    targets = [(directory, workspace) for directory in working_directories for workspace in workspaces]
+    print(f"--- [Terraform Sub-Agent Tool] Generating {len(targets)} plans ---")
+    print(f"--- [Terraform Sub-Agent Tool] Config details: {config_details} ---")
+    results = await generate_plans(targets)
+    plan_result = "\n".join(
+        f"Terraform plan failed for {directory} ({workspace}): {result}" if isinstance(result, TerraformError) else _format_plan(result)
+        for (directory, workspace), result in zip(targets, results)
+    )
     print(f"--- [Terraform Sub-Agent Tool] Result: {plan_result} ---")
     return plan_result
 
 # Define the LLM for this sub-agent
 #terraform_llm = ChatOpenAI(temperature=0, streaming=True, api_key=settings.OPENAI_API_KEY)
-terraform_llm = ChatGoogleGenerativeAI(
-    model="gemini-2.5-flash-preview-04-17",
-    temperature=0.8,
-    max_tokens=None,
-    timeout=None,
-    max_retries=2
-)
+terraform_llm = build_llm("terraform")
 # Create the ReAct Agent for Terraform operations
 terraform_agent_graph = create_react_agent(
     model=terraform_llm,
-    tools=[generate_terraform_plan, apply_terraform_plan], # Both Terraform tools
+    tools=[generate_terraform_plan, generate_terraform_plans, apply_terraform_plan], # All Terraform tools
     # prompt="You are a specialized agent for managing infrastructure with Terraform..."
 )
 
+# With a connected terraform MCP server, its tools are offered next to the plan/apply tools
+def _get_terraform_agent_graph():
+    return get_agent_graph(
+        "terraform",
+        terraform_agent_graph,
+        lambda mcp_tools: create_react_agent(
+            model=terraform_llm,
+            tools=[generate_terraform_plan, generate_terraform_plans, apply_terraform_plan, *mcp_tools]
+        )
+    )
+
 # Helper function to invoke this agent
 async def invoke_terraform_agent(query: str) -> str:
     """Invokes the terraform sub-agent to plan or apply infrastructure changes."""
     print(f"--- Invoking Terraform Sub-Agent with query: {query} ---")
     input_messages: List[AnyMessage] = [("user", query)] 
     try:
-        response = await terraform_agent_graph.ainvoke({"messages": input_messages})
-        final_message = response["messages"][-1].content if response["messages"] else "Terraform agent finished without explicit response."
+        messages, exhausted_reason = await run_graph_within_budget(_get_terraform_agent_graph(), {"messages": input_messages})
+        final_message = final_sub_agent_answer(messages, exhausted_reason, "Terraform agent finished without explicit response.")
         print(f"--- Terraform Sub-Agent Result: {final_message} ---")
         return final_message
     except Exception as e:
         print(f"Error invoking terraform sub-agent: {e}")
-        return f"Error during terraform operation: {str(e)}"
+        return IncompleteResult(f"Error during terraform operation: {str(e)}")
 
 # TODO: Implement the ReAct graph logic for this sub-agent below 
\ No newline at end of file
@@ -1,4 +1,4 @@
-from typing import TypedDict, Annotated, List, Dict, Any, Sequence, Optional, Union
+from typing import TypedDict, Annotated, List, Dict, Any, Sequence, Optional, Union, Awaitable, Callable, Tuple
 
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_openai import ChatOpenAI
@@ -7,16 +7,23 @@ from langchain_core.tools import BaseTool, tool # Import tool decorator
 from langgraph.graph import StateGraph, END
 from langgraph.prebuilt import ToolNode
 from app.config import settings
+from app.agents.llm import build_llm
+from app.agents.budget import BudgetExceededError, TurnBudget, best_answer_so_far, run_graph_within_budget, use_budget
+from app.agents.memo import memoized_per_turn, use_turn_memo
+from app.agents.recording import is_replaying, start_recording, stop_recording
 # Import the invocation helpers from sub-agents
 from app.agents.sub_agents.analysis_agent import invoke_analysis_agent
 from app.agents.sub_agents.docker_agent import invoke_docker_agent
 from app.agents.sub_agents.k8s_agent import invoke_k8s_agent
 from app.agents.sub_agents.terraform_agent import invoke_terraform_agent
 # Keep history service and DB imports
-from app.services.history_service import add_message_to_history, get_history_by_session_id
-from app.database.database import AsyncSessionLocal
-from app.database.models import MessageSender
-import uuid
+from app.services.history_service import get_recent_history_by_session_id
+from app.services.message_store import decode_history, save_messages
+from app.database.database import scheduled_session
+from app.services.scheduler import (
+    LONG_RUNNING_SUB_AGENT_TOOLS, classify_turn, get_current_ticket, record_turn, use_turn_class
+)
+import asyncio
 
 # 1. Define Supervisor State (remains the same)
 class SupervisorState(TypedDict):
@@ -31,8 +38,10 @@ class SupervisorState(TypedDict):
 # NOTE: The input for these tools should be what the SUB-AGENT needs.
 # Often, just passing the user query or relevant context is enough.
 # We use 'query: str' for simplicity, but complex scenarios might need structured input.
+# @memoized_per_turn runs each distinct task at most once per turn (duplicate calls share the result).
 
 @tool
+@memoized_per_turn
 async def analysis_sub_agent_tool(task_description: str) -> str:
     """Delegates a task to the Repository Analysis sub-agent.
     Formulate a clear and specific task_description for what this sub-agent should do.
@@ -42,6 +51,7 @@ async def analysis_sub_agent_tool(task_description: str) -> str:
     return await invoke_analysis_agent(task_description)
 
 @tool
+@memoized_per_turn
 async def docker_sub_agent_tool(task_description: str) -> str:
     """Delegates a task to the Docker sub-agent.
     Formulate a clear and specific task_description for what this sub-agent should do (e.g., build an image).
@@ -51,6 +61,7 @@ async def docker_sub_agent_tool(task_description: str) -> str:
     return await invoke_docker_agent(task_description)
 
 @tool
+@memoized_per_turn
 async def k8s_sub_agent_tool(task_description: str) -> str:
     """Delegates a task to the Kubernetes sub-agent.
     Formulate a clear and specific task_description for what this sub-agent should do (e.g., deploy an application, check service status).
@@ -60,6 +71,7 @@ async def k8s_sub_agent_tool(task_description: str) -> str:
     return await invoke_k8s_agent(task_description)
 
 @tool
+@memoized_per_turn
 async def terraform_sub_agent_tool(task_description: str) -> str:
     """Delegates a task to the Terraform sub-agent.
     Formulate a clear and specific task_description for what this sub-agent should do (e.g., plan infrastructure changes, apply a configuration).
@@ -78,13 +90,7 @@ supervisor_tools: List[BaseTool] = [
 
 # 3. Define Supervisor LLM
 #supervisor_llm = ChatOpenAI(temperature=0, streaming=True, api_key=settings.OPENAI_API_KEY)
-supervisor_llm = ChatGoogleGenerativeAI(
-    model="gemini-2.5-flash-preview-04-17",
-    temperature=0.8,
-    max_tokens=None,
-    timeout=None,
-    max_retries=2
-)
+supervisor_llm = build_llm("supervisor")
 # Bind the *wrapper* tools to the supervisor LLM
 supervisor_llm_with_wrapper_tools = supervisor_llm.bind_tools(supervisor_tools)
 
@@ -113,7 +119,12 @@ async def supervisor_node(state: SupervisorState):
     
     print(f"--- SUPERVISOR NODE: Messages sent to LLM (including system prompt) ---\n{messages_for_llm}\n---")
     # Use the LLM bound with wrapper tools
-    response: AIMessage = await supervisor_llm_with_wrapper_tools.ainvoke(messages_for_llm)
+    try:
+        response: AIMessage = await supervisor_llm_with_wrapper_tools.ainvoke(messages_for_llm)
+    except BudgetExceededError as e:
+        # Out of time/steps/tokens or cancelled: finish the turn with the best answer so far (no tool calls -> END)
+        print(f"--- SUPERVISOR NODE: Turn budget exhausted: {e} ---")
+        response = AIMessage(content=best_answer_so_far(state["messages"], str(e)))
     print(f"--- SUPERVISOR NODE: LLM Response ---\n{response}\n---")
     return {"messages": [response]}
 
@@ -129,10 +140,15 @@ async def sub_agent_action_node(state: SupervisorState):
         return {"messages": []} 
 
     print(f"--- SUB-AGENT ACTION NODE: Supervisor Tool Calls ---\n{last_message.tool_calls}\n---")
+
+    # Delegating a build/deploy/provisioning task makes the turn long-running, whatever the user's wording
+    ticket = get_current_ticket()
+    if ticket is not None and any(tc["name"] in LONG_RUNNING_SUB_AGENT_TOOLS for tc in last_message.tool_calls):
+        ticket.mark_long_running()
     
-    # ToolNode expects the AIMessage containing the tool calls as input.
+    # ToolNode expects a list of messages ending with the AIMessage containing the tool calls.
     # It will then execute the corresponding wrapper tool.
-    tool_messages = await sub_agent_executor_node.ainvoke(last_message)
+    tool_messages = await sub_agent_executor_node.ainvoke([last_message])
     
     # Ensure result is a list for consistency
     if not isinstance(tool_messages, list):
@@ -140,27 +156,14 @@ async def sub_agent_action_node(state: SupervisorState):
     
     print(f"--- SUB-AGENT ACTION NODE: Sub-Agent Results --- \n{tool_messages}\n---")
 
-    # Persist the result from the sub-agent (which is now the ToolMessage content)
-    async with AsyncSessionLocal() as db:
-        for msg in tool_messages:
-            # Ensure it's a ToolMessage before accessing attributes
-            if isinstance(msg, ToolMessage):
-                 # Find the original tool call name that led to this message
-                 original_tool_name = "unknown_sub_agent" # Default
-                 for tc in last_message.tool_calls:
-                      if tc.get("id") == msg.tool_call_id:
-                           original_tool_name = tc.get("name", original_tool_name)
-                           break # Found the matching call
-                 
-                 await add_message_to_history(
-                    db=db,
-                    session_id=state["session_id"],
-                    sender_type=MessageSender.TOOL, # Representing the output of the sub-agent tool call
-                    message=str(msg.content),
-                    tool_name=original_tool_name # Log the wrapper tool name
-                 )
-            else:
-                 print(f"Warning: Expected ToolMessage from ToolNode, got {type(msg)}")
+    # Offline replays re-run recorded turns and must not write to chat_history
+    if is_replaying():
+        return {"messages": tool_messages}
+
+    # Persist the supervisor's tool calls together with the sub-agent results, so history
+    # replays the pairs losslessly (tool_call_ids included)
+    async with scheduled_session() as db:
+        await save_messages(db, state["session_id"], [last_message, *tool_messages])
 
     return {"messages": tool_messages}
 
@@ -194,67 +197,94 @@ supervisor_workflow.add_edge("sub_agent_action", "supervisor") # Loop back
 # Compile the graph
 multi_agent_graph = supervisor_workflow.compile()
 
-# Helper to format history (can remain largely the same)
-def _format_db_history_to_langchain_messages(db_history: List[Any]) -> List[BaseMessage]:
-    lc_messages = []
-    for msg in db_history:
-        if msg.sender_type == MessageSender.USER.value:
-            lc_messages.append(HumanMessage(content=msg.message))
-        elif msg.sender_type == MessageSender.AI.value:
-            lc_messages.append(AIMessage(content=msg.message))
-        elif msg.sender_type == MessageSender.TOOL:
-             # Representing the output of a sub-agent invocation (wrapper tool)
-             lc_messages.append(ToolMessage(
-                content=msg.message, 
-                tool_call_id=str(uuid.uuid4()), # History replay ID is less critical here
-                name=msg.tool_name or "unknown_sub_agent_tool_from_history"
-            ))
-    return lc_messages
+def final_ai_message(final_messages: List[BaseMessage], ai_response: str) -> AIMessage:
+    """The AI message to store for a turn: the graph's own final message (with ids/usage) when it is the response."""
+    last_message = final_messages[-1] if final_messages else None
+    if isinstance(last_message, AIMessage) and not last_message.tool_calls and last_message.content == ai_response:
+        return last_message
+    return AIMessage(content=ai_response)
+
+async def run_supervisor_turn(
+    session_id: str,
+    messages: List[BaseMessage],
+    user_request: Dict[str, Any],
+    budget: TurnBudget | None = None,
+    on_state: Callable[[List[BaseMessage]], Awaitable[None]] | None = None
+) -> Tuple[List[BaseMessage], str]:
+    """Runs the supervisor graph for one turn and returns (final messages, AI response).
+
+    Does not persist the user/AI messages; callers decide how (inline for /chat, in the background for WebSockets).
+    """
+    initial_graph_state = SupervisorState(messages=messages, user_request=user_request, session_id=session_id)
+
+    # Invoke the compiled supervisor graph under the turn budget,
+    # recording LLM/tool calls for offline replay if enabled
+    if budget is None:
+        budget = TurnBudget.from_settings()
+    config: Dict[str, Any] = {}
+    if settings.RECORDINGS_DIR:
+        recorder, recording_token = start_recording(session_id, settings.RECORDINGS_DIR)
+        recorder.record_initial_state(messages, user_request)
+        config["callbacks"] = [recorder]
+    # The turn's scheduling class decides its priority for LLM and DB slots (see app/services/scheduler.py)
+    turn_class = classify_turn(user_request.get("message") or "")
+    try:
+        with use_budget(budget), use_turn_memo(), use_turn_class(turn_class) as ticket:
+            try:
+                final_messages, exhausted_reason = await run_graph_within_budget(
+                    multi_agent_graph, initial_graph_state, config, on_state=on_state
+                )
+            finally:
+                record_turn(ticket)
+    finally:
+        if settings.RECORDINGS_DIR:
+            stop_recording(recording_token)
+            recording_path = await asyncio.to_thread(recorder.save)
+            print(f"--- SUPERVISOR: Turn recorded to {recording_path} ---")
+    final_graph_state = {"messages": final_messages}
+
+    ai_response_content = ""
+    if exhausted_reason:
+        ai_response_content = best_answer_so_far(final_messages, exhausted_reason)
+    elif final_graph_state and final_graph_state.get('messages'):
+        # Find the last AIMessage from the supervisor that doesn't call a tool
+        for msg in reversed(final_graph_state['messages']):
+            if isinstance(msg, AIMessage) and not msg.tool_calls:
+                ai_response_content = msg.content
+                break
+        # Fallback if the last message was a tool call result or AIMessage with tool call
+        if not ai_response_content and isinstance(final_graph_state['messages'][-1], (AIMessage, ToolMessage)):
+            # This might need refinement - what's the best final answer?
+            # Maybe the content of the last ToolMessage if no final AIMessage exists?
+            if isinstance(final_graph_state['messages'][-1], ToolMessage):
+                 ai_response_content = f"Completed task with result: {final_graph_state['messages'][-1].content}"
+            elif isinstance(final_graph_state['messages'][-1], AIMessage):
+                 ai_response_content = final_graph_state['messages'][-1].content # Could be an AIMessage with tool calls
+
+    if not ai_response_content:
+        ai_response_content = "Supervisor agent finished without a final message."
+    return final_messages, ai_response_content
 
 # Main interaction function (remains largely the same signature and db logic)
-async def run_multi_agent_interaction(session_id: str, user_message: str, repo_url: str | None) -> str:
-    """Runs the multi-agent supervisor, orchestrating sub-agents."""
-    async with AsyncSessionLocal() as db:
-        await add_message_to_history(
-            db=db, session_id=session_id, sender_type=MessageSender.USER.value, message=user_message
-        )
-        db_history = await get_history_by_session_id(db, session_id, limit=10)
-        formatted_history = _format_db_history_to_langchain_messages(db_history[:-1])
-        initial_messages = formatted_history + [HumanMessage(content=user_message)]
-
-        initial_graph_state = SupervisorState(
-            messages=initial_messages,
-            user_request={"message": user_message, "repo_url": repo_url},
-            session_id=session_id
-        )
-        
-        # Invoke the compiled supervisor graph
-        final_graph_state = await multi_agent_graph.ainvoke(initial_graph_state)
-        
-        ai_response_content = ""
-        if final_graph_state and final_graph_state.get('messages'):
-            # Find the last AIMessage from the supervisor that doesn't call a tool
-            for msg in reversed(final_graph_state['messages']):
-                if isinstance(msg, AIMessage) and not msg.tool_calls:
-                    ai_response_content = msg.content
-                    break
-            # Fallback if the last message was a tool call result or AIMessage with tool call
-            if not ai_response_content and isinstance(final_graph_state['messages'][-1], (AIMessage, ToolMessage)):
-                # This might need refinement - what's the best final answer?
-                # Maybe the content of the last ToolMessage if no final AIMessage exists?
-                if isinstance(final_graph_state['messages'][-1], ToolMessage):
-                     ai_response_content = f"Completed task with result: {final_graph_state['messages'][-1].content}"
-                elif isinstance(final_graph_state['messages'][-1], AIMessage):
-                     ai_response_content = final_graph_state['messages'][-1].content # Could be an AIMessage with tool calls
-
-        if ai_response_content:
-            await add_message_to_history(
-                db=db, session_id=session_id, sender_type=MessageSender.AI.value, message=ai_response_content
-            )
-        else:
-             ai_response_content = "Supervisor agent finished without a final message."
-             await add_message_to_history(
-                db=db, session_id=session_id, sender_type=MessageSender.AI.value, message=ai_response_content
-            )
-
-        return ai_response_content 
\ No newline at end of file
+async def run_multi_agent_interaction(
+    session_id: str, user_message: str, repo_url: str | None, budget: TurnBudget | None = None
+) -> str:
+    """Runs the multi-agent supervisor, orchestrating sub-agents, within a per-turn budget."""
+    # Short-lived sessions: a connection (and DB slot) is not held while the agents work
+    user_lc_message = HumanMessage(content=user_message)
+    async with scheduled_session() as db:
+        # Read before saving the new message, so a session resumed after a long pause still gets its context
+        db_history = await get_recent_history_by_session_id(db, session_id, limit=9)
+        await save_messages(db, session_id, [user_lc_message])
+    initial_messages = decode_history(db_history) + [user_lc_message]
+
+    final_messages, ai_response_content = await run_supervisor_turn(
+        session_id=session_id,
+        messages=initial_messages,
+        user_request={"message": user_message, "repo_url": repo_url},
+        budget=budget
+    )
+
+    async with scheduled_session() as db:
+        await save_messages(db, session_id, [final_ai_message(final_messages, ai_response_content)])
+    return ai_response_content
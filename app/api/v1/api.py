@@ -1,5 +1,6 @@
 from fastapi import APIRouter
-from app.api.v1.endpoints import chat
+from app.api.v1.endpoints import chat, metrics
  
 api_router_v1 = APIRouter()
-api_router_v1.include_router(chat.router, prefix="/chat", tags=["Chat Agent"]) 
\ No newline at end of file
+api_router_v1.include_router(chat.router, prefix="/chat", tags=["Chat Agent"])
+api_router_v1.include_router(metrics.router, prefix="/metrics", tags=["Metrics"])
@@ -1,48 +1,83 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
-
-from app.schemas.chat import ChatInput, ChatResponse, HistoryResponse, ChatMessageOutput
-from app.services.history_service import get_history_by_session_id # add_message_to_history is used by agent
-from app.database.database import get_db
-from app.agents.supervisor_agent import run_multi_agent_interaction
+from fastapi import APIRouter, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import Response, StreamingResponse
+from typing import Awaitable, List, Optional
+from datetime import datetime
+import json
+import asyncio
+import contextlib
+
+from app.schemas.chat import ChatInput, ChatResponse, HistoryResponse, ChatMessageOutput, BatchHistoryInput, BatchHistoryResponse
+from app.services.history_service import get_history_for_sessions, get_history_json_by_session_id, history_read_session, hot_window_start
+from app.database.database import scheduled_session
+from app.services.export_service import export_history_ndjson
+from app.agents.supervisor_agent import final_ai_message, run_multi_agent_interaction, run_supervisor_turn
+from app.agents.budget import TurnBudget
 from app.database.models import MessageSender # For mapping to ChatMessageOutput
+from app.services.session_store import discard_live_session, get_live_session, persist_in_background, trim_messages
+from langchain_core.messages import BaseMessage, HumanMessage, message_to_dict
 
 router = APIRouter()
 
+# How often a running /chat turn checks whether the client is still connected
+DISCONNECT_POLL_SECONDS = 0.5
+
+def _json_response(session_id: str, history_json: str, ai_response: str | None = None) -> Response:
+    """Wraps a history JSON array built by Postgres into a pre-serialized ChatResponse/HistoryResponse body.
+
+    Skips response_model validation and re-serialization; the schemas remain the documented contract.
+    """
+    body = '{"session_id":' + json.dumps(session_id)
+    if ai_response is not None:
+        body += ',"ai_response":' + json.dumps(ai_response)
+    body += ',"history":' + history_json + "}"
+    return Response(content=body.encode("utf-8"), media_type="application/json")
+
+async def _run_until_disconnect(request: Request, budget: TurnBudget, turn: Awaitable[str]) -> str:
+    """Awaits an agent turn, cancelling its budget as soon as the client disconnects."""
+    turn_task = asyncio.ensure_future(turn)
+    while not turn_task.done():
+        await asyncio.wait({turn_task}, timeout=DISCONNECT_POLL_SECONDS)
+        if not turn_task.done() and await request.is_disconnected():
+            print("Client disconnected, cancelling agent turn.")
+            budget.cancel()
+            break
+    return await turn_task
+
 @router.post("/chat", response_model=ChatResponse)
 async def chat_with_agent(
     chat_input: ChatInput,
-    db: AsyncSession = Depends(get_db)
+    request: Request
 ):
     """Endpoint for interacting with the multi-agent supervisor."""
     try:
-        ai_final_response = await run_multi_agent_interaction(
-            session_id=chat_input.session_id,
-            user_message=chat_input.message,
-            repo_url=chat_input.repo_url
+        # The budget is cancelled if the client disconnects, so the agents stop at their next LLM step
+        budget = TurnBudget.from_settings()
+        ai_final_response = await _run_until_disconnect(
+            request,
+            budget,
+            run_multi_agent_interaction(
+                session_id=chat_input.session_id,
+                user_message=chat_input.message,
+                repo_url=chat_input.repo_url,
+                budget=budget
+            )
         )
         
-        # Retrieve the latest history to include in the response
-        updated_db_history = await get_history_by_session_id(db, chat_input.session_id, limit=20)
-        
-        # Map DB history to ChatMessageOutput schema
-        formatted_history_output: List[ChatMessageOutput] = [
-            ChatMessageOutput(
-                id=msg.id,
-                session_id=msg.session_id,
-                sender_type=msg.sender_type, # Direct mapping if MessageSender enum values match strings
-                message=msg.message,
-                tool_name=msg.tool_name,
-                timestamp=msg.timestamp
+        # The turn bypassed any in-memory WebSocket state of this session
+        discard_live_session(chat_input.session_id)
+
+        # Retrieve the latest history, already serialized by Postgres, to include in the response
+        # (a session opened only now: holding one through the turn would pin a DB slot for minutes).
+        # Always the primary: the turn has just written this session and a replica may not have it yet
+        async with scheduled_session() as db:
+            history_json = await get_history_json_by_session_id(
+                db, chat_input.session_id, limit=20, since=hot_window_start()
             )
-            for msg in updated_db_history
-        ]
 
-        return ChatResponse(
+        return _json_response(
             session_id=chat_input.session_id,
-            ai_response=ai_final_response,
-            history=formatted_history_output
+            history_json=history_json or "[]",
+            ai_response=ai_final_response
         )
     except Exception as e:
         # Log the exception for debugging
@@ -50,27 +85,145 @@ async def chat_with_agent(
         # Potentially re-raise or return a more specific HTTP error
         raise HTTPException(status_code=500, detail=f"Agent interaction failed: {str(e)}")
 
-@router.get("/chat/history/{session_id}", response_model=HistoryResponse)
-async def get_chat_history(
-    session_id: str,
-    db: AsyncSession = Depends(get_db)
+async def _run_websocket_turn(websocket: WebSocket, session_id: str, payload: dict, budget: TurnBudget) -> None:
+    """Runs one turn on the in-memory session state, streaming new messages and persisting in the background."""
+    async def _send(event: dict) -> None:
+        # The client may already be gone; the turn still completes and is persisted
+        with contextlib.suppress(Exception):
+            await websocket.send_json(event)
+
+    try:
+        live_session = await get_live_session(session_id)
+    except Exception as e:
+        print(f"Error loading live session {session_id}: {e}")
+        await _send({"type": "error", "detail": f"Could not load the session history: {str(e)}"})
+        return
+
+    async with live_session.lock:
+        user_message = payload["message"]
+        user_lc_message = HumanMessage(content=user_message)
+        persist_in_background(session_id, [user_lc_message])
+        messages = live_session.messages + [user_lc_message]
+        sent_count = len(messages)
+
+        async def _stream_new_messages(state_messages: List[BaseMessage]) -> None:
+            nonlocal sent_count
+            for message in state_messages[sent_count:]:
+                await _send({"type": "message", "message": message_to_dict(message)})
+            sent_count = len(state_messages)
+
+        try:
+            final_messages, ai_response = await run_supervisor_turn(
+                session_id=session_id,
+                messages=messages,
+                user_request={"message": user_message, "repo_url": payload.get("repo_url")},
+                budget=budget,
+                on_state=_stream_new_messages
+            )
+        except Exception as e:
+            print(f"Error in WebSocket turn for session {session_id}: {e}")
+            await _send({"type": "error", "detail": f"Agent interaction failed: {str(e)}"})
+            return
+
+        ai_message = final_ai_message(final_messages, ai_response)
+        if not final_messages or ai_message is not final_messages[-1]:
+            final_messages = final_messages + [ai_message]
+        live_session.messages = trim_messages(final_messages)
+        live_session.touch()
+        persist_in_background(session_id, [ai_message])
+        await _send({"type": "final", "session_id": session_id, "ai_response": ai_response})
+
+@router.websocket("/chat/ws/{session_id}")
+async def chat_websocket(websocket: WebSocket, session_id: str):
+    """WebSocket for interactive sessions: conversation state stays in memory between turns.
+
+    Client messages: {"message": str, "repo_url": str | null} to start a turn, {"type": "cancel"} to stop it.
+    Server events: {"type": "message"} per new graph message, {"type": "final"} with the AI response, {"type": "error"}.
+    """
+    await websocket.accept()
+    turn_task: asyncio.Task | None = None
+    budget: TurnBudget | None = None
+    try:
+        while True:
+            try:
+                payload = json.loads(await websocket.receive_text())
+            except ValueError:
+                payload = None
+            if not isinstance(payload, dict):
+                await websocket.send_json({"type": "error", "detail": "Expected a JSON object."})
+                continue
+            if payload.get("type") == "cancel":
+                if budget is not None:
+                    budget.cancel()
+                continue
+            if not payload.get("message"):
+                await websocket.send_json({"type": "error", "detail": "Expected a 'message' field."})
+                continue
+            if turn_task is not None and not turn_task.done():
+                await websocket.send_json({"type": "error", "detail": "A turn is already running for this session."})
+                continue
+            budget = TurnBudget.from_settings()
+            turn_task = asyncio.create_task(_run_websocket_turn(websocket, session_id, payload, budget))
+    except WebSocketDisconnect:
+        pass
+    finally:
+        # Stop the running turn at its next LLM step (what it produced is still persisted) and wait for it,
+        # so the task stays referenced until it ends and its errors are reported
+        if budget is not None:
+            budget.cancel()
+        if turn_task is not None:
+            try:
+                await turn_task
+            except Exception as e:
+                print(f"Error in WebSocket turn for session {session_id}: {e}")
+
+# Declared before /chat/history/{session_id} so "export" is not captured as a session ID
+@router.get("/chat/history/export")
+async def export_chat_history(
+    start: Optional[datetime] = Query(None, description="Inclusive lower bound on message timestamp."),
+    end: Optional[datetime] = Query(None, description="Exclusive upper bound on message timestamp."),
+    session_id: Optional[List[str]] = Query(None, description="Restrict the export to these session IDs."),
 ):
+    """Streams chat history as NDJSON (one message per line) for analytics exports."""
+    return StreamingResponse(
+        export_history_ndjson(start=start, end=end, session_ids=session_id),
+        media_type="application/x-ndjson",
+    )
+
+@router.post("/chat/history/batch", response_model=BatchHistoryResponse)
+async def get_batch_chat_history(batch_input: BatchHistoryInput):
+    """Endpoint to retrieve the most recent messages of several sessions in one request."""
+    # Deduplicate while keeping the caller's order
+    session_ids = list(dict.fromkeys(batch_input.session_ids))
+    async with history_read_session(session_ids) as db:
+        grouped_history = await get_history_for_sessions(db, session_ids, limit_per_session=batch_input.limit_per_session)
+
+    return BatchHistoryResponse(
+        sessions=[
+            HistoryResponse(
+                session_id=session_id,
+                history=[
+                    ChatMessageOutput(
+                        id=msg.id,
+                        session_id=msg.session_id,
+                        sender_type=msg.sender_type,
+                        message=msg.message,
+                        tool_name=msg.tool_name,
+                        timestamp=msg.timestamp
+                    )
+                    for msg in grouped_history[session_id]
+                ]
+            )
+            for session_id in session_ids
+        ]
+    )
+
+@router.get("/chat/history/{session_id}", response_model=HistoryResponse)
+async def get_chat_history(session_id: str):
     """Endpoint to retrieve chat history for a given session ID."""
-    db_history = await get_history_by_session_id(db, session_id)
-    if not db_history:
+    async with history_read_session([session_id]) as db:
+        history_json = await get_history_json_by_session_id(db, session_id)
+    if history_json is None:
         raise HTTPException(status_code=404, detail="Chat history not found for this session ID.")
 
-    # Map DB history to ChatMessageOutput schema
-    formatted_history_output: List[ChatMessageOutput] = [
-        ChatMessageOutput(
-            id=msg.id,
-            session_id=msg.session_id,
-            sender_type=msg.sender_type, # Direct mapping
-            message=msg.message,
-            tool_name=msg.tool_name,
-            timestamp=msg.timestamp
-        )
-        for msg in db_history
-    ]
-    
-    return HistoryResponse(session_id=session_id, history=formatted_history_output) 
\ No newline at end of file
+    return _json_response(session_id=session_id, history_json=history_json)
@@ -0,0 +1,31 @@
+from fastapi import APIRouter
+
+from app.agents.cascade import get_cascade_metrics
+from app.agents.hedging import get_hedge_metrics
+from app.agents.memo import get_memo_metrics
+from app.services.history_service import get_read_routing_metrics
+from app.services.mcp_pool import get_mcp_metrics
+from app.services.scheduler import get_scheduler_metrics
+
+router = APIRouter()
+
+@router.get("/llm")
+async def get_llm_metrics():
+    """Endpoint exposing per-role LLM call metrics (hedged requests and hedge wins, cascade escalations)
+    and the sub-agent runs saved by the per-turn memo."""
+    return {"hedging": get_hedge_metrics(), "cascade": get_cascade_metrics(), "memo": get_memo_metrics()}
+
+@router.get("/mcp")
+async def get_mcp_pool_metrics():
+    """Endpoint exposing the state of the pooled MCP server sessions (connection, tools, calls, restarts)."""
+    return get_mcp_metrics()
+
+@router.get("/scheduler")
+async def get_scheduler_slo_metrics():
+    """Endpoint exposing turn latency percentiles and SLO attainment per class, slot usage and preemptions."""
+    return get_scheduler_metrics()
+
+@router.get("/db")
+async def get_db_routing_metrics():
+    """Endpoint exposing read replica health (lag, last error) and how history reads were routed."""
+    return get_read_routing_metrics()
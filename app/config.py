@@ -1,4 +1,5 @@
 import os
+from typing import Any, Dict, List, Literal
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from dotenv import load_dotenv
 
@@ -17,6 +18,88 @@ class Settings(BaseSettings):
     OPENAI_API_KEY: str
     LANGCHAIN_TRACING_V2: str = False
     LANGCHAIN_API_KEY: str | None = None
+    # Rows fetched per round trip by the server-side cursor used for history exports
+    HISTORY_EXPORT_YIELD_PER: int = 1000
+    # Responses smaller than this (in bytes) are sent uncompressed
+    RESPONSE_GZIP_MINIMUM_SIZE: int = 1000
+    # In-memory conversation state of WebSocket sessions (app/services/session_store.py)
+    LIVE_SESSION_IDLE_SECONDS: float = 900
+    LIVE_SESSION_EVICTION_INTERVAL_SECONDS: float = 60
+    LIVE_SESSION_MAX_MESSAGES: int = 50
+    # Terraform engine (app/services/terraform_service.py); point TERRAFORM_BIN at a stand-in script for local testing
+    TERRAFORM_BIN: str = "terraform"
+    TERRAFORM_PLAN_DIR: str = "/tmp/autodeploia/terraform-plans"
+    TERRAFORM_MAX_CONCURRENT_PLANS: int = 4
+    TERRAFORM_TIMEOUT_SECONDS: float = 900
+    # Kubernetes apply engine (app/services/k8s_service.py); K8S_API_URL can point at a local fake API server
+    K8S_API_URL: str = "https://kubernetes.default.svc"
+    K8S_TOKEN: str | None = None
+    K8S_CA_CERT: str | None = None
+    K8S_VERIFY_SSL: bool = True
+    K8S_FIELD_MANAGER: str = "autodeploia"
+    K8S_ROLLOUT_TIMEOUT_SECONDS: float = 300
+    # How long a redeploy may trust this process's record of applied objects without reading them from the API
+    K8S_APPLIED_CACHE_TTL_SECONDS: float = 30
+    # MCP servers kept connected by app/services/mcp_pool.py, keyed by sub-agent ("docker", "k8s", "terraform").
+    # Each value is a stdio server definition: {"command": "...", "args": [...], "env": {...}, "cwd": "..."}
+    MCP_SERVERS: Dict[str, Dict[str, Any]] = {}
+    MCP_CONNECT_TIMEOUT_SECONDS: float = 30
+    MCP_CALL_TIMEOUT_SECONDS: float = 600
+    MCP_HEALTH_CHECK_INTERVAL_SECONDS: float = 30
+    MCP_PING_TIMEOUT_SECONDS: float = 10
+    MCP_MAX_RESTART_BACKOFF_SECONDS: float = 60
+    # Connection pool of the async engine; the scheduler's DB slots cover exactly this many connections
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 5
+    # Optional streaming replica for history reads (same pool sizes as the primary)
+    DATABASE_REPLICA_URL: str | None = None
+    # Reads of a session written less than this long ago go to the primary (read-your-writes)
+    REPLICA_READ_YOUR_WRITES_SECONDS: float = 10
+    # The replica is bypassed while its replay lag exceeds this, or while the lag check fails
+    REPLICA_MAX_LAG_SECONDS: float = 5
+    REPLICA_LAG_CHECK_INTERVAL_SECONDS: float = 5
+    # chat_history partitioning, retention and compaction (app/services/partition_service.py)
+    HISTORY_PARTITIONS_AHEAD: int = 3
+    # Whole months kept besides the current one; 0 keeps every partition
+    HISTORY_RETENTION_MONTHS: int = 0
+    # "archive" detaches expired partitions into HISTORY_ARCHIVE_SCHEMA, "drop" deletes them
+    HISTORY_RETENTION_ACTION: Literal["archive", "drop"] = "archive"
+    HISTORY_ARCHIVE_SCHEMA: str = "chat_archive"
+    # Sessions without messages for this long are summarized into chat_session_summaries
+    HISTORY_DEAD_SESSION_DAYS: float = 30
+    HISTORY_MAINTENANCE_INTERVAL_SECONDS: float = 3600
+    # Agent context reads look only this far back. A session with nothing more recent is read around the last
+    # message of its summary, so keep this above HISTORY_DEAD_SESSION_DAYS plus the maintenance interval
+    HISTORY_HOT_WINDOW_DAYS: float = 31
+    # Priority scheduling of interactive vs long-running turns (app/services/scheduler.py)
+    SCHEDULER_LLM_SLOTS: int = 8
+    SCHEDULER_LLM_INTERACTIVE_RESERVED: int = 3
+    SCHEDULER_DB_INTERACTIVE_RESERVED: int = 4
+    SCHEDULER_MAX_PREEMPT_SECONDS: float = 5
+    SCHEDULER_PREEMPT_POLL_SECONDS: float = 0.05
+    SCHEDULER_METRICS_WINDOW: int = 500
+    SCHEDULER_SLO_SECONDS: Dict[str, float] = {"interactive": 15, "long_running": 600}
+    # When set, every supervisor turn is recorded here for offline replay (python -m app.agents.recording <file>)
+    RECORDINGS_DIR: str | None = None
+    # Per-turn limits shared by the supervisor and all sub-agents (a step is one LLM call)
+    TURN_DEADLINE_SECONDS: float = 180
+    TURN_MAX_STEPS: int = 25
+    TURN_MAX_TOKENS: int = 200_000
+    # Upper bound for a single LLM call (also capped by the remaining turn deadline)
+    LLM_TIMEOUT_SECONDS: float = 60
+    LLM_MODEL: str = "gemini-2.5-flash-preview-04-17"
+    LLM_TEMPERATURE: float = 0.8
+    # Per-role model cascade, cheapest first (JSON in the environment). Roles not listed use LLM_MODEL only.
+    LLM_CASCADE: Dict[str, List[str]] = {
+        "docker": ["gemini-2.0-flash-lite", "gemini-2.5-flash-preview-04-17"],
+        "k8s": ["gemini-2.0-flash-lite", "gemini-2.5-flash-preview-04-17"],
+    }
+    # Hedged LLM requests: duplicate a call still running after the role's recent latency percentile
+    LLM_HEDGE_ENABLED: bool = False
+    LLM_HEDGE_PERCENTILE: float = 95
+    LLM_HEDGE_MAX_RATE: float = 0.1
+    LLM_HEDGE_MIN_SAMPLES: int = 20
+    LLM_HEDGE_WINDOW: int = 200
 
     model_config = SettingsConfigDict(env_file="../.env", env_file_encoding='utf-8', extra='ignore')
 
@@ -1,9 +1,17 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
 from app.config import settings
+from app.services.scheduler import db_slots, replica_db_slots
 
 engine = create_async_engine(
     settings.DATABASE_URL,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
     # echo=True, # Uncomment for debugging SQL queries
 )
 
@@ -15,10 +23,100 @@ AsyncSessionLocal = sessionmaker(
     autocommit=False
 )
 
+# Optional read replica (DATABASE_REPLICA_URL); history reads are routed to it by history_service
+replica_engine = create_async_engine(
+    settings.DATABASE_REPLICA_URL,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+) if settings.DATABASE_REPLICA_URL else None
+
+ReplicaSessionLocal = sessionmaker(
+    bind=replica_engine,
+    class_=AsyncSession,
+    expire_on_commit=False,
+    autoflush=False,
+    autocommit=False
+) if replica_engine is not None else None
+
+# Replay lag of a streaming replica; 0 when caught up or when the server is not a standby
+_REPLICA_LAG_SQL = text(
+    """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+    """
+)
+
+class ReplicaStatus:
+    """Latest replica health as seen by the lag monitor; the replica is unusable until the first check passes."""
+
+    def __init__(self) -> None:
+        self.lag_seconds: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.checked_at: Optional[float] = None
+
+    def usable(self) -> bool:
+        return (
+            replica_engine is not None
+            and self.last_error is None
+            and self.lag_seconds is not None
+            and self.lag_seconds <= settings.REPLICA_MAX_LAG_SECONDS
+        )
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "configured": replica_engine is not None,
+            "usable": self.usable(),
+            "lag_seconds": self.lag_seconds,
+            "last_error": self.last_error,
+            "checked_at": self.checked_at,
+        }
+
+replica_status = ReplicaStatus()
+
+async def check_replica_lag() -> None:
+    try:
+        async with replica_engine.connect() as connection:
+            lag = await asyncio.wait_for(
+                connection.scalar(_REPLICA_LAG_SQL), timeout=settings.REPLICA_LAG_CHECK_INTERVAL_SECONDS
+            )
+        replica_status.lag_seconds = float(lag)
+        replica_status.last_error = None
+    except Exception as e:
+        replica_status.last_error = str(e) or type(e).__name__
+        print(f"Replica lag check failed, reading from the primary: {replica_status.last_error}")
+    replica_status.checked_at = time.time()
+
+async def run_replica_lag_monitor() -> None:
+    """Background loop refreshing replica_status; started from the application lifespan if a replica is set."""
+    while True:
+        await check_replica_lag()
+        await asyncio.sleep(settings.REPLICA_LAG_CHECK_INTERVAL_SECONDS)
+
+@asynccontextmanager
+async def scheduled_session(turn_class: Optional[str] = None):
+    """Opens a session once a DB slot is free for the turn class (default: the current turn's class).
+
+    Interactive work has slots reserved, so long-running turns and exports can not exhaust the pool.
+    Keep these sessions short: the slot is held until the block exits.
+    """
+    async with db_slots.slot(turn_class):
+        async with AsyncSessionLocal() as session:
+            yield session
+
+@asynccontextmanager
+async def scheduled_replica_session(turn_class: Optional[str] = None):
+    """Like scheduled_session, on the read replica. Callers must check replica_status.usable() first."""
+    async with replica_db_slots.slot(turn_class):
+        async with ReplicaSessionLocal() as session:
+            yield session
+
 async def get_db() -> AsyncSession:
     """Dependency to get an async database session."""
-    async with AsyncSessionLocal() as session:
+    async with scheduled_session() as session:
         try:
             yield session
         finally:
-            await session.close() 
\ No newline at end of file
+            await session.close()
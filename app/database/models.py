@@ -1,5 +1,6 @@
 import uuid
-from sqlalchemy import Column, String, DateTime, Text, UUID, Enum as SQLEnum
+from sqlalchemy import Column, String, DateTime, Integer, Index, Text, UUID, Enum as SQLEnum
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB
 from sqlalchemy.orm import declarative_base
 from sqlalchemy.sql import func
 import enum
@@ -13,13 +14,37 @@ class MessageSender(enum.Enum):
 
 class ChatHistory(Base):
     __tablename__ = "chat_history"
+    # Monthly range partitions on timestamp, managed by app/services/partition_service.py (see migration 0003)
+    __table_args__ = (
+        Index("ix_chat_history_session_id_timestamp", "session_id", "timestamp"),
+        {"postgresql_partition_by": "RANGE (timestamp)"},
+    )
 
+    # The partition key has to be part of the primary key
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    session_id = Column(String, index=True, nullable=False)
-    sender_type = Column(Text, nullable=False)
+    session_id = Column(String, nullable=False)
+    sender_type = Column(Text, nullable=False) # MessageSender value ("user", "ai", "tool")
     message = Column(Text, nullable=False)
     tool_name = Column(String, nullable=True) # Name of the tool if sender_type is TOOL
-    timestamp = Column(DateTime(timezone=True), server_default=func.now())
+    timestamp = Column(DateTime(timezone=True), primary_key=True, server_default=func.now())
+    # Full LangChain message (tool calls, tool_call_id, ids, usage) in compact form, see app/services/message_store.py
+    payload = Column(JSONB, nullable=True)
 
     def __repr__(self):
-        return f"<ChatHistory(session_id='{self.session_id}', sender='{self.sender_type.value}', timestamp='{self.timestamp}')>" 
\ No newline at end of file
+        return f"<ChatHistory(session_id='{self.session_id}', sender='{self.sender_type}', timestamp='{self.timestamp}')>" 
+
+class ChatSessionSummary(Base):
+    """Compact record of a dead session, written by the compaction job before its partitions are retired."""
+    __tablename__ = "chat_session_summaries"
+
+    session_id = Column(String, primary_key=True)
+    first_message_at = Column(DateTime(timezone=True), nullable=False)
+    last_message_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    message_count = Column(Integer, nullable=False)
+    tools_used = Column(ARRAY(String), nullable=False, server_default="{}")
+    first_user_message = Column(Text, nullable=True)
+    last_ai_message = Column(Text, nullable=True)
+    summarized_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    def __repr__(self):
+        return f"<ChatSessionSummary(session_id='{self.session_id}', messages={self.message_count}, last='{self.last_message_at}')>"
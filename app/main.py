@@ -1,8 +1,14 @@
 from fastapi import FastAPI
+from fastapi.middleware.gzip import GZipMiddleware
 from contextlib import asynccontextmanager
+import asyncio
 from app.api.v1.api import api_router_v1
-from app.database.database import engine # Import engine
+from app.database.database import engine, replica_engine, run_replica_lag_monitor
 from app.database.models import Base # Import Base
+from app.config import settings
+from app.services.mcp_pool import start_mcp_pool, stop_mcp_pool
+from app.services.partition_service import run_partition_maintenance
+from app.services.session_store import drain_background_writes, run_idle_eviction
 
 # Lifespan context manager for startup/shutdown logic
 @asynccontextmanager
@@ -11,9 +17,21 @@ async def lifespan(app: FastAPI):
     # The dedicated 'migrations' service in docker-compose.yml now handles migrations.
     # Programmatic migration runs from here have been removed to avoid redundancy and errors.
     print("Application startup: Database migrations are handled by the 'migrations' service.")
+    eviction_task = asyncio.create_task(run_idle_eviction())
+    # Creates upcoming chat_history partitions, summarizes dead sessions and applies the retention policy
+    maintenance_task = asyncio.create_task(run_partition_maintenance())
+    await start_mcp_pool()
+    # History reads use the replica only after the lag monitor has found it healthy
+    lag_monitor_task = asyncio.create_task(run_replica_lag_monitor()) if replica_engine is not None else None
 
     yield
     # Shutdown logic: Clean up resources if needed
+    eviction_task.cancel()
+    maintenance_task.cancel()
+    if lag_monitor_task is not None:
+        lag_monitor_task.cancel()
+    await drain_background_writes()
+    await stop_mcp_pool()
     print("Application shutdown.")
 
 app = FastAPI(
@@ -22,6 +40,9 @@ app = FastAPI(
     lifespan=lifespan # Use the lifespan manager
 )
 
+# Compress larger JSON/NDJSON bodies (history reads, exports) when the client accepts gzip
+app.add_middleware(GZipMiddleware, minimum_size=settings.RESPONSE_GZIP_MINIMUM_SIZE)
+
 # Include the API router
 app.include_router(api_router_v1, prefix="/api/v1")
 
@@ -29,4 +29,11 @@ class ChatResponse(BaseModel):
 
 class HistoryResponse(BaseModel):
     session_id: str
-    history: List[ChatMessageOutput] 
\ No newline at end of file
+    history: List[ChatMessageOutput] 
+
+class BatchHistoryInput(BaseModel):
+    session_ids: List[str] = Field(..., min_length=1, max_length=200, description="Session IDs to fetch history for.")
+    limit_per_session: int = Field(20, ge=1, le=100, description="Maximum number of most recent messages per session.")
+
+class BatchHistoryResponse(BaseModel):
+    sessions: List[HistoryResponse]
@@ -0,0 +1,124 @@
+import argparse
+import asyncio
+import json
+from datetime import datetime
+from typing import AsyncIterator, List
+
+from app.config import settings
+from app.services.scheduler import LONG_RUNNING
+from app.services.history_service import history_read_session, stream_history_rows
+
+# Number of NDJSON lines joined into a single chunk before it is handed to the HTTP response
+NDJSON_LINES_PER_CHUNK = 500
+
+
+def _row_to_dict(row) -> dict:
+    """Maps a chat_history row (plain columns, not an ORM object) to a JSON-serializable dict."""
+    return {
+        "id": str(row.id),
+        "session_id": row.session_id,
+        "sender_type": row.sender_type,
+        "message": row.message,
+        "tool_name": row.tool_name,
+        "timestamp": row.timestamp.isoformat() if row.timestamp else None,
+    }
+
+
+async def export_history_ndjson(
+    start: datetime | None = None,
+    end: datetime | None = None,
+    session_ids: List[str] | None = None,
+) -> AsyncIterator[bytes]:
+    """Yields the matching chat history as NDJSON chunks.
+
+    Opens its own DB session because the generator outlives the request dependency scope
+    when used as a StreamingResponse body. Exports read from the replica when one is usable.
+    """
+    async with history_read_session(turn_class=LONG_RUNNING) as db:
+        lines: List[str] = []
+        async for row in stream_history_rows(
+            db, start=start, end=end, session_ids=session_ids, yield_per=settings.HISTORY_EXPORT_YIELD_PER
+        ):
+            lines.append(json.dumps(_row_to_dict(row), ensure_ascii=False))
+            if len(lines) >= NDJSON_LINES_PER_CHUNK:
+                yield ("\n".join(lines) + "\n").encode("utf-8")
+                lines = []
+        if lines:
+            yield ("\n".join(lines) + "\n").encode("utf-8")
+
+
+async def export_history_parquet(
+    output_path: str,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    session_ids: List[str] | None = None,
+) -> int:
+    """Writes the matching chat history to a Parquet file, one row group per cursor batch.
+
+    Returns the number of rows written.
+    """
+    # pyarrow is only needed for Parquet exports, so it is imported lazily
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ("id", pa.string()),
+        ("session_id", pa.string()),
+        ("sender_type", pa.string()),
+        ("message", pa.string()),
+        ("tool_name", pa.string()),
+        ("timestamp", pa.timestamp("us", tz="UTC")),
+    ])
+    batch_size = settings.HISTORY_EXPORT_YIELD_PER
+    total_rows = 0
+
+    def _flush(writer, columns: dict) -> None:
+        writer.write_batch(pa.record_batch([columns[name] for name in schema.names], schema=schema))
+        for values in columns.values():
+            values.clear()
+
+    with pq.ParquetWriter(output_path, schema) as writer:
+        columns: dict = {name: [] for name in schema.names}
+        async with history_read_session(turn_class=LONG_RUNNING) as db:
+            async for row in stream_history_rows(
+                db, start=start, end=end, session_ids=session_ids, yield_per=batch_size
+            ):
+                columns["id"].append(str(row.id))
+                columns["session_id"].append(row.session_id)
+                columns["sender_type"].append(row.sender_type)
+                columns["message"].append(row.message)
+                columns["tool_name"].append(row.tool_name)
+                columns["timestamp"].append(row.timestamp)
+                total_rows += 1
+                if len(columns["id"]) >= batch_size:
+                    _flush(writer, columns)
+        if columns["id"]:
+            _flush(writer, columns)
+
+    return total_rows
+
+
+async def _run_cli(args: argparse.Namespace) -> None:
+    start = datetime.fromisoformat(args.start) if args.start else None
+    end = datetime.fromisoformat(args.end) if args.end else None
+    session_ids = args.session_id or None
+
+    if args.format == "parquet":
+        written = await export_history_parquet(args.output, start=start, end=end, session_ids=session_ids)
+        print(f"Exported {written} chat history rows to {args.output}")
+        return
+
+    with open(args.output, "wb") as output_file:
+        async for chunk in export_history_ndjson(start=start, end=end, session_ids=session_ids):
+            output_file.write(chunk)
+    print(f"Exported chat history to {args.output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk export of chat_history as NDJSON or Parquet.")
+    parser.add_argument("--format", choices=["ndjson", "parquet"], default="ndjson")
+    parser.add_argument("--output", required=True, help="Destination file path.")
+    parser.add_argument("--start", help="Inclusive lower bound on timestamp (ISO 8601).")
+    parser.add_argument("--end", help="Exclusive upper bound on timestamp (ISO 8601).")
+    parser.add_argument("--session-id", action="append", help="Restrict to this session (repeatable).")
+    asyncio.run(_run_cli(parser.parse_args()))
@@ -1,39 +1,234 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import desc # Import desc
-from typing import List
+from sqlalchemy.orm import aliased
+from sqlalchemy import desc, func, cast, Text, Row # Import desc
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence
+from datetime import datetime, timedelta, timezone
+from collections import Counter
+from contextlib import asynccontextmanager
+import time
 
-from app.database.models import ChatHistory, MessageSender
+from app.config import settings
+from app.database.database import replica_engine, replica_status, scheduled_replica_session, scheduled_session
+from app.database.models import ChatHistory, ChatSessionSummary, MessageSender
 from app.schemas.chat import ChatMessageOutput
 
+# session_id -> monotonic time of this process's last committed write to it (read-your-writes window)
+_recent_writes: Dict[str, float] = {}
+_read_routes: Counter = Counter()
+
+def note_session_write(session_id: str) -> None:
+    """Records that a session was just written, so its reads stay on the primary for a while."""
+    now = time.monotonic()
+    _recent_writes[session_id] = now
+    if len(_recent_writes) > 10_000:
+        horizon = now - settings.REPLICA_READ_YOUR_WRITES_SECONDS
+        for stale_session_id in [key for key, written in _recent_writes.items() if written < horizon]:
+            del _recent_writes[stale_session_id]
+
+def _written_recently(session_ids: Sequence[str]) -> bool:
+    horizon = time.monotonic() - settings.REPLICA_READ_YOUR_WRITES_SECONDS
+    return any(_recent_writes.get(session_id, 0.0) >= horizon for session_id in session_ids)
+
+@asynccontextmanager
+async def history_read_session(session_ids: Optional[Sequence[str]] = None, turn_class: Optional[str] = None):
+    """Opens a session for history reads, on the read replica when it is safe to.
+
+    Reads of sessions written within REPLICA_READ_YOUR_WRITES_SECONDS go to the primary, so a client
+    always sees its own messages; bulk reads (`session_ids=None`, e.g. exports) tolerate replica lag.
+    The primary is also used when no replica is configured, or while it lags or fails its health check.
+    """
+    if replica_engine is None:
+        route = "primary"
+    elif session_ids and _written_recently(session_ids):
+        route = "primary_read_your_writes"
+    elif not replica_status.usable():
+        route = "primary_replica_unusable"
+    else:
+        route = "replica"
+    _read_routes[route] += 1
+    open_session = scheduled_replica_session if route == "replica" else scheduled_session
+    async with open_session(turn_class) as db:
+        yield db
+
+def get_read_routing_metrics() -> Dict[str, Any]:
+    return {"replica": replica_status.as_dict(), "reads": dict(_read_routes)}
+
 async def add_message_to_history(
     db: AsyncSession,
     session_id: str,
-    sender_type: MessageSender,
+    sender_type: MessageSender | str,
     message: str,
     tool_name: str | None = None
 ) -> ChatHistory:
-    """Adds a single message to the chat history."""
+    """Adds a single text message to the chat history (use message_store.save_messages for LangChain messages)."""
     db_message = ChatHistory(
         session_id=session_id,
-        sender_type=sender_type,
+        # Callers pass either the enum or its value; the column always stores the value
+        sender_type=MessageSender(sender_type).value,
         message=message,
         tool_name=tool_name
     )
     db.add(db_message)
     await db.commit()
+    note_session_write(session_id)
     await db.refresh(db_message)
     return db_message
 
 async def get_history_by_session_id(
-    db: AsyncSession, session_id: str, limit: int = 100
+    db: AsyncSession,
+    session_id: str,
+    limit: int = 100,
+    since: datetime | None = None,
+    until: datetime | None = None,
 ) -> List[ChatHistory]:
-    """Retrieves chat history for a given session ID, ordered by timestamp."""
+    """Retrieves chat history for a given session ID, ordered by timestamp.
+
+    With `since` and/or `until` (inclusive), only the partitions covering that range are read.
+    """
+    query = select(ChatHistory).where(ChatHistory.session_id == session_id)
+    if since is not None:
+        query = query.where(ChatHistory.timestamp >= since)
+    if until is not None:
+        query = query.where(ChatHistory.timestamp <= until)
     result = await db.execute(
-        select(ChatHistory)
-        .where(ChatHistory.session_id == session_id)
+        query
         .order_by(desc(ChatHistory.timestamp)) # Order by timestamp descending
         .limit(limit)
     )
     history = result.scalars().all()
-    return list(reversed(history)) # Reverse to get chronological order 
\ No newline at end of file
+    return list(reversed(history)) # Reverse to get chronological order 
+
+def hot_window_start() -> datetime:
+    """Lower timestamp bound of agent context reads, so they only touch the most recent partitions."""
+    return datetime.now(timezone.utc) - timedelta(days=settings.HISTORY_HOT_WINDOW_DAYS)
+
+async def get_recent_history_by_session_id(
+    db: AsyncSession, session_id: str, limit: int = 10
+) -> List[ChatHistory]:
+    """Latest messages of a session from the hot window (agent context).
+
+    A session with no message in the window is either new or resumed after a long pause. Only the latter has
+    a chat_session_summaries row (the compaction job summarizes sessions before they leave the window), and only
+    the partitions around its last message are read. New sessions touch nothing but the hot partitions.
+    Call it before storing the turn's own messages, otherwise the resumed-session case never applies.
+    """
+    history = await get_history_by_session_id(db, session_id, limit=limit, since=hot_window_start())
+    if history:
+        return history
+    last_message_at = await db.scalar(
+        select(ChatSessionSummary.last_message_at).where(ChatSessionSummary.session_id == session_id)
+    )
+    if last_message_at is None:
+        return []
+    return await get_history_by_session_id(
+        db,
+        session_id,
+        limit=limit,
+        since=last_message_at - timedelta(days=settings.HISTORY_HOT_WINDOW_DAYS),
+        until=last_message_at,
+    )
+
+async def stream_history_rows(
+    db: AsyncSession,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    session_ids: List[str] | None = None,
+    yield_per: int = 1000,
+) -> AsyncIterator[Row]:
+    """Streams chat history rows through a server-side cursor, filtered by time range and/or sessions.
+
+    Only plain columns are selected (no ORM objects) and rows are fetched `yield_per` at a time,
+    so memory use stays constant regardless of how many rows match.
+    """
+    query = select(
+        ChatHistory.id,
+        ChatHistory.session_id,
+        ChatHistory.sender_type,
+        ChatHistory.message,
+        ChatHistory.tool_name,
+        ChatHistory.timestamp,
+    )
+    if start is not None:
+        query = query.where(ChatHistory.timestamp >= start)
+    if end is not None:
+        query = query.where(ChatHistory.timestamp < end)
+    if session_ids:
+        query = query.where(ChatHistory.session_id.in_(session_ids))
+    query = query.order_by(ChatHistory.session_id, ChatHistory.timestamp)
+
+    result = await db.stream(query.execution_options(yield_per=yield_per))
+    async for row in result:
+        yield row
+
+
+async def get_history_for_sessions(
+    db: AsyncSession, session_ids: List[str], limit_per_session: int = 20
+) -> Dict[str, List[ChatHistory]]:
+    """Retrieves the last `limit_per_session` messages of several sessions in a single query.
+
+    Uses row_number() partitioned by session_id so that N sessions cost one round trip. The rows are read
+    from the ranked subquery itself: joining it back to chat_history on id would probe every partition.
+    Results are grouped per session in chronological order; sessions without history map to an empty list.
+    """
+    grouped: Dict[str, List[ChatHistory]] = {session_id: [] for session_id in session_ids}
+    if not session_ids:
+        return grouped
+
+    row_number = (
+        func.row_number()
+        .over(partition_by=ChatHistory.session_id, order_by=desc(ChatHistory.timestamp))
+        .label("row_number")
+    )
+    ranked = (
+        select(ChatHistory, row_number)
+        .where(ChatHistory.session_id.in_(session_ids))
+        .subquery()
+    )
+    ranked_history = aliased(ChatHistory, ranked)
+    result = await db.execute(
+        select(ranked_history)
+        .where(ranked.c.row_number <= limit_per_session)
+        .order_by(ranked.c.session_id, ranked.c.timestamp)
+    )
+    for message in result.scalars().all():
+        grouped[message.session_id].append(message)
+    return grouped
+
+
+async def get_history_json_by_session_id(
+    db: AsyncSession, session_id: str, limit: int = 100, since: datetime | None = None
+) -> str | None:
+    """Returns the chat history of a session as a JSON array built by Postgres.
+
+    Only the columns exposed by ChatMessageOutput are selected and json_agg orders them chronologically,
+    so no ORM objects or Pydantic models are created on the read path. Returns None if the session has no history.
+    With `since`, only partitions from that time on are read.
+    """
+    query = select(
+        ChatHistory.id,
+        ChatHistory.session_id,
+        ChatHistory.sender_type,
+        ChatHistory.message,
+        ChatHistory.tool_name,
+        ChatHistory.timestamp,
+    ).where(ChatHistory.session_id == session_id)
+    if since is not None:
+        query = query.where(ChatHistory.timestamp >= since)
+    recent = query.order_by(desc(ChatHistory.timestamp)).limit(limit).subquery()
+    history_json = func.json_agg(
+        aggregate_order_by(
+            func.json_build_object(
+                "id", recent.c.id,
+                "session_id", recent.c.session_id,
+                "sender_type", recent.c.sender_type,
+                "message", recent.c.message,
+                "tool_name", recent.c.tool_name,
+                "timestamp", recent.c.timestamp,
+            ),
+            recent.c.timestamp,
+        )
+    )
+    result = await db.execute(select(cast(history_json, Text)))
+    return result.scalar_one()
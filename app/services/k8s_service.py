@@ -0,0 +1,232 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Tuple
+
+import httpx
+
+from app.config import settings
+
+APPLIED_HASH_ANNOTATION = "autodeploia.io/applied-hash"
+_SERVICE_ACCOUNT_TOKEN = "/var/run/secrets/kubernetes.io/serviceaccount/token"
+
+# Last applied hash per (api_url, kind, namespace, name) and when it was last confirmed (monotonic);
+# lets no-op redeploys skip the API entirely for K8S_APPLIED_CACHE_TTL_SECONDS
+_applied_hashes: Dict[Tuple[str, str, str, str], Tuple[str, float]] = {}
+
+
+class KubernetesError(Exception):
+    """Raised when the Kubernetes API rejects a request or a rollout does not complete."""
+
+
+@dataclass
+class DeployResult:
+    applied: List[str] = field(default_factory=list)
+    unchanged: List[str] = field(default_factory=list)
+    rollout_status: str | None = None
+
+
+def render_manifests(
+    image_name: str,
+    deployment_name: str,
+    namespace: str = "default",
+    replicas: int = 1,
+    container_port: int | None = None,
+) -> List[Dict[str, Any]]:
+    """Renders the Kubernetes objects for a deployment; a Service is included when a container port is given."""
+    labels = {"app": deployment_name, "app.kubernetes.io/managed-by": "autodeploia"}
+    container: Dict[str, Any] = {"name": deployment_name, "image": image_name}
+    if container_port is not None:
+        container["ports"] = [{"containerPort": container_port}]
+
+    manifests: List[Dict[str, Any]] = [{
+        "apiVersion": "apps/v1",
+        "kind": "Deployment",
+        "metadata": {"name": deployment_name, "namespace": namespace, "labels": labels},
+        "spec": {
+            "replicas": replicas,
+            "selector": {"matchLabels": {"app": deployment_name}},
+            "template": {
+                "metadata": {"labels": labels},
+                "spec": {"containers": [container]},
+            },
+        },
+    }]
+    if container_port is not None:
+        manifests.append({
+            "apiVersion": "v1",
+            "kind": "Service",
+            "metadata": {"name": deployment_name, "namespace": namespace, "labels": labels},
+            "spec": {
+                "selector": {"app": deployment_name},
+                "ports": [{"port": container_port, "targetPort": container_port}],
+            },
+        })
+    return manifests
+
+
+def manifest_hash(manifest: Dict[str, Any]) -> str:
+    """Stable hash of a rendered manifest (computed before the applied-hash annotation is added)."""
+    canonical = json.dumps(manifest, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
+
+
+def _object_path(manifest: Dict[str, Any]) -> str:
+    namespace = manifest["metadata"]["namespace"]
+    name = manifest["metadata"]["name"]
+    if manifest["kind"] == "Deployment":
+        return f"/apis/apps/v1/namespaces/{namespace}/deployments/{name}"
+    if manifest["kind"] == "Service":
+        return f"/api/v1/namespaces/{namespace}/services/{name}"
+    raise KubernetesError(f"Unsupported kind: {manifest['kind']}")
+
+
+def _object_ref(manifest: Dict[str, Any]) -> str:
+    return f"{manifest['kind']}/{manifest['metadata']['name']}"
+
+
+def _cache_key(manifest: Dict[str, Any]) -> Tuple[str, str, str, str]:
+    return (settings.K8S_API_URL, manifest["kind"], manifest["metadata"]["namespace"], manifest["metadata"]["name"])
+
+
+def _cached_hash(manifest: Dict[str, Any]) -> str | None:
+    """Hash this process applied for the object, unless it was confirmed too long ago to be trusted."""
+    entry = _applied_hashes.get(_cache_key(manifest))
+    if entry is None or time.monotonic() - entry[1] > settings.K8S_APPLIED_CACHE_TTL_SECONDS:
+        return None
+    return entry[0]
+
+
+def _remember_hash(manifest: Dict[str, Any], desired_hash: str) -> None:
+    _applied_hashes[_cache_key(manifest)] = (desired_hash, time.monotonic())
+
+
+def _build_client() -> httpx.AsyncClient:
+    token = settings.K8S_TOKEN
+    if token is None and os.path.isfile(_SERVICE_ACCOUNT_TOKEN):
+        with open(_SERVICE_ACCOUNT_TOKEN) as token_file:
+            token = token_file.read().strip()
+    headers = {"Authorization": f"Bearer {token}"} if token else {}
+    verify: bool | str = settings.K8S_CA_CERT or settings.K8S_VERIFY_SSL
+    return httpx.AsyncClient(base_url=settings.K8S_API_URL, headers=headers, verify=verify, timeout=30)
+
+
+async def _get_live(client: httpx.AsyncClient, manifest: Dict[str, Any]) -> Dict[str, Any] | None:
+    """Returns the live object, or None if it does not exist."""
+    response = await client.get(_object_path(manifest))
+    if response.status_code == 404:
+        return None
+    if response.is_error:
+        raise KubernetesError(f"Failed to read {_object_ref(manifest)}: {response.status_code} {response.text}")
+    return response.json()
+
+
+def _live_hash(live: Dict[str, Any] | None) -> str | None:
+    """Returns the applied-hash annotation of a live object."""
+    if live is None:
+        return None
+    return (live.get("metadata", {}).get("annotations") or {}).get(APPLIED_HASH_ANNOTATION)
+
+
+def _rollout_progress(deployment: Dict[str, Any]) -> Tuple[bool, int, int, int]:
+    """Returns (complete, updated replicas, available replicas, desired replicas) of a live Deployment."""
+    spec_replicas = deployment.get("spec", {}).get("replicas", 1)
+    status = deployment.get("status", {})
+    observed = status.get("observedGeneration", 0) >= deployment.get("metadata", {}).get("generation", 0)
+    updated = status.get("updatedReplicas", 0)
+    available = status.get("availableReplicas", 0)
+    return observed and updated == spec_replicas and available == spec_replicas, updated, available, spec_replicas
+
+
+async def _apply(client: httpx.AsyncClient, manifest: Dict[str, Any], desired_hash: str) -> None:
+    """Server-side applies a manifest, recording its hash in an annotation."""
+    body = json.loads(json.dumps(manifest))
+    body["metadata"].setdefault("annotations", {})[APPLIED_HASH_ANNOTATION] = desired_hash
+    response = await client.patch(
+        _object_path(manifest),
+        params={"fieldManager": settings.K8S_FIELD_MANAGER, "force": "true"},
+        content=json.dumps(body),  # JSON is valid YAML for apply patches
+        headers={"Content-Type": "application/apply-patch+yaml"},
+    )
+    if response.is_error:
+        raise KubernetesError(f"Failed to apply {_object_ref(manifest)}: {response.status_code} {response.text}")
+
+
+async def _wait_for_rollout(client: httpx.AsyncClient, manifest: Dict[str, Any]) -> str:
+    """Polls a Deployment with exponential backoff until all replicas are updated and available."""
+    deadline = time.monotonic() + settings.K8S_ROLLOUT_TIMEOUT_SECONDS
+    delay = 0.25
+    while True:
+        response = await client.get(_object_path(manifest))
+        if response.is_error:
+            raise KubernetesError(f"Failed to read rollout status of {_object_ref(manifest)}: {response.status_code}")
+        complete, updated, available, spec_replicas = _rollout_progress(response.json())
+        if complete:
+            return f"rollout complete, {available}/{spec_replicas} replicas available"
+
+        if time.monotonic() + delay > deadline:
+            raise KubernetesError(
+                f"Rollout of {_object_ref(manifest)} did not complete within {settings.K8S_ROLLOUT_TIMEOUT_SECONDS}s "
+                f"({updated} updated, {available} available of {spec_replicas})"
+            )
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 5.0)
+
+
+async def deploy(
+    image_name: str,
+    deployment_name: str,
+    namespace: str = "default",
+    replicas: int = 1,
+    container_port: int | None = None,
+) -> DeployResult:
+    """Applies only the rendered objects whose hash differs from the last applied state.
+
+    Changed objects are applied concurrently. The Deployment rollout is awaited if the Deployment was changed,
+    or if it is unchanged but not rolled out (e.g. its previous rollout failed).
+    """
+    manifests = render_manifests(image_name, deployment_name, namespace, replicas, container_port)
+    desired = [(manifest, manifest_hash(manifest)) for manifest in manifests]
+    result = DeployResult()
+
+    # Fast path: everything matches what this process applied and recently confirmed, no API round trip needed
+    if all(_cached_hash(manifest) == desired_hash for manifest, desired_hash in desired):
+        result.unchanged = [_object_ref(manifest) for manifest, _ in desired]
+        return result
+
+    async with _build_client() as client:
+        live_objects = await asyncio.gather(*(_get_live(client, manifest) for manifest, _ in desired))
+        changed = []
+        rollout_target: Dict[str, Any] | None = None
+        rollout_hash = ""
+        for (manifest, desired_hash), live in zip(desired, live_objects):
+            if _live_hash(live) != desired_hash:
+                changed.append((manifest, desired_hash))
+                if manifest["kind"] == "Deployment":
+                    rollout_target, rollout_hash = manifest, desired_hash
+                continue
+            result.unchanged.append(_object_ref(manifest))
+            if manifest["kind"] == "Deployment" and not _rollout_progress(live)[0]:
+                # Applied before but not rolled out: report the rollout instead of "already up to date"
+                rollout_target, rollout_hash = manifest, desired_hash
+            else:
+                _remember_hash(manifest, desired_hash)
+
+        await asyncio.gather(*(_apply(client, manifest, desired_hash) for manifest, desired_hash in changed))
+        result.applied = [_object_ref(manifest) for manifest, _ in changed]
+        for manifest, desired_hash in changed:
+            if manifest["kind"] != "Deployment":
+                _remember_hash(manifest, desired_hash)
+
+        if rollout_target is not None:
+            try:
+                result.rollout_status = await _wait_for_rollout(client, rollout_target)
+            except KubernetesError:
+                # Do not let a failed rollout short-circuit the next redeploy as a no-op
+                _applied_hashes.pop(_cache_key(rollout_target), None)
+                raise
+            _remember_hash(rollout_target, rollout_hash)
+    return result
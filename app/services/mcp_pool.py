@@ -0,0 +1,218 @@
+import asyncio
+import contextlib
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import anyio
+from langchain_core.tools import BaseTool
+from langchain_mcp_adapters.tools import convert_mcp_tool_to_langchain_tool
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+from mcp.shared.exceptions import McpError
+from mcp.types import CONNECTION_CLOSED, CallToolResult
+
+from app.agents.recording import get_active_recorder, get_active_replay
+from app.config import settings
+
+
+class McpUnavailableError(Exception):
+    """Raised when a tool call can not be served because its MCP server is not connected."""
+
+
+class McpServer:
+    """One long-lived stdio MCP session, owned by a runner task that health-checks and restarts it.
+
+    Tool calls are multiplexed over the session (MCP requests carry ids, so concurrent calls are safe).
+    The converted LangChain tools call back into this object, so they keep working across restarts.
+    """
+
+    def __init__(self, name: str, params: StdioServerParameters) -> None:
+        self.name = name
+        self.params = params
+        self.session: Optional[ClientSession] = None
+        # Bumped on every (re)connect; callers cache per generation what they build from the tools
+        self.generation = 0
+        self.langchain_tools: List[BaseTool] = []
+        self.calls = 0
+        self.failures = 0
+        self.restarts = 0
+        self.last_error: Optional[str] = None
+        self.connected_since: Optional[float] = None
+        self._ready = asyncio.Event()
+        self._restart_requested = asyncio.Event()
+        self._runner: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._runner = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            self._runner.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._runner
+
+    async def _run(self) -> None:
+        backoff = 1.0
+        while True:
+            try:
+                # Entered and exited in this task: the stdio transport is bound to the task that opened it
+                async with stdio_client(self.params) as (read_stream, write_stream):
+                    async with ClientSession(read_stream, write_stream) as session:
+                        await asyncio.wait_for(session.initialize(), timeout=settings.MCP_CONNECT_TIMEOUT_SECONDS)
+                        listed = await session.list_tools()
+                        self.langchain_tools = [
+                            convert_mcp_tool_to_langchain_tool(self, mcp_tool) for mcp_tool in listed.tools
+                        ]
+                        self.session = session
+                        self.generation += 1
+                        self.connected_since = time.time()
+                        self._restart_requested.clear()
+                        self._ready.set()
+                        backoff = 1.0
+                        print(f"--- MCP [{self.name}]: connected, {len(self.langchain_tools)} tool(s) ---")
+                        await self._monitor(session)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:  # includes the exception groups raised by the stdio transport
+                self.last_error = str(e) or type(e).__name__
+                print(f"--- MCP [{self.name}]: session failed: {self.last_error} ---")
+            finally:
+                self._ready.clear()
+                self.session = None
+                self.connected_since = None
+
+            self.restarts += 1
+            print(f"--- MCP [{self.name}]: restarting in {backoff:.0f}s ---")
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, settings.MCP_MAX_RESTART_BACKOFF_SECONDS)
+
+    async def _monitor(self, session: ClientSession) -> None:
+        """Returns when the session must be restarted: a failed call asked for it or a ping failed."""
+        while True:
+            try:
+                await asyncio.wait_for(
+                    self._restart_requested.wait(), timeout=settings.MCP_HEALTH_CHECK_INTERVAL_SECONDS
+                )
+                print(f"--- MCP [{self.name}]: restart requested after a failed call ---")
+                return
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await asyncio.wait_for(session.send_ping(), timeout=settings.MCP_PING_TIMEOUT_SECONDS)
+            except Exception as e:
+                self.last_error = f"health check failed: {str(e) or type(e).__name__}"
+                print(f"--- MCP [{self.name}]: {self.last_error} ---")
+                return
+
+    async def call_tool(self, name: str, arguments: Optional[Dict[str, Any]] = None, **kwargs: Any) -> CallToolResult:
+        """Session-compatible entry point used by the LangChain tools of this server."""
+        arguments = arguments or {}
+        recording_name = f"mcp:{self.name}:{name}"
+        replay = get_active_replay()
+        if replay is not None:
+            return CallToolResult.model_validate(await replay.next_tool_output(recording_name, arguments))
+
+        self.calls += 1
+        started = time.monotonic()
+        try:
+            result = await self._call_on_session(name, arguments, **kwargs)
+        except (anyio.ClosedResourceError, anyio.BrokenResourceError):
+            # The request never reached the server (its session died before the call): retry once reconnected
+            result = await self._call_on_session(name, arguments, **kwargs)
+
+        recorder = get_active_recorder()
+        if recorder is not None:
+            recorder.record_tool(recording_name, arguments, result.model_dump(mode="json"), time.monotonic() - started)
+        return result
+
+    async def _call_on_session(self, name: str, arguments: Dict[str, Any], **kwargs: Any) -> CallToolResult:
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout=settings.MCP_CONNECT_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            raise McpUnavailableError(f"MCP server '{self.name}' is not available ({self.last_error or 'not connected'}).")
+
+        session = self.session
+        try:
+            return await asyncio.wait_for(
+                session.call_tool(name, arguments, **kwargs), timeout=settings.MCP_CALL_TIMEOUT_SECONDS
+            )
+        except asyncio.TimeoutError:
+            # The tool is just slow; the next health check decides whether the server is stuck
+            self.failures += 1
+            raise
+        except McpError as e:
+            self.failures += 1
+            if e.error.code == CONNECTION_CLOSED:
+                self._mark_broken(session, str(e))
+            raise
+        except Exception as e:
+            # Transport failure (e.g. the server process died)
+            self.failures += 1
+            self._mark_broken(session, str(e) or type(e).__name__)
+            raise
+
+    def _mark_broken(self, session: ClientSession, error: str) -> None:
+        """Stops routing calls to a dead session and has the runner reconnect."""
+        if self.session is not session:
+            return  # already replaced by a newer session
+        self.last_error = error
+        self._ready.clear()
+        self._restart_requested.set()
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "connected": self._ready.is_set(),
+            "connected_since": self.connected_since,
+            "tools": [mcp_tool.name for mcp_tool in self.langchain_tools],
+            "calls": self.calls,
+            "failures": self.failures,
+            "restarts": self.restarts,
+            "last_error": self.last_error,
+        }
+
+
+_servers: Dict[str, McpServer] = {}
+# (generation, graph) per server, so agent graphs are rebuilt only when the server's tools may have changed
+_agent_graphs: Dict[str, tuple] = {}
+
+
+async def start_mcp_pool() -> None:
+    """Connects to every server in MCP_SERVERS in the background; called from the application lifespan."""
+    for name, definition in settings.MCP_SERVERS.items():
+        server = McpServer(name, StdioServerParameters(**definition))
+        _servers[name] = server
+        server.start()
+    if _servers:
+        print(f"MCP client pool started for: {', '.join(_servers)}")
+
+
+async def stop_mcp_pool() -> None:
+    for server in _servers.values():
+        await server.stop()
+    _servers.clear()
+    _agent_graphs.clear()
+
+
+def get_mcp_tools(server_name: str) -> Optional[List[BaseTool]]:
+    """LangChain tools of a configured MCP server, or None if it is not configured or has never connected."""
+    server = _servers.get(server_name)
+    if server is None or not server.generation:
+        return None
+    return server.langchain_tools
+
+
+def get_agent_graph(server_name: str, default_graph: Any, build_graph: Callable[[List[BaseTool]], Any]) -> Any:
+    """Returns the sub-agent graph built on the server's MCP tools, or `default_graph` if there are none."""
+    mcp_tools = get_mcp_tools(server_name)
+    if not mcp_tools:
+        return default_graph
+    generation = _servers[server_name].generation
+    cached = _agent_graphs.get(server_name)
+    if cached is None or cached[0] != generation:
+        cached = (generation, build_graph(mcp_tools))
+        _agent_graphs[server_name] = cached
+    return cached[1]
+
+
+def get_mcp_metrics() -> Dict[str, Dict[str, Any]]:
+    return {name: server.as_dict() for name, server in _servers.items()}
@@ -0,0 +1,139 @@
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Sequence
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage, message_to_dict, messages_from_dict
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database.models import ChatHistory, MessageSender
+from app.services.history_service import note_session_write
+
+# Fields always kept even when empty (the message classes require them)
+_REQUIRED_FIELDS = {"content", "tool_call_id"}
+# Provider bookkeeping that is large and never needed to continue a conversation
+_DROPPED_RESPONSE_METADATA = {"safety_ratings", "prompt_feedback"}
+# Gemini mirrors tool calls in additional_kwargs; tool_calls already holds them
+_DROPPED_ADDITIONAL_KWARGS = {"function_call"}
+
+_SENDERS = {"human": MessageSender.USER, "ai": MessageSender.AI, "tool": MessageSender.TOOL}
+
+
+def encode_message(message: BaseMessage) -> Dict[str, Any]:
+    """Serializes a LangChain message losslessly (tool calls, ids, usage) in a compact form.
+
+    The result is `message_to_dict` output without defaults, so `messages_from_dict` decodes it directly.
+    """
+    encoded = message_to_dict(message)
+    data = encoded["data"]
+    data.pop("type", None)
+    if data.get("status") == "success":
+        data.pop("status")
+    for key, dropped in (
+        ("response_metadata", _DROPPED_RESPONSE_METADATA),
+        ("additional_kwargs", _DROPPED_ADDITIONAL_KWARGS),
+    ):
+        if data.get(key):
+            data[key] = {k: v for k, v in data[key].items() if k not in dropped}
+    for tool_call in data.get("tool_calls") or []:
+        tool_call.pop("type", None)
+    encoded["data"] = {
+        key: value for key, value in data.items()
+        if key in _REQUIRED_FIELDS or value not in (None, False, {}, [], "")
+    }
+    return encoded
+
+
+def sender_for(message: BaseMessage) -> MessageSender:
+    return _SENDERS.get(message.type, MessageSender.AI)
+
+
+def _message_text(message: BaseMessage) -> str:
+    """Text stored in the `message` column (what history endpoints and exports show)."""
+    content = message.content if isinstance(message.content, str) else str(message.content)
+    if content or not isinstance(message, AIMessage) or not message.tool_calls:
+        return content
+    return f"[calling {', '.join(tool_call['name'] for tool_call in message.tool_calls)}]"
+
+
+def to_history_row(session_id: str, message: BaseMessage, timestamp: Optional[datetime] = None) -> ChatHistory:
+    return ChatHistory(
+        session_id=session_id,
+        sender_type=sender_for(message).value,
+        message=_message_text(message),
+        tool_name=message.name if isinstance(message, ToolMessage) else None,
+        payload=encode_message(message),
+        timestamp=timestamp,
+    )
+
+
+async def save_messages(
+    db: AsyncSession, session_id: str, messages: Sequence[BaseMessage], timestamp: Optional[datetime] = None
+) -> None:
+    """Stores several LangChain messages in one transaction, keeping their order.
+
+    Timestamps are set explicitly and strictly increasing: rows of one transaction would otherwise
+    share now() and lose their order (e.g. a tool call and its results). They start at `timestamp`
+    (default: now), which deferred writes set to when the messages were produced.
+    """
+    timestamp = timestamp or datetime.now(timezone.utc)
+    for offset, message in enumerate(messages):
+        db.add(to_history_row(session_id, message, timestamp=timestamp + timedelta(microseconds=offset)))
+    await db.commit()
+    note_session_write(session_id)
+
+
+def _decode_legacy_row(row: ChatHistory) -> Optional[BaseMessage]:
+    """Rebuilds a message from a row written before payloads existed (normally backfilled by migration)."""
+    sender_type = str(row.sender_type).lower().removeprefix("messagesender.")
+    if sender_type == MessageSender.USER.value:
+        return HumanMessage(content=row.message)
+    if sender_type == MessageSender.AI.value:
+        return AIMessage(content=row.message)
+    if sender_type == MessageSender.TOOL.value:
+        # Stable id derived from the row, matching the migration backfill
+        return ToolMessage(
+            content=row.message, tool_call_id=f"legacy-{row.id}", name=row.tool_name or "unknown_sub_agent_tool"
+        )
+    return None
+
+
+def repair_tool_pairs(messages: List[BaseMessage]) -> List[BaseMessage]:
+    """Makes a history window well-formed for providers: every tool result follows its tool call.
+
+    A window may start after the AI message that made a call, and legacy rows have no calls at all:
+    such orphan results get the call re-attached. Calls left without any result (an interrupted turn) are dropped.
+    """
+    answered = {message.tool_call_id for message in messages if isinstance(message, ToolMessage)}
+    repaired: List[BaseMessage] = []
+    open_calls: set = set()
+    for message in messages:
+        if isinstance(message, AIMessage) and message.tool_calls:
+            tool_calls = [tool_call for tool_call in message.tool_calls if tool_call["id"] in answered]
+            if len(tool_calls) != len(message.tool_calls):
+                if not tool_calls and not message.content:
+                    continue
+                message = message.model_copy(update={"tool_calls": tool_calls})
+            open_calls = {tool_call["id"] for tool_call in tool_calls}
+        elif isinstance(message, ToolMessage) and message.tool_call_id not in open_calls:
+            repaired.append(AIMessage(
+                content="",
+                tool_calls=[{"name": message.name or "unknown_sub_agent_tool", "args": {}, "id": message.tool_call_id}],
+            ))
+        elif not isinstance(message, ToolMessage):
+            open_calls = set()
+        repaired.append(message)
+    return repaired
+
+
+def decode_history(rows: Sequence[ChatHistory]) -> List[BaseMessage]:
+    """Rehydrates chat_history rows (chronological) into LangChain messages ready to send to a model.
+
+    A window cut from a longer history may begin mid-turn; it is trimmed to start at a user message,
+    as Gemini rejects a history that opens with a function call or function response.
+    """
+    messages: List[BaseMessage] = []
+    for row in rows:
+        message = messages_from_dict([row.payload])[0] if row.payload is not None else _decode_legacy_row(row)
+        if message is not None:
+            messages.append(message)
+    first_user = next((index for index, message in enumerate(messages) if isinstance(message, HumanMessage)), len(messages))
+    return repair_tool_pairs(messages[first_user:])
@@ -0,0 +1,240 @@
+import argparse
+import asyncio
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database.database import scheduled_session
+from app.services.scheduler import LONG_RUNNING
+
+_PARTITION_NAME = re.compile(r"^chat_history_p(\d{4})(\d{2})$")
+# Catches rows outside every monthly partition (created by migration 0003)
+_DEFAULT_PARTITION = "chat_history_default"
+# Advisory lock shared by every API worker, so only one of them runs a maintenance step at a time
+_MAINTENANCE_LOCK_KEY = 0x63686174
+# Partition DDL locks chat_history briefly; give up (and retry next run) rather than queue inserts behind it
+_DDL_LOCK_TIMEOUT = "5s"
+# Longest text kept per message in a session summary
+_SUMMARY_TEXT_LIMIT = 2000
+
+_SUMMARIZE_DEAD_SESSIONS_SQL = text(
+    """
+    WITH candidates AS (
+        SELECT DISTINCT session_id FROM chat_history
+        WHERE timestamp >= :since AND timestamp < :idle_before
+    ),
+    dead AS (
+        SELECT
+            history.session_id,
+            min(history.timestamp) AS first_message_at,
+            max(history.timestamp) AS last_message_at,
+            count(*) AS message_count,
+            COALESCE(array_agg(DISTINCT history.tool_name) FILTER (WHERE history.tool_name IS NOT NULL), '{}') AS tools_used,
+            left((array_agg(history.message ORDER BY history.timestamp)
+                FILTER (WHERE history.sender_type = 'user'))[1], :text_limit) AS first_user_message,
+            left((array_agg(history.message ORDER BY history.timestamp DESC)
+                FILTER (WHERE history.sender_type = 'ai' AND history.message NOT LIKE '[calling %'))[1], :text_limit) AS last_ai_message
+        FROM chat_history AS history
+        JOIN candidates USING (session_id)
+        GROUP BY history.session_id
+        HAVING max(history.timestamp) < :idle_before
+    )
+    INSERT INTO chat_session_summaries AS summary
+        (session_id, first_message_at, last_message_at, message_count, tools_used, first_user_message, last_ai_message)
+    SELECT * FROM dead
+    ON CONFLICT (session_id) DO UPDATE SET
+        first_message_at = LEAST(summary.first_message_at, EXCLUDED.first_message_at),
+        last_message_at = EXCLUDED.last_message_at,
+        -- A revived session whose earlier rows are already retired: extend the old summary instead of replacing it
+        message_count = CASE WHEN summary.last_message_at < EXCLUDED.first_message_at
+            THEN summary.message_count + EXCLUDED.message_count ELSE EXCLUDED.message_count END,
+        first_user_message = CASE WHEN summary.last_message_at < EXCLUDED.first_message_at
+            THEN COALESCE(summary.first_user_message, EXCLUDED.first_user_message) ELSE EXCLUDED.first_user_message END,
+        tools_used = ARRAY(SELECT DISTINCT unnest(summary.tools_used || EXCLUDED.tools_used)),
+        last_ai_message = COALESCE(EXCLUDED.last_ai_message, summary.last_ai_message),
+        summarized_at = now()
+    WHERE summary.last_message_at < EXCLUDED.last_message_at
+    """
+)
+
+
+def month_start(value: datetime) -> datetime:
+    return value.astimezone(timezone.utc).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(month: datetime, months: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + months
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def partition_name(month: datetime) -> str:
+    return f"chat_history_p{month:%Y%m}"
+
+
+async def list_partitions(db: AsyncSession) -> List[datetime]:
+    """Months of the monthly partitions attached to chat_history (the default partition is not included)."""
+    result = await db.execute(text(
+        """
+        SELECT child.relname FROM pg_inherits
+        JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE parent.relname = 'chat_history'
+        """
+    ))
+    months = []
+    for (name,) in result:
+        match = _PARTITION_NAME.match(name)
+        if match:
+            months.append(datetime(int(match.group(1)), int(match.group(2)), 1, tzinfo=timezone.utc))
+    return sorted(months)
+
+
+async def _default_partition_months(db: AsyncSession) -> List[datetime]:
+    """Months that have rows in the default partition (which is expected to stay empty)."""
+    if await db.scalar(text(f"SELECT to_regclass('{_DEFAULT_PARTITION}')")) is None:
+        return []
+    result = await db.execute(text(
+        f"SELECT DISTINCT date_trunc('month', timestamp AT TIME ZONE 'UTC') FROM {_DEFAULT_PARTITION}"
+    ))
+    return [month.replace(tzinfo=timezone.utc) for (month,) in result]
+
+
+async def _create_partition(db: AsyncSession, month: datetime, move_from_default: bool) -> int:
+    """Creates the partition of `month`; returns how many rows were moved into it from the default partition.
+
+    Postgres refuses a partition whose range has rows in the default partition, so in that case the default
+    partition is detached while the partition is created and those rows are moved over.
+    """
+    name = partition_name(month)
+    bounds = f"FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+    if not move_from_default:
+        await db.execute(text(f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF chat_history FOR VALUES {bounds}"))
+        return 0
+    in_range = "timestamp >= :start AND timestamp < :end"
+    params = {"start": month, "end": add_months(month, 1)}
+    await db.execute(text(f"ALTER TABLE chat_history DETACH PARTITION {_DEFAULT_PARTITION}"))
+    await db.execute(text(f"CREATE TABLE {name} PARTITION OF chat_history FOR VALUES {bounds}"))
+    moved = await db.execute(
+        text(f"INSERT INTO {name} SELECT * FROM {_DEFAULT_PARTITION} WHERE {in_range}"), params
+    )
+    await db.execute(text(f"DELETE FROM {_DEFAULT_PARTITION} WHERE {in_range}"), params)
+    await db.execute(text(f"ALTER TABLE chat_history ATTACH PARTITION {_DEFAULT_PARTITION} DEFAULT"))
+    return moved.rowcount
+
+
+async def ensure_partitions(db: AsyncSession, now: datetime) -> Dict[str, Dict[str, Any]]:
+    """Creates the partitions of the current month and the next HISTORY_PARTITIONS_AHEAD months if missing,
+    and of every month with rows in the default partition (moving those rows into it).
+
+    Returns {"created": {partition: rows moved from the default partition}, "failed": {partition: error}}.
+    """
+    existing = set(await list_partitions(db))
+    upcoming = {add_months(month_start(now), offset) for offset in range(settings.HISTORY_PARTITIONS_AHEAD + 1)}
+    in_default = set(await _default_partition_months(db))
+    created: Dict[str, int] = {}
+    failed: Dict[str, str] = {}
+    for month in sorted((upcoming | in_default) - existing):
+        name = partition_name(month)
+        try:
+            async with db.begin_nested():
+                created[name] = await _create_partition(db, month, move_from_default=month in in_default)
+        except Exception as e:
+            # e.g. the lock timeout; retried on the next run
+            failed[name] = str(e) or type(e).__name__
+            print(f"Could not create partition {name}: {failed[name]}")
+    return {"created": created, "failed": failed}
+
+
+async def summarize_dead_sessions(db: AsyncSession, idle_before: datetime) -> int:
+    """Writes a chat_session_summaries row for every session without messages since `idle_before`.
+
+    Sessions that died before the latest summarized one were handled by an earlier run, so only sessions
+    with messages after it are considered and older partitions are not scanned again. Returns the sessions summarized.
+    """
+    since = await db.scalar(text("SELECT max(last_message_at) FROM chat_session_summaries"))
+    result = await db.execute(_SUMMARIZE_DEAD_SESSIONS_SQL, {
+        "since": since or datetime.min.replace(tzinfo=timezone.utc),
+        "idle_before": idle_before,
+        "text_limit": _SUMMARY_TEXT_LIMIT,
+    })
+    return result.rowcount
+
+
+async def apply_retention(db: AsyncSession, now: datetime) -> List[str]:
+    """Archives or drops the partitions older than HISTORY_RETENTION_MONTHS whole months.
+
+    Sessions that ended before the cutoff are summarized first, as their rows are about to go.
+    Archived partitions are detached into HISTORY_ARCHIVE_SCHEMA, where they can be dumped or dropped later.
+    """
+    if settings.HISTORY_RETENTION_MONTHS <= 0:
+        return []
+    cutoff = add_months(month_start(now), -settings.HISTORY_RETENTION_MONTHS)
+    expired = [month for month in await list_partitions(db) if add_months(month, 1) <= cutoff]
+    if not expired:
+        return []
+
+    await summarize_dead_sessions(db, cutoff)
+    if settings.HISTORY_RETENTION_ACTION == "archive":
+        await db.execute(text(f'CREATE SCHEMA IF NOT EXISTS "{settings.HISTORY_ARCHIVE_SCHEMA}"'))
+    retired = []
+    for month in expired:
+        name = partition_name(month)
+        if settings.HISTORY_RETENTION_ACTION == "drop":
+            await db.execute(text(f"DROP TABLE {name}"))
+        else:
+            await db.execute(text(f"ALTER TABLE chat_history DETACH PARTITION {name}"))
+            await db.execute(text(f'ALTER TABLE {name} SET SCHEMA "{settings.HISTORY_ARCHIVE_SCHEMA}"'))
+        retired.append(name)
+    return retired
+
+
+async def _run_step(step: Callable[[AsyncSession], Awaitable[Any]]) -> Any:
+    """Runs one maintenance step in its own short transaction, unless another worker is running one."""
+    async with scheduled_session(LONG_RUNNING) as db:
+        if not await db.scalar(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": _MAINTENANCE_LOCK_KEY}):
+            await db.rollback()
+            return None
+        await db.execute(text(f"SET LOCAL lock_timeout = '{_DDL_LOCK_TIMEOUT}'"))
+        outcome = await step(db)
+        await db.commit()
+        return outcome
+
+
+async def maintain_partitions(now: Optional[datetime] = None) -> Dict[str, Any]:
+    """One maintenance pass: summarize dead sessions, retire expired partitions, create upcoming ones."""
+    now = now or datetime.now(timezone.utc)
+    idle_before = now - timedelta(days=settings.HISTORY_DEAD_SESSION_DAYS)
+    summarized = await _run_step(lambda db: summarize_dead_sessions(db, idle_before))
+    retired = await _run_step(lambda db: apply_retention(db, now))
+    partitions = await _run_step(lambda db: ensure_partitions(db, now)) or {}
+    report = {
+        "summarized_sessions": summarized,
+        "retired_partitions": retired,
+        # partition -> rows moved into it from the default partition
+        "created_partitions": partitions.get("created"),
+        "failed_partitions": partitions.get("failed"),
+    }
+    print(f"chat_history maintenance: {report}")
+    return report
+
+
+async def run_partition_maintenance() -> None:
+    """Background loop running maintain_partitions; started from the application lifespan."""
+    while True:
+        try:
+            await maintain_partitions()
+        except Exception as e:
+            print(f"chat_history maintenance failed, retrying next run: {e}")
+        await asyncio.sleep(settings.HISTORY_MAINTENANCE_INTERVAL_SECONDS)
+
+
+if __name__ == "__main__":
+    # One pass from the command line or a cron job, e.g.: python -m app.services.partition_service
+    parser = argparse.ArgumentParser(description="Maintain chat_history partitions (summaries, retention, new partitions).")
+    parser.add_argument("--now", type=datetime.fromisoformat, default=None, help="Pretend the current time is this (ISO 8601, with offset)")
+    args = parser.parse_args()
+    asyncio.run(maintain_partitions(args.now))
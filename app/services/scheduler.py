@@ -0,0 +1,216 @@
+import asyncio
+import contextlib
+import math
+import re
+import time
+from collections import Counter, deque
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional
+
+from app.config import settings
+
+INTERACTIVE = "interactive"
+LONG_RUNNING = "long_running"
+TURN_CLASSES = (INTERACTIVE, LONG_RUNNING)
+
+# Requests that build, deploy or provision something run for minutes; everything else is a quick question
+_LONG_RUNNING_PATTERN = re.compile(
+    r"\b(deploy\w*|build\w*|apply|provision\w*|install\w*|set ?up|rollout|roll out|release|terraform|"
+    r"containeri[sz]e\w*|dockeri[sz]e\w*|create (an? )?(cluster|image|infrastructure))\b",
+    re.IGNORECASE,
+)
+_STATUS_QUESTION_PATTERN = re.compile(r"^\s*(what|what's|whats|is|are|did|does|how|which|when|where|why|show|list)\b", re.IGNORECASE)
+# Delegating to one of these sub-agents makes a turn long-running, whatever its wording
+LONG_RUNNING_SUB_AGENT_TOOLS = {"docker_sub_agent_tool", "k8s_sub_agent_tool", "terraform_sub_agent_tool"}
+
+
+def classify_turn(message: str) -> str:
+    """Classifies a turn from the user's message; questions about status stay interactive."""
+    if _STATUS_QUESTION_PATTERN.match(message) and "?" in message:
+        return INTERACTIVE
+    return LONG_RUNNING if _LONG_RUNNING_PATTERN.search(message) else INTERACTIVE
+
+
+@dataclass
+class TurnTicket:
+    """Scheduling class of the current turn; shared by reference with every task the turn spawns."""
+    turn_class: str
+    started: float = field(default_factory=time.monotonic)
+    reclassified: bool = False
+
+    def mark_long_running(self) -> None:
+        if self.turn_class != LONG_RUNNING:
+            self.turn_class = LONG_RUNNING
+            self.reclassified = True
+
+
+_current_ticket: ContextVar[Optional[TurnTicket]] = ContextVar("current_ticket", default=None)
+
+
+def current_turn_class() -> str:
+    """Class of the running turn; work outside a turn (history reads, health checks) is interactive."""
+    ticket = _current_ticket.get()
+    return ticket.turn_class if ticket is not None else INTERACTIVE
+
+
+def get_current_ticket() -> Optional[TurnTicket]:
+    return _current_ticket.get()
+
+
+@contextlib.contextmanager
+def use_turn_class(turn_class: str):
+    """Runs the enclosed work with the given scheduling class (e.g. exports as LONG_RUNNING)."""
+    token = _current_ticket.set(TurnTicket(turn_class))
+    try:
+        yield _current_ticket.get()
+    finally:
+        _current_ticket.reset(token)
+
+
+class PrioritySlots:
+    """Counting semaphore with capacity reserved for interactive work.
+
+    Long-running work may hold at most `capacity - reserved` slots and never jumps ahead of a waiting
+    interactive request; interactive work may use any free slot.
+    """
+
+    def __init__(self, name: str, capacity: int, reserved: int) -> None:
+        self.name = name
+        self.capacity = capacity
+        self.reserved = min(reserved, capacity - 1)
+        self.in_use: Counter = Counter()
+        self._waiters: Dict[str, Deque[asyncio.Future]] = {turn_class: deque() for turn_class in TURN_CLASSES}
+        self.wait_seconds: Dict[str, Deque[float]] = {
+            turn_class: deque(maxlen=settings.SCHEDULER_METRICS_WINDOW) for turn_class in TURN_CLASSES
+        }
+
+    def _can_grant(self, turn_class: str) -> bool:
+        if sum(self.in_use.values()) >= self.capacity:
+            return False
+        if turn_class == LONG_RUNNING:
+            return self.in_use[LONG_RUNNING] < self.capacity - self.reserved and not self._waiters[INTERACTIVE]
+        return True
+
+    def interactive_waiting(self) -> bool:
+        return bool(self._waiters[INTERACTIVE])
+
+    async def acquire(self, turn_class: str) -> None:
+        started = time.monotonic()
+        if not self._waiters[turn_class] and self._can_grant(turn_class):
+            self.in_use[turn_class] += 1
+        else:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters[turn_class].append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    self.release(turn_class)  # granted just as we were cancelled
+                else:
+                    self._waiters[turn_class].remove(waiter)
+                    self._wake()
+                raise
+        self.wait_seconds[turn_class].append(time.monotonic() - started)
+
+    def release(self, turn_class: str) -> None:
+        self.in_use[turn_class] -= 1
+        self._wake()
+
+    def _wake(self) -> None:
+        # Interactive waiters first; long-running ones only get what the reservation leaves
+        for turn_class in TURN_CLASSES:
+            waiters = self._waiters[turn_class]
+            while waiters and self._can_grant(turn_class):
+                waiter = waiters.popleft()
+                if not waiter.done():
+                    self.in_use[turn_class] += 1
+                    waiter.set_result(None)
+
+    @contextlib.asynccontextmanager
+    async def slot(self, turn_class: Optional[str] = None):
+        turn_class = turn_class or current_turn_class()
+        await self.acquire(turn_class)
+        try:
+            yield
+        finally:
+            self.release(turn_class)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "capacity": self.capacity,
+            "reserved_for_interactive": self.reserved,
+            "in_use": {turn_class: self.in_use[turn_class] for turn_class in TURN_CLASSES},
+            "waiting": {turn_class: len(self._waiters[turn_class]) for turn_class in TURN_CLASSES},
+            "wait_seconds": {turn_class: _percentiles(self.wait_seconds[turn_class]) for turn_class in TURN_CLASSES},
+        }
+
+
+llm_slots = PrioritySlots("llm", settings.SCHEDULER_LLM_SLOTS, settings.SCHEDULER_LLM_INTERACTIVE_RESERVED)
+db_slots = PrioritySlots(
+    "db", settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW, settings.SCHEDULER_DB_INTERACTIVE_RESERVED
+)
+
+# Only used when DATABASE_REPLICA_URL is set; the replica engine has its own pool of the same size
+replica_db_slots = PrioritySlots(
+    "db_replica", settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW, settings.SCHEDULER_DB_INTERACTIVE_RESERVED
+)
+
+_preemptions: Counter = Counter()
+
+
+async def checkpoint() -> None:
+    """Node-boundary preemption point: a long-running turn waits while interactive work is queued.
+
+    The pause is capped at SCHEDULER_MAX_PREEMPT_SECONDS per checkpoint so long runs are never starved.
+    """
+    if current_turn_class() != LONG_RUNNING or not (llm_slots.interactive_waiting() or db_slots.interactive_waiting()):
+        return
+    _preemptions["count"] += 1
+    started = time.monotonic()
+    deadline = started + settings.SCHEDULER_MAX_PREEMPT_SECONDS
+    while (llm_slots.interactive_waiting() or db_slots.interactive_waiting()) and time.monotonic() < deadline:
+        await asyncio.sleep(settings.SCHEDULER_PREEMPT_POLL_SECONDS)
+    _preemptions["seconds"] += time.monotonic() - started
+
+
+_turn_latencies: Dict[str, Deque[float]] = {
+    turn_class: deque(maxlen=settings.SCHEDULER_METRICS_WINDOW) for turn_class in TURN_CLASSES
+}
+
+
+def record_turn(ticket: TurnTicket) -> None:
+    """Records the latency of a finished turn under its final class."""
+    _turn_latencies[ticket.turn_class].append(time.monotonic() - ticket.started)
+
+
+def _percentiles(samples: Deque[float]) -> Dict[str, Optional[float]]:
+    ordered = sorted(samples)
+
+    def percentile(p: float) -> Optional[float]:
+        if not ordered:
+            return None
+        return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+    return {"count": len(ordered), "p50": percentile(50), "p95": percentile(95), "p99": percentile(99)}
+
+
+def get_scheduler_metrics() -> Dict[str, Any]:
+    turns: Dict[str, Any] = {}
+    for turn_class in TURN_CLASSES:
+        samples: List[float] = list(_turn_latencies[turn_class])
+        slo = settings.SCHEDULER_SLO_SECONDS.get(turn_class)
+        turns[turn_class] = {
+            **_percentiles(_turn_latencies[turn_class]),
+            "slo_seconds": slo,
+            "slo_attainment": (
+                sum(1 for latency in samples if latency <= slo) / len(samples) if samples and slo else None
+            ),
+        }
+    return {
+        "turns": turns,
+        "llm_slots": llm_slots.as_dict(),
+        "db_slots": db_slots.as_dict(),
+        **({"db_replica_slots": replica_db_slots.as_dict()} if settings.DATABASE_REPLICA_URL else {}),
+        "preemptions": {"count": _preemptions["count"], "seconds": round(_preemptions["seconds"], 3)},
+    }
@@ -0,0 +1,128 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+from dataclasses import dataclass, field
+from typing import Dict, List, Set
+
+from langchain_core.messages import BaseMessage, HumanMessage
+
+from app.config import settings
+from app.database.database import scheduled_session
+from app.services.history_service import get_recent_history_by_session_id, history_read_session
+from app.services.message_store import decode_history, save_messages
+
+
+@dataclass
+class LiveSession:
+    """LangChain message state of a session kept in memory across WebSocket turns.
+
+    State is per process: turns for the same session served by /chat or another worker are not reflected,
+    which is why /chat discards the live state of the sessions it touches.
+    """
+    session_id: str
+    messages: List[BaseMessage]
+    last_active: float = field(default_factory=time.monotonic)
+    # Serializes turns of one session; a second turn waits for the first to finish
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+    def touch(self) -> None:
+        self.last_active = time.monotonic()
+
+
+_live_sessions: Dict[str, LiveSession] = {}
+# Latest pending background write per session, so writes of one session land in order
+_write_tails: Dict[str, asyncio.Task] = {}
+# Strong references to running background writes (the event loop only keeps weak ones)
+_pending_writes: Set[asyncio.Task] = set()
+
+
+async def get_live_session(session_id: str) -> LiveSession:
+    """Returns the in-memory state of a session, loading it from the database only on first use."""
+    live_session = _live_sessions.get(session_id)
+    if live_session is None:
+        # A session evicted or discarded right after a turn may still have its last messages in flight
+        pending_write = _write_tails.get(session_id)
+        if pending_write is not None:
+            await asyncio.wait({pending_write})
+        async with history_read_session([session_id]) as db:
+            db_history = await get_recent_history_by_session_id(db, session_id, limit=10)
+        live_session = _live_sessions.setdefault(
+            session_id,
+            LiveSession(session_id=session_id, messages=decode_history(db_history)),
+        )
+    live_session.touch()
+    return live_session
+
+
+def discard_live_session(session_id: str) -> None:
+    """Drops the in-memory state of a session (e.g. after it was modified outside the WebSocket path)."""
+    _live_sessions.pop(session_id, None)
+
+
+def trim_messages(messages: List[BaseMessage]) -> List[BaseMessage]:
+    """Keeps at most LIVE_SESSION_MAX_MESSAGES, cutting only at a user message so tool calls stay paired."""
+    if len(messages) <= settings.LIVE_SESSION_MAX_MESSAGES:
+        return messages
+    cut = len(messages) - settings.LIVE_SESSION_MAX_MESSAGES
+    for index in range(cut, len(messages)):
+        if isinstance(messages[index], HumanMessage):
+            return messages[index:]
+    return messages[-1:]
+
+
+def persist_in_background(session_id: str, messages: List[BaseMessage]) -> asyncio.Task:
+    """Writes chat_history rows without blocking the caller; writes of one session are applied in order.
+
+    Rows are stamped with the time of this call, so a delayed write still sorts before the rows the turn
+    writes inline afterwards (e.g. its tool calls and results).
+    """
+    previous_write = _write_tails.get(session_id)
+    produced_at = datetime.now(timezone.utc)
+
+    async def _write() -> None:
+        if previous_write is not None:
+            await asyncio.wait({previous_write})
+        try:
+            async with scheduled_session() as db:
+                await save_messages(db, session_id, messages, timestamp=produced_at)
+        except Exception as e:
+            print(f"Error persisting {len(messages)} message(s) for session {session_id}: {e}")
+
+    task = asyncio.create_task(_write())
+    _write_tails[session_id] = task
+    _pending_writes.add(task)
+
+    def _done(finished: asyncio.Task) -> None:
+        _pending_writes.discard(finished)
+        if _write_tails.get(session_id) is finished:
+            del _write_tails[session_id]
+
+    task.add_done_callback(_done)
+    return task
+
+
+def evict_idle_sessions() -> int:
+    """Removes sessions idle for longer than LIVE_SESSION_IDLE_SECONDS; returns how many were evicted."""
+    cutoff = time.monotonic() - settings.LIVE_SESSION_IDLE_SECONDS
+    idle = [
+        session_id for session_id, live_session in _live_sessions.items()
+        if live_session.last_active < cutoff and not live_session.lock.locked()
+    ]
+    for session_id in idle:
+        del _live_sessions[session_id]
+    return len(idle)
+
+
+async def run_idle_eviction() -> None:
+    """Background loop evicting idle live sessions; started from the application lifespan."""
+    while True:
+        await asyncio.sleep(settings.LIVE_SESSION_EVICTION_INTERVAL_SECONDS)
+        evicted = evict_idle_sessions()
+        if evicted:
+            print(f"Evicted {evicted} idle live session(s).")
+
+
+async def drain_background_writes() -> None:
+    """Waits for pending background writes; called on application shutdown."""
+    if _pending_writes:
+        await asyncio.wait(set(_pending_writes))
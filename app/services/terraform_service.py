@@ -0,0 +1,206 @@
+import asyncio
+import hashlib
+import os
+import re
+import time
+from dataclasses import dataclass, replace
+from typing import Dict, List, Tuple
+
+from app.config import settings
+
+# Files whose content determines the outcome of `terraform plan`
+_CONFIG_SUFFIXES = (".tf", ".tf.json", ".tfvars", ".tfvars.json")
+# Local module references, e.g. source = "../modules/network"
+_LOCAL_MODULE_SOURCE = re.compile(r'source\s*=\s*"(\.{1,2}/[^"]+)"')
+_PLAN_SUMMARY = re.compile(r"Plan: \d+ to add, \d+ to change, \d+ to destroy\.")
+
+
+class TerraformError(Exception):
+    """Raised when a terraform command fails or a plan cannot be applied."""
+
+
+@dataclass
+class PlanRecord:
+    working_directory: str
+    workspace: str
+    digest: str
+    summary: str
+    plan_file: str
+    created_at: float
+    from_cache: bool = False
+
+
+# Latest plan per (working_directory, workspace)
+_plan_cache: Dict[Tuple[str, str], PlanRecord] = {}
+# Serializes planning of the same directory/workspace so concurrent callers share one run
+_plan_locks: Dict[Tuple[str, str], asyncio.Lock] = {}
+
+
+def _hash_directory(hasher, directory: str, visited: set) -> None:
+    """Feeds every Terraform input file below `directory` (and local modules it references) into `hasher`."""
+    directory = os.path.realpath(directory)
+    if directory in visited:
+        return
+    visited.add(directory)
+
+    module_dirs: List[str] = []
+    for root, dirs, files in os.walk(directory):
+        # Provider binaries and downloaded modules live in .terraform; only the resolved module manifest matters
+        dirs[:] = sorted(d for d in dirs if d != ".terraform")
+        candidates = [f for f in files if f.endswith(_CONFIG_SUFFIXES) or f == ".terraform.lock.hcl"]
+        manifest = os.path.join(root, ".terraform", "modules", "modules.json")
+        for path in sorted(os.path.join(root, f) for f in candidates) + ([manifest] if os.path.isfile(manifest) else []):
+            with open(path, "rb") as config_file:
+                content = config_file.read()
+            hasher.update(os.path.relpath(path, directory).encode("utf-8"))
+            hasher.update(b"\0")
+            hasher.update(content)
+            if path.endswith(".tf"):
+                for source in _LOCAL_MODULE_SOURCE.findall(content.decode("utf-8", errors="ignore")):
+                    module_dirs.append(os.path.join(root, source))
+
+    for module_dir in module_dirs:
+        if os.path.isdir(module_dir):
+            hasher.update(b"module:")
+            _hash_directory(hasher, module_dir, visited)
+
+
+def compute_config_digest(working_directory: str, workspace: str = "default") -> str:
+    """Returns a short digest of the .tf/.tfvars files and local module sources of a working directory."""
+    if not os.path.isdir(working_directory):
+        raise TerraformError(f"Working directory not found: {working_directory}")
+    hasher = hashlib.sha256()
+    hasher.update(f"workspace:{workspace}\0".encode("utf-8"))
+    _hash_directory(hasher, working_directory, set())
+    return hasher.hexdigest()[:16]
+
+
+async def _run_terraform(args: List[str], working_directory: str, workspace: str) -> Tuple[int, str, str]:
+    """Runs the configured terraform binary and returns (exit code, stdout, stderr)."""
+    env = {
+        **os.environ,
+        "TF_IN_AUTOMATION": "1",
+        "TF_INPUT": "0",
+        "TF_WORKSPACE": workspace,
+    }
+    process = await asyncio.create_subprocess_exec(
+        settings.TERRAFORM_BIN,
+        *args,
+        cwd=working_directory,
+        env=env,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    try:
+        stdout, stderr = await asyncio.wait_for(process.communicate(), timeout=settings.TERRAFORM_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+        raise TerraformError(f"terraform {args[0]} timed out after {settings.TERRAFORM_TIMEOUT_SECONDS}s in {working_directory}")
+    return process.returncode, stdout.decode("utf-8", errors="replace"), stderr.decode("utf-8", errors="replace")
+
+
+def _summarize_plan(stdout: str, exit_code: int) -> str:
+    if exit_code == 0:
+        return "No changes. Your infrastructure matches the configuration."
+    match = _PLAN_SUMMARY.search(stdout)
+    return match.group(0) if match else "Plan contains changes."
+
+
+async def generate_plan(working_directory: str, workspace: str = "default") -> PlanRecord:
+    """Plans a working directory/workspace, returning the cached plan if its inputs are unchanged."""
+    working_directory = os.path.realpath(working_directory)
+    key = (working_directory, workspace)
+    lock = _plan_locks.setdefault(key, asyncio.Lock())
+
+    async with lock:
+        if not os.path.isdir(working_directory):
+            raise TerraformError(f"Working directory not found: {working_directory}")
+        # init writes .terraform.lock.hcl and the module manifest, which are part of the digest:
+        # hash only afterwards, or the first apply would see a changed configuration
+        if not os.path.isdir(os.path.join(working_directory, ".terraform")):
+            exit_code, _, stderr = await _run_terraform(["init", "-input=false", "-no-color"], working_directory, workspace)
+            if exit_code != 0:
+                raise TerraformError(f"terraform init failed in {working_directory}: {stderr.strip()}")
+
+        digest = await asyncio.to_thread(compute_config_digest, working_directory, workspace)
+        cached = _plan_cache.get(key)
+        if cached and cached.digest == digest and os.path.isfile(cached.plan_file):
+            print(f"--- [Terraform] Inputs unchanged in {working_directory} ({workspace}), reusing plan {digest} ---")
+            return replace(cached, from_cache=True)
+
+        os.makedirs(settings.TERRAFORM_PLAN_DIR, exist_ok=True)
+        key_hash = hashlib.sha256(f"{working_directory}\0{workspace}".encode("utf-8")).hexdigest()[:16]
+        plan_file = os.path.join(settings.TERRAFORM_PLAN_DIR, f"{key_hash}-{digest}.tfplan")
+
+        # -detailed-exitcode: 0 = no changes, 1 = error, 2 = changes present
+        exit_code, stdout, stderr = await _run_terraform(
+            ["plan", "-input=false", "-no-color", "-detailed-exitcode", f"-out={plan_file}"],
+            working_directory,
+            workspace,
+        )
+        if exit_code not in (0, 2):
+            raise TerraformError(f"terraform plan failed in {working_directory}: {stderr.strip()}")
+
+        if cached and cached.plan_file != plan_file and os.path.isfile(cached.plan_file):
+            os.remove(cached.plan_file)
+        record = PlanRecord(
+            working_directory=working_directory,
+            workspace=workspace,
+            digest=digest,
+            summary=_summarize_plan(stdout, exit_code),
+            plan_file=plan_file,
+            created_at=time.time(),
+        )
+        _plan_cache[key] = record
+        return record
+
+
+async def generate_plans(targets: List[Tuple[str, str]]) -> List[PlanRecord | TerraformError]:
+    """Plans several (working_directory, workspace) pairs concurrently, bounded by TERRAFORM_MAX_CONCURRENT_PLANS.
+
+    Results keep the order of `targets`; failures are returned as TerraformError instead of raised.
+    """
+    semaphore = asyncio.Semaphore(settings.TERRAFORM_MAX_CONCURRENT_PLANS)
+
+    async def _plan_one(working_directory: str, workspace: str) -> PlanRecord | TerraformError:
+        async with semaphore:
+            try:
+                return await generate_plan(working_directory, workspace)
+            except TerraformError as e:
+                return e
+
+    return await asyncio.gather(*(_plan_one(directory, workspace) for directory, workspace in targets))
+
+
+async def apply_plan(working_directory: str, plan_digest: str, workspace: str = "default") -> str:
+    """Applies the cached plan identified by `plan_digest`, refusing it if the configuration changed since."""
+    working_directory = os.path.realpath(working_directory)
+    key = (working_directory, workspace)
+    async with _plan_locks.setdefault(key, asyncio.Lock()):
+        record = _plan_cache.get(key)
+        if record is None or not os.path.isfile(record.plan_file):
+            raise TerraformError(f"No plan found for {working_directory} ({workspace}). Generate a plan first.")
+        if record.digest != plan_digest:
+            raise TerraformError(
+                f"Plan {plan_digest} is stale: the latest plan for {working_directory} ({workspace}) is {record.digest}."
+            )
+        current_digest = await asyncio.to_thread(compute_config_digest, working_directory, workspace)
+        if current_digest != record.digest:
+            _plan_cache.pop(key, None)
+            raise TerraformError(
+                f"Plan {plan_digest} is stale: configuration in {working_directory} changed since it was generated. Re-plan first."
+            )
+
+        exit_code, stdout, stderr = await _run_terraform(
+            ["apply", "-input=false", "-no-color", record.plan_file], working_directory, workspace
+        )
+        # A plan file can only be applied once; drop it whether or not the apply succeeded
+        _plan_cache.pop(key, None)
+        if os.path.isfile(record.plan_file):
+            os.remove(record.plan_file)
+        if exit_code != 0:
+            raise TerraformError(f"terraform apply failed in {working_directory}: {stderr.strip()}")
+
+        apply_summary = re.search(r"Apply complete!.*", stdout)
+        return apply_summary.group(0) if apply_summary else "Apply complete."
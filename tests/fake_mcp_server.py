@@ -0,0 +1,26 @@
+#!/usr/bin/env python3
+"""Stand-in stdio MCP server for app/services/mcp_pool.py tests.
+
+Tools:
+    whoami  returns the server's process id, so a test can tell a restarted server from the first one
+    crash   kills the server process without answering, like a server dying mid-session
+"""
+import os
+
+from mcp.server.fastmcp import FastMCP
+
+server = FastMCP("fake")
+
+
+@server.tool()
+def whoami() -> str:
+    return str(os.getpid())
+
+
+@server.tool()
+def crash() -> str:
+    os._exit(1)
+
+
+if __name__ == "__main__":
+    server.run("stdio")
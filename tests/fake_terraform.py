@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""Stand-in for the terraform binary (set TERRAFORM_BIN to this file).
+
+Supports the commands used by app/services/terraform_service.py:
+    init   writes .terraform/, .terraform.lock.hcl and a module manifest, like the real init
+    plan   writes the -out file and reports one resource to add per .tf file (exit code 2)
+    apply  requires the plan file and reports success
+Every command appends "<command> start|end <time>" to $FAKE_TERRAFORM_LOG if set;
+$FAKE_TERRAFORM_DELAY (seconds) makes plan slow enough to observe concurrency.
+"""
+import os
+import sys
+import time
+
+
+def _log(event: str) -> None:
+    log_path = os.environ.get("FAKE_TERRAFORM_LOG")
+    if log_path:
+        with open(log_path, "a") as log_file:
+            log_file.write(f"{event} {time.time()}\n")
+
+
+def main(args):
+    command = args[0]
+    _log(f"{command} start")
+    if command == "init":
+        os.makedirs(os.path.join(".terraform", "modules"), exist_ok=True)
+        with open(".terraform.lock.hcl", "w") as lock_file:
+            lock_file.write('provider "registry.terraform.io/hashicorp/null" {\n  version = "3.2.2"\n}\n')
+        with open(os.path.join(".terraform", "modules", "modules.json"), "w") as manifest:
+            manifest.write('{"Modules":[{"Key":"","Source":"","Dir":"."}]}')
+        print("Terraform has been successfully initialized!")
+        code = 0
+    elif command == "plan":
+        time.sleep(float(os.environ.get("FAKE_TERRAFORM_DELAY", "0")))
+        out = next(arg.split("=", 1)[1] for arg in args if arg.startswith("-out="))
+        resources = len([name for name in os.listdir(".") if name.endswith(".tf")])
+        with open(out, "w") as plan_file:
+            plan_file.write(f"{os.getcwd()} {os.environ.get('TF_WORKSPACE')} {resources}\n")
+        print(f"Plan: {resources} to add, 0 to change, 0 to destroy.")
+        code = 2 if resources else 0
+    elif command == "apply":
+        if not os.path.isfile(args[-1]):
+            print(f"Error: Failed to load plan file {args[-1]}", file=sys.stderr)
+            code = 1
+        else:
+            print("Apply complete! Resources: 1 added, 0 changed, 0 destroyed.")
+            code = 0
+    else:
+        print(f"fake terraform: unsupported command {command}", file=sys.stderr)
+        code = 1
+    _log(f"{command} end")
+    return code
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
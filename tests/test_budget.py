@@ -0,0 +1,64 @@
+import asyncio
+import time
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+
+from app.agents.budget import (
+    BudgetExceededError,
+    LlmCallTimeoutError,
+    TurnBudget,
+    best_answer_so_far,
+    final_sub_agent_answer,
+    run_graph_within_budget,
+    use_budget,
+)
+from app.agents.memo import IncompleteResult
+
+
+def _budget(deadline_seconds=10.0):
+    return TurnBudget(deadline=time.monotonic() + deadline_seconds, max_steps=10, max_tokens=10_000)
+
+
+async def _hanging_call():
+    await asyncio.sleep(10)
+
+
+def test_hung_call_raises_a_budget_error():
+    async def scenario():
+        with pytest.raises(LlmCallTimeoutError, match="did not respond within 0.05s") as raised:
+            await _budget().run_step(_hanging_call, timeout=0.05)
+        assert isinstance(raised.value, BudgetExceededError)
+
+    asyncio.run(scenario())
+
+
+class _GraphWithHungCall:
+    """Yields one state, then makes an LLM call that never returns."""
+
+    async def astream(self, graph_input, config=None, stream_mode=None):
+        messages = graph_input["messages"] + [AIMessage(content="Image built: app:1")]
+        yield {"messages": messages}
+        await _budget().run_step(_hanging_call, timeout=0.05)
+        yield {"messages": messages + [AIMessage(content="never")]}
+
+
+def test_hung_call_ends_the_graph_with_the_best_answer_so_far():
+    async def scenario():
+        with use_budget(_budget()):
+            return await run_graph_within_budget(_GraphWithHungCall(), {"messages": [HumanMessage(content="build")]})
+
+    messages, reason = asyncio.run(scenario())
+    assert reason == "a model call did not respond within 0.05s"
+    assert best_answer_so_far(messages, reason).endswith("Best answer so far: Image built: app:1")
+
+
+def test_final_sub_agent_answer_marks_budget_cut_runs_incomplete():
+    messages = [HumanMessage(content="build"), AIMessage(content="image built")]
+    finished = final_sub_agent_answer(messages, None, "no answer")
+    assert finished == "image built" and not isinstance(finished, IncompleteResult)
+    assert final_sub_agent_answer([], None, "no answer") == "no answer"
+
+    cut_short = final_sub_agent_answer(messages, "the step limit for this turn was reached", "no answer")
+    assert isinstance(cut_short, IncompleteResult)
+    assert cut_short == "I had to stop early because the step limit for this turn was reached. Best answer so far: image built"
@@ -0,0 +1,53 @@
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration
+
+from app.agents.cascade import escalation_reason
+
+TOOLS = [{
+    "type": "function",
+    "function": {
+        "name": "docker_sub_agent_tool",
+        "parameters": {"type": "object", "properties": {"task": {"type": "string"}}, "required": ["task"]},
+    },
+}]
+
+
+def _reason(message, tools=TOOLS, finish_reason="STOP"):
+    return escalation_reason(ChatGeneration(message=message, generation_info={"finish_reason": finish_reason}), tools)
+
+
+def _tool_call(name="docker_sub_agent_tool", **args):
+    return AIMessage(content="", tool_calls=[{"name": name, "args": args, "id": "call-1"}])
+
+
+def test_acceptable_answers_are_not_escalated():
+    assert _reason(AIMessage(content="The image is built.")) is None
+    assert _reason(_tool_call(task="build the image")) is None
+    assert _reason(AIMessage(content="Done."), finish_reason="stop") is None
+
+
+def test_empty_answer_is_escalated():
+    assert _reason(AIMessage(content="   ")) == "empty_answer"
+
+
+def test_malformed_tool_call_is_escalated():
+    message = AIMessage(
+        content="",
+        invalid_tool_calls=[{"name": "docker_sub_agent_tool", "args": "{task:", "id": "call-1", "error": "bad json"}],
+    )
+    assert _reason(message) == "malformed_tool_call"
+
+
+def test_tool_call_missing_required_args_is_escalated():
+    assert _reason(_tool_call()) == "missing_args"
+    assert _reason(_tool_call(task="")) == "missing_args"
+
+
+def test_call_to_an_unknown_tool_is_escalated():
+    assert _reason(_tool_call("kubectl_tool", task="get pods")) == "unknown_tool"
+
+
+def test_truncated_low_confidence_or_non_ai_responses_are_escalated():
+    assert _reason(AIMessage(content="The image"), finish_reason="MAX_TOKENS") == "incomplete"
+    assert _reason(AIMessage(content="I'm not sure which registry to use.")) == "low_confidence"
+    assert _reason(HumanMessage(content="hello")) == "unexpected_message"
@@ -0,0 +1,56 @@
+import asyncio
+
+from fastapi import FastAPI, WebSocketDisconnect
+from fastapi.testclient import TestClient
+
+from app.api.v1.endpoints import chat
+
+
+def _client() -> TestClient:
+    app = FastAPI()
+    app.include_router(chat.router)
+    return TestClient(app)
+
+
+def test_malformed_frames_get_an_error_event_and_keep_the_socket_open():
+    with _client().websocket_connect("/chat/ws/s1") as websocket:
+        for frame in ["{not json", "[1, 2]", '"hello"']:
+            websocket.send_text(frame)
+            assert websocket.receive_json() == {"type": "error", "detail": "Expected a JSON object."}
+        websocket.send_json({"repo_url": None})
+        assert websocket.receive_json() == {"type": "error", "detail": "Expected a 'message' field."}
+
+
+class ScriptedWebSocket:
+    """Stands in for a client that sends `frames`, then disconnects."""
+
+    def __init__(self, frames):
+        self.frames = list(frames)
+        self.sent = []
+
+    async def accept(self):
+        pass
+
+    async def receive_text(self):
+        await asyncio.sleep(0.01)
+        if not self.frames:
+            raise WebSocketDisconnect(1000)
+        return self.frames.pop(0)
+
+    async def send_json(self, event):
+        self.sent.append(event)
+
+
+def test_running_turn_is_cancelled_and_awaited_on_disconnect(monkeypatch):
+    outcome = []
+
+    async def fake_turn(websocket, session_id, payload, budget):
+        while not budget._cancelled.is_set():
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.05)  # e.g. persisting what the turn produced
+        outcome.append("finished")
+        raise RuntimeError("lost on the floor")
+
+    monkeypatch.setattr(chat, "_run_websocket_turn", fake_turn)
+    asyncio.run(chat.chat_websocket(ScriptedWebSocket(['{"message": "deploy it"}']), "s1"))
+    assert outcome == ["finished"]
@@ -0,0 +1,108 @@
+import asyncio
+import time
+from collections import defaultdict
+
+import pytest
+
+from app.agents import hedging
+from app.agents.hedging import HedgeStats, hedged_call
+from app.config import settings
+
+
+@pytest.fixture(autouse=True)
+def hedge_settings(monkeypatch):
+    monkeypatch.setattr(hedging, "_hedge_stats", defaultdict(HedgeStats))
+    monkeypatch.setattr(settings, "LLM_HEDGE_MIN_SAMPLES", 3)
+    monkeypatch.setattr(settings, "LLM_HEDGE_PERCENTILE", 50)
+    monkeypatch.setattr(settings, "LLM_HEDGE_MAX_RATE", 1.0)
+
+
+def _stats(role, seeded_latency=None):
+    stats = hedging._hedge_stats[role]
+    if seeded_latency is not None:
+        stats.latencies.extend([seeded_latency] * 20)
+    return stats
+
+
+def _fake_model(primary_delay, hedge_delay, events):
+    """make_call for hedged_call: each request answers after its injected delay, recording cancellations."""
+    async def make_call(is_hedge):
+        name = "hedge" if is_hedge else "primary"
+        events.append(f"{name} started")
+        try:
+            await asyncio.sleep(hedge_delay if is_hedge else primary_delay)
+        except asyncio.CancelledError:
+            events.append(f"{name} cancelled")
+            raise
+        return name
+
+    return make_call
+
+
+def test_no_hedge_until_enough_latency_samples():
+    events = []
+    stats = _stats("role")
+    assert asyncio.run(hedged_call("role", _fake_model(0.05, 0.01, events))) == "primary"
+    assert events == ["primary started"]
+    assert stats.hedges == 0 and len(stats.latencies) == 1
+
+
+def test_hedge_fires_after_the_percentile_delay_and_the_loser_is_cancelled():
+    events = []
+    stats = _stats("role", seeded_latency=0.05)
+
+    async def scenario():
+        started = time.monotonic()
+        result = await hedged_call("role", _fake_model(5, 0.02, events))
+        return result, time.monotonic() - started
+
+    result, elapsed = asyncio.run(scenario())
+    assert result == "hedge"
+    assert 0.07 <= elapsed < 1
+    assert events == ["primary started", "hedge started", "primary cancelled"]
+    assert (stats.calls, stats.hedges, stats.hedge_wins) == (1, 1, 1)
+    # The win is recorded with the latency the caller saw, from the original request
+    assert stats.latencies[-1] >= 0.07
+
+
+def test_primary_win_cancels_the_hedge_and_is_not_counted_as_a_hedge_win():
+    events = []
+    stats = _stats("role", seeded_latency=0.02)
+    assert asyncio.run(hedged_call("role", _fake_model(0.06, 5, events))) == "primary"
+    assert events == ["primary started", "hedge started", "hedge cancelled"]
+    assert (stats.calls, stats.hedges, stats.hedge_wins) == (1, 1, 0)
+    assert stats.latencies[-1] >= 0.06
+
+
+def test_fast_primary_is_not_hedged():
+    events = []
+    stats = _stats("role", seeded_latency=0.1)
+    assert asyncio.run(hedged_call("role", _fake_model(0.01, 0.01, events))) == "primary"
+    assert events == ["primary started"]
+    assert stats.hedges == 0
+
+
+def test_hedge_rate_is_capped(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_HEDGE_MAX_RATE", 0.5)
+    stats = _stats("role", seeded_latency=0.01)
+
+    async def scenario():
+        for _ in range(4):
+            await hedged_call("role", _fake_model(0.05, 0.01, []))
+
+    asyncio.run(scenario())
+    assert (stats.calls, stats.hedges, stats.hedge_wins) == (4, 2, 2)
+    assert stats.as_dict()["hedge_rate"] == 0.5
+
+
+def test_failed_hedge_falls_back_to_the_primary():
+    stats = _stats("role", seeded_latency=0.02)
+
+    async def make_call(is_hedge):
+        if is_hedge:
+            raise RuntimeError("hedge failed")
+        await asyncio.sleep(0.06)
+        return "primary"
+
+    assert asyncio.run(hedged_call("role", make_call)) == "primary"
+    assert (stats.hedges, stats.hedge_wins) == (1, 0)
@@ -0,0 +1,87 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from app.config import settings
+from app.services import k8s_service
+from app.services.k8s_service import KubernetesError, deploy
+
+
+class FakeKubernetesApi:
+    """Minimal API server for Deployments/Services: stores applied objects; rollouts succeed unless `broken`."""
+
+    def __init__(self):
+        self.objects = {}
+        self.broken = False
+        self.requests = 0
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        path = request.url.path
+        if request.method == "PATCH":
+            body = json.loads(request.content)
+            body.setdefault("metadata", {})["generation"] = self.objects.get(path, {}).get("metadata", {}).get("generation", 0) + 1
+            self.objects[path] = body
+            return httpx.Response(200, json=body)
+        live = self.objects.get(path)
+        if live is None:
+            return httpx.Response(404, json={"kind": "Status", "code": 404})
+        if "/deployments/" in path:
+            replicas = live["spec"]["replicas"]
+            ready = 0 if self.broken else replicas
+            live["status"] = {
+                "observedGeneration": live["metadata"]["generation"],
+                "updatedReplicas": replicas,
+                "availableReplicas": ready,
+            }
+        return httpx.Response(200, json=live)
+
+
+@pytest.fixture
+def api(monkeypatch):
+    fake = FakeKubernetesApi()
+    monkeypatch.setattr(settings, "K8S_API_URL", "http://fake-kubernetes")
+    monkeypatch.setattr(settings, "K8S_ROLLOUT_TIMEOUT_SECONDS", 0.5)
+    monkeypatch.setattr(k8s_service, "_applied_hashes", {})
+    monkeypatch.setattr(
+        k8s_service,
+        "_build_client",
+        lambda: httpx.AsyncClient(base_url=settings.K8S_API_URL, transport=httpx.MockTransport(fake.handler)),
+    )
+    return fake
+
+
+def test_redeploy_after_failed_rollout_checks_the_rollout_again(api):
+    api.broken = True
+    with pytest.raises(KubernetesError, match="did not complete"):
+        asyncio.run(deploy("app:1", "web"))
+
+    # Same spec again: nothing to apply, but the Deployment is still not rolled out
+    with pytest.raises(KubernetesError, match="did not complete"):
+        asyncio.run(deploy("app:1", "web"))
+
+    # Once the Deployment has rolled out, the same redeploy is a plain no-op
+    api.broken = False
+    result = asyncio.run(deploy("app:1", "web"))
+    assert result.applied == []
+    assert result.unchanged == ["Deployment/web"]
+    assert result.rollout_status is None
+
+
+def test_cached_deploy_is_verified_against_the_api_after_the_ttl(api, monkeypatch):
+    first = asyncio.run(deploy("app:1", "web", container_port=8080))
+    assert first.applied == ["Deployment/web", "Service/web"]
+
+    requests = api.requests
+    assert asyncio.run(deploy("app:1", "web", container_port=8080)).applied == []
+    assert api.requests == requests  # within the TTL: served from the cache
+
+    # Deleted outside this process: once the cache is stale, the redeploy notices and applies it again
+    del api.objects["/apis/apps/v1/namespaces/default/deployments/web"]
+    monkeypatch.setattr(settings, "K8S_APPLIED_CACHE_TTL_SECONDS", 0)
+    result = asyncio.run(deploy("app:1", "web", container_port=8080))
+    assert result.applied == ["Deployment/web"]
+    assert result.unchanged == ["Service/web"]
+    assert result.rollout_status.startswith("rollout complete")
@@ -0,0 +1,145 @@
+import asyncio
+import time
+from collections import defaultdict
+from typing import Any, List
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+import pytest
+
+from app.agents import cascade, llm
+from app.agents.budget import TurnBudget, use_budget
+from app.agents.llm import RoleChatModel
+from app.config import settings
+from app.services.scheduler import INTERACTIVE, LONG_RUNNING, PrioritySlots, use_turn_class
+
+
+class FakeTier(BaseChatModel):
+    """Chat model answering with the given responses in turn, after `delay` seconds each."""
+    model: str
+    responses: List[Any]
+    delay: float = 0.0
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-tier"
+
+    def _generate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        raise NotImplementedError
+
+    async def _agenerate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        response = self.responses[min(self.calls, len(self.responses) - 1)]
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if isinstance(response, Exception):
+            raise response
+        return ChatResult(generations=[ChatGeneration(message=response)])
+
+
+def test_queueing_for_a_slot_does_not_count_against_the_call_timeout(monkeypatch):
+    slots = PrioritySlots("llm", capacity=1, reserved=0)
+    monkeypatch.setattr(llm, "llm_slots", slots)
+    monkeypatch.setattr(settings, "LLM_TIMEOUT_SECONDS", 0.3)
+    model = RoleChatModel(role="docker", tiers=[FakeTier(model="fake", responses=[AIMessage(content="built")])])
+
+    async def scenario():
+        await slots.acquire(INTERACTIVE)
+        asyncio.get_running_loop().call_later(0.5, slots.release, INTERACTIVE)
+        budget = TurnBudget(deadline=time.monotonic() + 10, max_steps=10, max_tokens=10_000)
+        with use_budget(budget), use_turn_class(LONG_RUNNING):
+            started = time.monotonic()
+            result = await model.ainvoke([HumanMessage(content="build the image")])
+        return result, time.monotonic() - started, budget
+
+    result, elapsed, budget = asyncio.run(scenario())
+    assert result.content == "built"
+    assert elapsed >= 0.5
+    assert budget.steps == 1 and slots.in_use[LONG_RUNNING] == 0
+
+
+def test_slot_wait_is_bounded_by_the_turn_deadline(monkeypatch):
+    slots = PrioritySlots("llm", capacity=1, reserved=0)
+    monkeypatch.setattr(llm, "llm_slots", slots)
+    model = RoleChatModel(role="docker", tiers=[FakeTier(model="fake", responses=[AIMessage(content="built")])])
+
+    async def scenario():
+        await slots.acquire(INTERACTIVE)
+        budget = TurnBudget(deadline=time.monotonic() + 0.1, max_steps=10, max_tokens=10_000)
+        with use_budget(budget), use_turn_class(LONG_RUNNING):
+            try:
+                await model.ainvoke([HumanMessage(content="build the image")])
+            except Exception as e:
+                return e, budget
+        return None, budget
+
+    error, budget = asyncio.run(scenario())
+    assert "time limit for this turn" in str(error)
+    assert budget.steps == 0 and not slots.interactive_waiting() and not slots._waiters[LONG_RUNNING]
+
+
+@pytest.fixture
+def cascade_stats(monkeypatch):
+    stats = defaultdict(cascade.CascadeStats)
+    monkeypatch.setattr(cascade, "_cascade_stats", stats)
+    return stats
+
+
+def _cascade(*tiers):
+    return RoleChatModel(role="supervisor", tiers=list(tiers))
+
+
+def test_accepted_cheap_answer_is_served_by_the_cheap_tier(cascade_stats):
+    cheap = FakeTier(model="cheap", responses=[AIMessage(content="It is running.")])
+    strong = FakeTier(model="strong", responses=[AIMessage(content="unused")])
+    result = asyncio.run(_cascade(cheap, strong).ainvoke([HumanMessage(content="is it up?")]))
+    assert result.content == "It is running."
+    assert strong.calls == 0
+    assert cascade_stats["supervisor"].as_dict() == {
+        "calls": 1,
+        "served_by_tier": {"cheap": 1},
+        "escalations": 0,
+        "escalation_rate": 0.0,
+        "escalation_reasons": {},
+    }
+
+
+def test_rejected_or_failed_tiers_escalate_to_the_next_one(cascade_stats):
+    tools = [{"type": "function", "function": {"name": "docker_sub_agent_tool", "parameters": {"required": ["task"]}}}]
+    cheap = FakeTier(model="cheap", responses=[
+        AIMessage(content="", tool_calls=[{"name": "docker_sub_agent_tool", "args": {}, "id": "call-1"}]),
+        AIMessage(content=""),
+    ])
+    middle = FakeTier(model="middle", responses=[RuntimeError("quota exceeded")])
+    strong = FakeTier(model="strong", responses=[
+        AIMessage(content="", tool_calls=[{"name": "docker_sub_agent_tool", "args": {"task": "build"}, "id": "call-2"}]),
+        AIMessage(content=""),
+    ])
+    model = _cascade(cheap, middle, strong).bind(tools=tools)
+
+    async def scenario():
+        first = await model.ainvoke([HumanMessage(content="build the image")])
+        second = await model.ainvoke([HumanMessage(content="and then?")])
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert first.tool_calls[0]["args"] == {"task": "build"}
+    assert second.content == ""  # the last tier's answer is always accepted
+    assert (cheap.calls, middle.calls, strong.calls) == (2, 2, 2)
+    assert cascade_stats["supervisor"].as_dict() == {
+        "calls": 2,
+        "served_by_tier": {"strong": 2},
+        "escalations": 4,
+        "escalation_rate": 2.0,
+        "escalation_reasons": {"missing_args": 1, "empty_answer": 1, "error": 2},
+    }
+
+
+def test_last_tier_errors_are_raised(cascade_stats):
+    cheap = FakeTier(model="cheap", responses=[RuntimeError("cheap down")])
+    strong = FakeTier(model="strong", responses=[RuntimeError("strong down")])
+    with pytest.raises(RuntimeError, match="strong down"):
+        asyncio.run(_cascade(cheap, strong).ainvoke([HumanMessage(content="hi")]))
+    assert cascade_stats["supervisor"].escalation_reasons == {"error": 1}
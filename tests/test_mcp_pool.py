@@ -0,0 +1,81 @@
+import asyncio
+import os
+import sys
+
+import anyio
+import pytest
+from mcp import StdioServerParameters
+from mcp.types import CallToolResult, TextContent
+
+from app.config import settings
+from app.services.mcp_pool import McpServer
+
+FAKE_SERVER = os.path.join(os.path.dirname(__file__), "fake_mcp_server.py")
+
+
+def _text(result: CallToolResult) -> str:
+    return result.content[0].text
+
+
+class FakeSession:
+    """ClientSession stand-in whose transport may already be closed."""
+
+    def __init__(self, answer: str, closed: bool = False) -> None:
+        self.answer = answer
+        self.closed = closed
+        self.calls = 0
+
+    async def call_tool(self, name, arguments, **kwargs):
+        self.calls += 1
+        if self.closed:
+            raise anyio.ClosedResourceError()
+        return CallToolResult(content=[TextContent(type="text", text=self.answer)])
+
+
+def test_call_on_a_closed_session_is_retried_once_the_runner_reconnects():
+    async def scenario():
+        server = McpServer("fake", StdioServerParameters(command="unused"))
+        dead, fresh = FakeSession("dead", closed=True), FakeSession("fresh")
+        server.session = dead
+        server._ready.set()
+
+        async def runner():
+            # What McpServer._run does when a failed call requests a restart
+            await server._restart_requested.wait()
+            await asyncio.sleep(0.05)
+            server.session = fresh
+            server._restart_requested.clear()
+            server._ready.set()
+
+        reconnect = asyncio.ensure_future(runner())
+        result = await server.call_tool("whoami", {})
+        await reconnect
+        return server, dead, fresh, result
+
+    server, dead, fresh, result = asyncio.run(scenario())
+    assert _text(result) == "fresh"
+    assert (dead.calls, fresh.calls) == (1, 1)
+    assert server.calls == 1 and server.failures == 1
+
+
+def test_pool_reconnects_after_the_server_process_dies(monkeypatch):
+    monkeypatch.setattr(settings, "MCP_CONNECT_TIMEOUT_SECONDS", 20)
+
+    async def scenario():
+        server = McpServer("fake", StdioServerParameters(command=sys.executable, args=[FAKE_SERVER]))
+        server.start()
+        try:
+            first_pid = _text(await server.call_tool("whoami", {}))
+            first_generation = server.generation
+            with pytest.raises(Exception):
+                await server.call_tool("crash", {})
+            # The session is gone: the next call waits for the runner to start a new server process
+            second_pid = _text(await server.call_tool("whoami", {}))
+            return server, first_pid, second_pid, first_generation
+        finally:
+            await server.stop()
+
+    server, first_pid, second_pid, first_generation = asyncio.run(scenario())
+    assert first_pid != second_pid
+    assert server.generation == first_generation + 1 and server.restarts == 1
+    assert server.failures == 1 and server.last_error
@@ -0,0 +1,53 @@
+import asyncio
+
+from app.agents.memo import IncompleteResult, TurnMemo, normalize_task
+
+
+def _counting_invoke(results):
+    calls = []
+
+    async def invoke():
+        calls.append(None)
+        await asyncio.sleep(0.01)
+        return results[min(len(calls), len(results)) - 1]
+
+    return calls, invoke
+
+
+def test_normalize_task_ignores_case_whitespace_and_trailing_punctuation():
+    assert normalize_task("  Build   the IMAGE.\n") == normalize_task("build the image")
+    assert normalize_task("build the image") != normalize_task("build an image")
+
+
+def test_completed_result_is_reused_and_concurrent_calls_share_one_run():
+    async def scenario():
+        memo = TurnMemo()
+        calls, invoke = _counting_invoke(["built app:1"])
+        first, second = await asyncio.gather(
+            memo.run("docker_sub_agent_tool", "Build app", invoke),
+            memo.run("docker_sub_agent_tool", "build app.", invoke),
+        )
+        third = await memo.run("docker_sub_agent_tool", "BUILD APP", invoke)
+        return calls, first, second, third
+
+    calls, first, second, third = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert first == second == "built app:1"
+    assert third.endswith("\nbuilt app:1")
+
+
+def test_failed_or_stopped_early_results_are_not_reused():
+    async def scenario():
+        memo = TurnMemo()
+        calls, invoke = _counting_invoke([
+            IncompleteResult("Error during docker build: registry unavailable"),
+            IncompleteResult("I had to stop early because the step limit for this turn was reached."),
+            "built app:1",
+        ])
+        results = [await memo.run("docker_sub_agent_tool", "build app", invoke) for _ in range(4)]
+        return calls, results
+
+    calls, results = asyncio.run(scenario())
+    assert len(calls) == 3
+    assert results[2] == "built app:1"
+    assert results[3].endswith("\nbuilt app:1")
@@ -0,0 +1,52 @@
+import uuid
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from app.database.models import ChatHistory
+from app.services.message_store import decode_history, to_history_row
+
+
+def _tool_turn(call_id):
+    return [
+        HumanMessage(content="build the image"),
+        AIMessage(content="", tool_calls=[{"name": "docker_sub_agent_tool", "args": {"task_description": "build"}, "id": call_id}]),
+        ToolMessage(content="Built app:1", tool_call_id=call_id, name="docker_sub_agent_tool"),
+        AIMessage(content="The image app:1 is built."),
+    ]
+
+
+def _rows(messages):
+    return [to_history_row("s1", message) for message in messages]
+
+
+def test_round_trip_keeps_tool_calls_and_results():
+    messages = _tool_turn("call-1")
+    decoded = decode_history(_rows(messages))
+    assert [type(message) for message in decoded] == [type(message) for message in messages]
+    assert decoded[1].tool_calls[0]["id"] == "call-1"
+    assert decoded[2].tool_call_id == "call-1"
+    assert decoded[2].name == "docker_sub_agent_tool"
+
+
+def test_window_starting_mid_turn_is_trimmed_to_a_user_message():
+    history = _tool_turn("call-1") + _tool_turn("call-2")
+    # Windows beginning at the tool call, and at the tool result, of the first turn
+    for start in (1, 2):
+        decoded = decode_history(_rows(history[start:]))
+        assert isinstance(decoded[0], HumanMessage)
+        assert decoded == decode_history(_rows(history[4:]))
+
+
+def test_window_without_a_user_message_is_empty():
+    assert decode_history(_rows(_tool_turn("call-1")[1:])) == []
+
+
+def test_legacy_tool_rows_get_their_call_reattached():
+    rows = [
+        ChatHistory(id=uuid.uuid4(), session_id="s1", sender_type="user", message="deploy it"),
+        ChatHistory(id=uuid.uuid4(), session_id="s1", sender_type="MessageSender.TOOL", message="Deployed", tool_name="k8s_sub_agent_tool"),
+        ChatHistory(id=uuid.uuid4(), session_id="s1", sender_type="ai", message="Done."),
+    ]
+    decoded = decode_history(rows)
+    assert [message.type for message in decoded] == ["human", "ai", "tool", "ai"]
+    assert decoded[1].tool_calls[0]["id"] == decoded[2].tool_call_id == f"legacy-{rows[1].id}"
@@ -0,0 +1,105 @@
+import asyncio
+import contextlib
+
+import pytest
+
+from app.config import settings
+from app.database import database
+from app.database.database import ReplicaStatus, check_replica_lag
+from app.services import history_service
+
+
+class FakeReplicaEngine:
+    """Engine stand-in whose lag query returns `lag`, or fails with `error`."""
+
+    def __init__(self, lag=None, error=None):
+        self.lag = lag
+        self.error = error
+
+    @contextlib.asynccontextmanager
+    async def connect(self):
+        if self.error is not None:
+            raise self.error
+        yield self
+
+    async def scalar(self, statement):
+        return self.lag
+
+
+@pytest.fixture
+def replica(monkeypatch):
+    """Configures a fake replica; returns a function routing one history read and reporting where it went."""
+    status = ReplicaStatus()
+    engine = FakeReplicaEngine()
+    monkeypatch.setattr(settings, "REPLICA_MAX_LAG_SECONDS", 5)
+    monkeypatch.setattr(database, "replica_engine", engine)
+    monkeypatch.setattr(database, "replica_status", status)
+    monkeypatch.setattr(history_service, "replica_engine", engine)
+    monkeypatch.setattr(history_service, "replica_status", status)
+    monkeypatch.setattr(history_service, "_recent_writes", {})
+
+    def opener(target):
+        @contextlib.asynccontextmanager
+        async def open_session(turn_class=None):
+            yield target
+        return open_session
+
+    monkeypatch.setattr(history_service, "scheduled_session", opener("primary"))
+    monkeypatch.setattr(history_service, "scheduled_replica_session", opener("replica"))
+
+    def route(session_ids=("s1",)):
+        async def read():
+            async with history_service.history_read_session(list(session_ids)) as db:
+                return db
+        return asyncio.run(read())
+
+    return engine, status, route
+
+
+def test_replica_is_unusable_until_its_lag_is_known(replica):
+    engine, status, route = replica
+    assert status.lag_seconds is None and not status.usable()
+    assert route() == "primary"
+
+
+@pytest.mark.parametrize("lag, expected", [(0, "replica"), (5, "replica"), (5.5, "primary"), (60, "primary")])
+def test_reads_use_the_replica_only_while_its_lag_is_within_the_threshold(replica, lag, expected):
+    engine, status, route = replica
+    engine.lag = lag
+    asyncio.run(check_replica_lag())
+    assert status.lag_seconds == lag
+    assert route() == expected
+
+
+def test_failed_lag_check_falls_back_to_the_primary(replica):
+    engine, status, route = replica
+    engine.lag = 0
+    asyncio.run(check_replica_lag())
+    assert route() == "replica"
+
+    engine.error = ConnectionError("replica down")
+    asyncio.run(check_replica_lag())
+    assert status.last_error == "replica down" and not status.usable()
+    assert route() == "primary"
+
+    engine.error = None
+    asyncio.run(check_replica_lag())
+    assert route() == "replica"
+
+
+def test_recently_written_sessions_are_read_from_the_primary(replica):
+    engine, status, route = replica
+    engine.lag = 0
+    asyncio.run(check_replica_lag())
+    history_service.note_session_write("s1")
+    assert route(["s1"]) == "primary"
+    assert route(["s2"]) == "replica"
+
+
+def test_without_a_replica_everything_reads_from_the_primary(replica, monkeypatch):
+    engine, status, route = replica
+    monkeypatch.setattr(database, "replica_engine", None)
+    monkeypatch.setattr(history_service, "replica_engine", None)
+    status.lag_seconds = 0
+    assert not status.usable()
+    assert route() == "primary"
@@ -0,0 +1,121 @@
+import asyncio
+import time
+
+from app.config import settings
+from app.services import scheduler
+from app.services.scheduler import INTERACTIVE, LONG_RUNNING, PrioritySlots, checkpoint, use_turn_class
+
+
+def test_long_running_work_leaves_the_reserved_slots_to_interactive_work():
+    async def scenario():
+        slots = PrioritySlots("test", capacity=3, reserved=1)
+        await slots.acquire(LONG_RUNNING)
+        await slots.acquire(LONG_RUNNING)
+        third_long_running = asyncio.ensure_future(slots.acquire(LONG_RUNNING))
+        await asyncio.sleep(0.01)
+        assert not third_long_running.done()
+
+        await asyncio.wait_for(slots.acquire(INTERACTIVE), timeout=0.1)
+        assert dict(slots.in_use) == {LONG_RUNNING: 2, INTERACTIVE: 1}
+
+        slots.release(INTERACTIVE)
+        await asyncio.sleep(0.01)
+        assert not third_long_running.done()  # the freed slot is the reserved one
+        slots.release(LONG_RUNNING)
+        await asyncio.wait_for(third_long_running, timeout=0.1)
+        assert slots.in_use[LONG_RUNNING] == 2
+
+    asyncio.run(scenario())
+
+
+def test_waiting_interactive_work_is_served_first():
+    async def scenario():
+        slots = PrioritySlots("test", capacity=2, reserved=1)
+        granted = []
+
+        async def acquire(turn_class):
+            await slots.acquire(turn_class)
+            granted.append(turn_class)
+
+        await slots.acquire(INTERACTIVE)
+        await slots.acquire(LONG_RUNNING)
+        waiters = [asyncio.ensure_future(acquire(LONG_RUNNING))]
+        await asyncio.sleep(0)
+        waiters.append(asyncio.ensure_future(acquire(INTERACTIVE)))
+        await asyncio.sleep(0.01)
+        assert granted == [] and slots.interactive_waiting()
+
+        slots.release(LONG_RUNNING)
+        await asyncio.sleep(0.01)
+        assert granted == [INTERACTIVE]
+        slots.release(INTERACTIVE)
+        await asyncio.sleep(0.01)
+        assert granted == [INTERACTIVE, LONG_RUNNING]
+        await asyncio.gather(*waiters)
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_gives_up_its_place():
+    async def scenario():
+        slots = PrioritySlots("test", capacity=1, reserved=0)
+        await slots.acquire(INTERACTIVE)
+        waiter = asyncio.ensure_future(slots.acquire(INTERACTIVE))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        slots.release(INTERACTIVE)
+        assert sum(slots.in_use.values()) == 0 and not slots.interactive_waiting()
+
+    asyncio.run(scenario())
+
+
+def _interactive_queue(monkeypatch):
+    """Installs LLM slots that are all held by interactive work, with one more interactive request queued."""
+    slots = PrioritySlots("llm", capacity=1, reserved=0)
+    monkeypatch.setattr(scheduler, "llm_slots", slots)
+    monkeypatch.setattr(settings, "SCHEDULER_PREEMPT_POLL_SECONDS", 0.01)
+    return slots
+
+
+def test_checkpoint_pauses_long_running_turns_until_interactive_work_is_served(monkeypatch):
+    slots = _interactive_queue(monkeypatch)
+    monkeypatch.setattr(settings, "SCHEDULER_MAX_PREEMPT_SECONDS", 5)
+
+    async def scenario():
+        await slots.acquire(INTERACTIVE)
+        queued = asyncio.ensure_future(slots.acquire(INTERACTIVE))
+        await asyncio.sleep(0)
+        asyncio.get_running_loop().call_later(0.1, slots.release, INTERACTIVE)
+
+        with use_turn_class(INTERACTIVE):
+            started = time.monotonic()
+            await checkpoint()
+            assert time.monotonic() - started < 0.05
+        with use_turn_class(LONG_RUNNING):
+            started = time.monotonic()
+            await checkpoint()
+            paused = time.monotonic() - started
+        await queued
+        return paused
+
+    assert 0.08 <= asyncio.run(scenario()) < 1
+
+
+def test_checkpoint_pause_is_capped(monkeypatch):
+    slots = _interactive_queue(monkeypatch)
+    monkeypatch.setattr(settings, "SCHEDULER_MAX_PREEMPT_SECONDS", 0.1)
+
+    async def scenario():
+        await slots.acquire(INTERACTIVE)
+        queued = asyncio.ensure_future(slots.acquire(INTERACTIVE))
+        await asyncio.sleep(0)
+        with use_turn_class(LONG_RUNNING):
+            started = time.monotonic()
+            await checkpoint()
+            paused = time.monotonic() - started
+        queued.cancel()
+        await asyncio.gather(queued, return_exceptions=True)
+        return paused
+
+    assert 0.1 <= asyncio.run(scenario()) < 0.5
@@ -0,0 +1,65 @@
+import asyncio
+import contextlib
+from datetime import datetime, timezone
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from app.services import session_store
+
+
+def test_reload_waits_for_pending_background_writes(monkeypatch):
+    stored = []
+
+    @contextlib.asynccontextmanager
+    async def fake_session(*args):
+        yield None
+
+    async def slow_save(db, session_id, messages, timestamp=None):
+        await asyncio.sleep(0.05)
+        stored.extend(messages)
+
+    async def read_stored(db, session_id, limit=100):
+        return list(stored)
+
+    monkeypatch.setattr(session_store, "scheduled_session", fake_session)
+    monkeypatch.setattr(session_store, "history_read_session", fake_session)
+    monkeypatch.setattr(session_store, "save_messages", slow_save)
+    monkeypatch.setattr(session_store, "get_recent_history_by_session_id", read_stored)
+    monkeypatch.setattr(session_store, "decode_history", list)
+
+    async def scenario():
+        session_store.persist_in_background("s1", [HumanMessage(content="hi")])
+        session_store.persist_in_background("s1", [AIMessage(content="hello")])
+        session_store.discard_live_session("s1")
+        live_session = await session_store.get_live_session("s1")
+        session_store.discard_live_session("s1")
+        return live_session.messages
+
+    messages = asyncio.run(scenario())
+    assert [message.content for message in messages] == ["hi", "hello"]
+
+
+def test_background_writes_are_stamped_when_enqueued(monkeypatch):
+    writes = []
+
+    @contextlib.asynccontextmanager
+    async def fake_session(*args):
+        yield None
+
+    async def slow_save(db, session_id, messages, timestamp=None):
+        await asyncio.sleep(0.05)
+        writes.append((timestamp, datetime.now(timezone.utc)))
+
+    monkeypatch.setattr(session_store, "scheduled_session", fake_session)
+    monkeypatch.setattr(session_store, "save_messages", slow_save)
+
+    async def scenario():
+        before = datetime.now(timezone.utc)
+        task = session_store.persist_in_background("s2", [HumanMessage(content="hi")])
+        enqueued = datetime.now(timezone.utc)
+        await task
+        return before, enqueued
+
+    before, enqueued = asyncio.run(scenario())
+    [(stamped, written)] = writes
+    assert before <= stamped <= enqueued < written
@@ -0,0 +1,112 @@
+import asyncio
+import os
+import sys
+import time
+
+import pytest
+
+from app.config import settings
+from app.services import terraform_service
+from app.services.terraform_service import TerraformError, apply_plan, generate_plan, generate_plans
+
+FAKE_TERRAFORM = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_terraform.py")
+
+
+@pytest.fixture(autouse=True)
+def fake_terraform(tmp_path, monkeypatch):
+    # Run the stand-in through the current interpreter so the test does not depend on the shebang
+    wrapper = tmp_path / "terraform"
+    wrapper.write_text(f'#!/bin/sh\nexec "{sys.executable}" "{FAKE_TERRAFORM}" "$@"\n')
+    wrapper.chmod(0o755)
+    log_path = tmp_path / "terraform.log"
+    monkeypatch.setattr(settings, "TERRAFORM_BIN", str(wrapper))
+    monkeypatch.setattr(settings, "TERRAFORM_PLAN_DIR", str(tmp_path / "plans"))
+    monkeypatch.setenv("FAKE_TERRAFORM_LOG", str(log_path))
+    monkeypatch.setattr(terraform_service, "_plan_cache", {})
+    monkeypatch.setattr(terraform_service, "_plan_locks", {})
+    return log_path
+
+
+def _make_config(path, name="main.tf"):
+    path.mkdir(parents=True, exist_ok=True)
+    (path / name).write_text('resource "null_resource" "example" {}\n')
+    return str(path)
+
+
+def _events(log_path, command):
+    if not log_path.exists():
+        return []
+    return [line.split() for line in log_path.read_text().splitlines() if line.startswith(command)]
+
+
+def test_first_plan_of_a_fresh_directory_can_be_applied(tmp_path, fake_terraform):
+    directory = _make_config(tmp_path / "fresh")
+
+    async def scenario():
+        record = await generate_plan(directory)
+        return record, await apply_plan(directory, record.digest)
+
+    record, result = asyncio.run(scenario())
+    assert record.summary == "Plan: 1 to add, 0 to change, 0 to destroy."
+    assert result.startswith("Apply complete!")
+    assert len(_events(fake_terraform, "init start")) == 1
+
+
+def test_unchanged_inputs_reuse_the_cached_plan(tmp_path, fake_terraform):
+    directory = _make_config(tmp_path / "cached")
+
+    async def scenario():
+        first = await generate_plan(directory)
+        second = await generate_plan(directory)
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert second.from_cache and not first.from_cache  # the cached record itself is not flagged
+    assert second.digest == first.digest
+    assert len(_events(fake_terraform, "plan start")) == 1
+
+
+def test_changed_configuration_refuses_the_stale_plan(tmp_path, fake_terraform):
+    config_dir = tmp_path / "stale"
+    directory = _make_config(config_dir)
+
+    async def scenario():
+        record = await generate_plan(directory)
+        with pytest.raises(TerraformError, match="is stale: the latest plan"):
+            await apply_plan(directory, "0" * 16)
+        _make_config(config_dir, "extra.tf")
+        with pytest.raises(TerraformError, match="changed since it was generated"):
+            await apply_plan(directory, record.digest)
+        # The stale plan is forgotten: the next plan runs terraform again and covers the new file
+        replanned = await generate_plan(directory)
+        assert not replanned.from_cache
+        assert replanned.digest != record.digest
+        return replanned
+
+    replanned = asyncio.run(scenario())
+    assert replanned.summary == "Plan: 2 to add, 0 to change, 0 to destroy."
+    assert len(_events(fake_terraform, "apply start")) == 0
+
+
+def test_generate_plans_runs_concurrently_within_the_limit(tmp_path, fake_terraform, monkeypatch):
+    monkeypatch.setattr(settings, "TERRAFORM_MAX_CONCURRENT_PLANS", 2)
+    monkeypatch.setenv("FAKE_TERRAFORM_DELAY", "0.5")
+    directories = [_make_config(tmp_path / f"dir{index}") for index in range(4)]
+    targets = [(directory, "default") for directory in directories] + [(str(tmp_path / "missing"), "default")]
+
+    started = time.monotonic()
+    results = asyncio.run(generate_plans(targets))
+    elapsed = time.monotonic() - started
+
+    assert [result.working_directory for result in results[:4]] == [os.path.realpath(d) for d in directories]
+    assert isinstance(results[4], TerraformError)
+    # Four 0.5s plans, two at a time: about 1s, well under the 2s of running them one after another
+    assert elapsed < 1.8
+    timeline = sorted(
+        (float(event[2]), 1 if event[1] == "start" else -1) for event in _events(fake_terraform, "plan")
+    )
+    running = peak = 0
+    for _, change in timeline:
+        running += change
+        peak = max(peak, running)
+    assert peak == 2